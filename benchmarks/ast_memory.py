@@ -0,0 +1,64 @@
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from lexer import Lexer
+from parser import AST, Parser, Number, String, Boolean, Variable, count_nodes
+from lexer_throughput import SNIPPET
+
+VALUE_NODES = (Number, String, Boolean, Variable)
+
+class DictToken:
+    def __init__(self, type, value):
+        self.type = type
+        self.value = value
+
+def legacy_copy(value, legacy_classes):
+    # Rebuilds a tree in the original layout: plain classes with a __dict__,
+    # literal/variable nodes holding their Token and operators kept as Tokens
+    if isinstance(value, list):
+        return [legacy_copy(item, legacy_classes) for item in value]
+    if isinstance(value, tuple):
+        return tuple(legacy_copy(item, legacy_classes) for item in value)
+    if not isinstance(value, AST):
+        return value
+    node_type = type(value)
+    if node_type not in legacy_classes:
+        legacy_classes[node_type] = type(node_type.__name__, (object,), {})
+    node = legacy_classes[node_type]()
+    for field in node_type.__slots__:
+        field_value = getattr(value, field)
+        if field == 'op':
+            field_value = DictToken(field_value.name, None)
+        setattr(node, field, legacy_copy(field_value, legacy_classes))
+    if isinstance(value, VALUE_NODES):
+        node.token = DictToken(node_type.__name__.upper(), value.value)
+    return node
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    return result, sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compare AST bytes per node for the legacy and slotted layouts.")
+    arg_parser.add_argument('--repeat', type=int, default=2000, help="number of copies of the sample program to parse")
+    args = arg_parser.parse_args()
+
+    tokens = Lexer(SNIPPET * args.repeat).tokenize()
+    ast, slotted_bytes = measure(lambda: Parser(tokens).parse())
+    nodes = count_nodes(ast)
+    _, legacy_bytes = measure(lambda: legacy_copy(ast, {}))
+
+    print(f"{'layout':<10} {'nodes':>10} {'bytes':>12} {'bytes/node':>12}")
+    print(f"{'legacy':<10} {nodes:>10} {legacy_bytes:>12} {legacy_bytes / nodes:>12.1f}")
+    print(f"{'slotted':<10} {nodes:>10} {slotted_bytes:>12} {slotted_bytes / nodes:>12.1f}")
+
+if __name__ == '__main__':
+    main()
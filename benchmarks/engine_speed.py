@@ -0,0 +1,99 @@
+import argparse
+import contextlib
+import glob
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from lexer import Lexer
+from parser import Parser
+from main import ENGINES
+
+WORKLOADS = {
+    'while_loop': '''
+i is 0
+total is 0
+Otokonoko i < {n} Femboycore
+    total is total + i * 2 - 1
+    Femboy Feminine total > 1000000 Femboycore
+        total is total - 1000000
+    Periodt
+    i++
+Periodt
+UwU Boy total
+''',
+    'for_loop': '''
+items is [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+count is 0
+Otokonoko count < {n} / 10 Femboycore
+    Tomgirl item is items Femboycore
+        doubled is item * 2
+    Periodt
+    count++
+Periodt
+UwU Boy count
+''',
+    'function_calls': '''
+Femboy add(a, b) Femboycore
+    Femme a + b
+Periodt
+i is 0
+Otokonoko i < {n} / 10 Femboycore
+    i is add(i, 1)
+Periodt
+UwU Boy i
+''',
+}
+
+def run(engine, ast, repeat=1):
+    output = io.StringIO()
+    stdin = sys.stdin
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(output):
+            for _ in range(repeat):
+                # Answers for scripts that call ask()
+                sys.stdin = io.StringIO('femboy\n')
+                engine(ast).interpret()
+    finally:
+        sys.stdin = stdin
+    return time.perf_counter() - start, output.getvalue()
+
+def example_workloads():
+    for path in sorted(glob.glob(os.path.join(ROOT, 'examples', '*.fem'))):
+        with open(path) as f:
+            yield os.path.basename(path), f.read()
+
+def compare(name, source, engines, repeat=1):
+    ast = Parser(Lexer(source).tokenize()).parse()
+    timings = []
+    outputs = set()
+    for engine_name in engines:
+        elapsed, output = run(ENGINES[engine_name], ast, repeat)
+        timings.append(elapsed)
+        outputs.add(output)
+    if len(outputs) != 1:
+        raise SystemExit(f"{name}: engines produced different output")
+    baseline = timings[engines.index('tree')] if 'tree' in engines else timings[0]
+    print(f"{name:<26} " + ' '.join(f"{elapsed:>10.3f}" for elapsed in timings) + f" {baseline / min(timings):>7.1f}x")
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compare execution engines on loop-heavy workloads.")
+    arg_parser.add_argument('-n', type=int, default=200_000, help="iterations per workload")
+    arg_parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES), default=sorted(ENGINES))
+    arg_parser.add_argument('--examples', type=int, metavar='REPEAT', default=0, help="also time every program in examples/, run REPEAT times each")
+    args = arg_parser.parse_args()
+
+    print(f"{'workload':<26} " + ' '.join(f"{name:>10}" for name in args.engines) + f" {'speedup':>8}")
+    for name, template in WORKLOADS.items():
+        compare(name, template.replace('{n}', str(args.n)), args.engines)
+    if args.examples:
+        for name, source in example_workloads():
+            compare(name, source, args.engines, args.examples)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from engine_speed import compare
+from main import ENGINES
+
+WORKLOADS = {
+    'fibonacci': '''
+Femboy fib(n) Femboycore
+    Femboy Feminine n < 2 Femboycore
+        Femme n
+    Periodt
+    Femme fib(n - 1) + fib(n - 2)
+Periodt
+UwU Boy fib({depth})
+''',
+    'user_calls': '''
+Femboy add(a, b) Femboycore
+    Femme a + b
+Periodt
+total is 0
+Tomgirl i is range({n}) Femboycore
+    total is add(total, i)
+Periodt
+UwU Boy total
+''',
+    'builtin_calls': '''
+items is [1, 2, 3]
+total is 0
+Tomgirl i is range({n}) Femboycore
+    total is total + len(items)
+Periodt
+UwU Boy total
+''',
+}
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Time user-defined and built-in function calls on every engine.")
+    arg_parser.add_argument('-n', type=int, default=200_000, help="calls per loop workload")
+    arg_parser.add_argument('--depth', type=int, default=22, help="argument of the recursive fibonacci workload")
+    arg_parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES), default=sorted(ENGINES))
+    args = arg_parser.parse_args()
+
+    print(f"{'workload':<26} " + ' '.join(f"{name:>10}" for name in args.engines) + f" {'speedup':>8}")
+    for name, template in WORKLOADS.items():
+        compare(name, template.replace('{n}', str(args.n)).replace('{depth}', str(args.depth)), args.engines)
+
+if __name__ == '__main__':
+    main()
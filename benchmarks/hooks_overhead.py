@@ -0,0 +1,73 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from engine_speed import WORKLOADS
+from interpreter import Interpreter
+from lexer import Lexer
+from parser import Parser
+
+def no_hooks(ast):
+    return Interpreter(ast)
+
+def enter_hook(ast):
+    interpreter = Interpreter(ast)
+    interpreter.add_hook('enter', lambda node: None)
+    return interpreter
+
+def all_hooks(ast):
+    interpreter = Interpreter(ast)
+    interpreter.add_hook('enter', lambda node: None)
+    interpreter.add_hook('exit', lambda node, result: None)
+    interpreter.add_hook('call', lambda function, arguments: None)
+    interpreter.add_hook('return', lambda function, value: None)
+    interpreter.add_hook('loop_iteration', lambda loop: None)
+    interpreter.add_hook('exception_caught', lambda try_node, exception: None)
+    return interpreter
+
+def hooks_removed(ast):
+    # Registering and removing hooks must leave the interpreter exactly as
+    # fast as one that never had any
+    interpreter = all_hooks(ast)
+    for event, callbacks in interpreter.hooks.items():
+        for callback in list(callbacks):
+            interpreter.remove_hook(event, callback)
+    return interpreter
+
+CONFIGURATIONS = {
+    'no hooks': no_hooks,
+    'hooks removed': hooks_removed,
+    'enter hook': enter_hook,
+    'all hooks': all_hooks,
+}
+
+def best_time(make_interpreter, ast, repeat):
+    best = None
+    for _ in range(repeat):
+        interpreter = make_interpreter(ast)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            interpreter.interpret()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Measure what execution hooks cost the tree-walking interpreter.")
+    arg_parser.add_argument('-n', type=int, default=100_000, help="iterations per workload")
+    arg_parser.add_argument('--repeat', type=int, default=5, help="runs per configuration; the best is reported")
+    args = arg_parser.parse_args()
+
+    print(f"{'workload':<18} " + ' '.join(f"{name:>14}" for name in CONFIGURATIONS) + f" {'removed/none':>13}")
+    for name, template in WORKLOADS.items():
+        ast = Parser(Lexer(template.replace('{n}', str(args.n))).tokenize()).parse()
+        timings = [best_time(make_interpreter, ast, args.repeat) for make_interpreter in CONFIGURATIONS.values()]
+        print(f"{name:<18} " + ' '.join(f"{elapsed:>14.3f}" for elapsed in timings) + f" {timings[1] / timings[0]:>12.3f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from incremental import IncrementalParser
+from lexer import Lexer
+from parser import Parser
+from lexer_throughput import SNIPPET
+
+# Where in the file the edited copy of the snippet sits
+EDIT_POSITIONS = [('start', 0.0), ('middle', 0.5), ('end', 1.0)]
+
+def edited_source(repeat, fraction):
+    # Changes one string literal, the way a developer changes one line
+    copy = min(repeat - 1, int(repeat * fraction))
+    edited = SNIPPET.replace('"halfway there"', '"halfway"')
+    return SNIPPET * copy + edited + SNIPPET * (repeat - copy - 1)
+
+def best_of(repeat, function):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compare a full re-parse with an incremental re-parse after a one-line edit.")
+    arg_parser.add_argument('--repeat', type=int, default=2000, help="number of copies of the sample program in the file")
+    arg_parser.add_argument('--runs', type=int, default=5, help="timed runs per measurement (best is reported)")
+    args = arg_parser.parse_args()
+
+    original = SNIPPET * args.repeat
+    full = best_of(args.runs, lambda: Parser(Lexer(original).tokenize()).parse())
+    print(f"{len(original):,} characters, {len(Parser(Lexer(original).tokenize()).parse()):,} top-level statements")
+    print(f"{'edit at':<8} {'full':>10} {'incremental':>12} {'speedup':>8}  work done")
+    for name, fraction in EDIT_POSITIONS:
+        edited = edited_source(args.repeat, fraction)
+        incremental = IncrementalParser()
+        incremental.parse(original)
+        texts = [edited, original]
+
+        def update():
+            # Alternate between the two versions, like saving an edit and undoing it
+            incremental.parse(texts[0])
+            texts.reverse()
+
+        seconds = best_of(args.runs, update)
+        print(f"{name:<8} {full * 1000:>8.1f}ms {seconds * 1000:>10.2f}ms {full / seconds:>7.0f}x  {incremental.summary()}")
+
+if __name__ == '__main__':
+    main()
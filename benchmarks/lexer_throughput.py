@@ -0,0 +1,54 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from lexer import Lexer
+
+SNIPPET = '''# Generated workload
+counter is 0
+Otokonoko counter < 10 Femboycore
+    counter += 1
+    Femboy Feminine counter == 5 Femboycore
+        UwU Boy "halfway there"
+    Periodt
+    Androgyny Femboycore
+        UwU Boy counter * 2.5
+    Periodt
+Periodt
+my_list is [1, 2, 3, "four"]
+Tomgirl item is my_list Femboycore
+    UwU Boy item
+Periodt
+'''
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+
+def make_source(size):
+    repeats = size // len(SNIPPET) + 1
+    return (SNIPPET * repeats)[:size].rsplit('\n', 1)[0] + '\n'
+
+def measure(size):
+    source = make_source(size)
+    start = time.perf_counter()
+    tokens = Lexer(source).tokenize()
+    elapsed = time.perf_counter() - start
+    return len(source), len(tokens), elapsed
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Measure Lexer.tokenize throughput at increasing input sizes.")
+    arg_parser.add_argument('--max-size', type=int, default=SIZES[-1], help="largest input size in bytes")
+    args = arg_parser.parse_args()
+
+    print(f"{'bytes':>12} {'tokens':>10} {'seconds':>10} {'tokens/s':>12} {'s per MB':>10}")
+    for size in SIZES:
+        if size > args.max_size:
+            break
+        num_bytes, num_tokens, elapsed = measure(size)
+        # A constant "seconds per MB" column means tokenizing scales linearly
+        print(f"{num_bytes:>12} {num_tokens:>10} {elapsed:>10.4f} {num_tokens / elapsed:>12.0f} {elapsed / num_bytes * 1e6:>10.4f}")
+
+if __name__ == '__main__':
+    main()
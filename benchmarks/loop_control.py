@@ -0,0 +1,62 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from engine_speed import compare
+from main import ENGINES
+
+WORKLOADS = {
+    'for_plain': '''
+total is 0
+Tomgirl i is range({n}) Femboycore
+    total += 1
+Periodt
+UwU Boy total
+''',
+    'for_break_continue': '''
+total is 0
+Tomgirl i is range({n}) Femboycore
+    Femboy Feminine i == {n} - 1 Femboycore
+        Break
+    Periodt
+    Femboy Feminine i / 2 == 0 Femboycore
+        Continue
+    Periodt
+    total += 1
+Periodt
+UwU Boy total
+''',
+    'while_plain': '''
+i is 0
+Otokonoko i < {n} Femboycore
+    i++
+Periodt
+UwU Boy i
+''',
+    'while_break_continue': '''
+i is 0
+Otokonoko Kawaii Femboycore
+    i++
+    Femboy Feminine i < {n} Femboycore
+        Continue
+    Periodt
+    Break
+Periodt
+UwU Boy i
+''',
+}
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Time loops with and without Break/Continue on every engine.")
+    arg_parser.add_argument('-n', type=int, default=1_000_000, help="iterations per loop")
+    arg_parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES), default=sorted(ENGINES))
+    args = arg_parser.parse_args()
+
+    print(f"{'workload':<26} " + ' '.join(f"{name:>10}" for name in args.engines) + f" {'speedup':>8}")
+    for name, template in WORKLOADS.items():
+        compare(name, template.replace('{n}', str(args.n)), args.engines)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import argparse
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from lexer import Lexer
+from main import ENGINES
+from output import OUTPUT_BUFFER_SIZE
+from parser import Parser
+
+PROGRAM = '''
+Tomgirl i is range({n}) Femboycore
+    UwU Boy i
+Periodt
+'''
+
+def open_pipe():
+    # Write end of a pipe whose read end is drained by a thread, like a
+    # consumer process reading the program's output
+    read_fd, write_fd = os.pipe()
+
+    def drain():
+        with os.fdopen(read_fd, 'rb') as reader:
+            while reader.read(1 << 16):
+                pass
+
+    drainer = threading.Thread(target=drain, daemon=True)
+    drainer.start()
+    return os.fdopen(write_fd, 'w'), drainer
+
+def run(engine, ast, sink_name, buffer_size):
+    drainer = None
+    if sink_name == 'pipe':
+        sink, drainer = open_pipe()
+    elif sink_name == 'file':
+        sink = tempfile.TemporaryFile('w')
+    else:
+        sink = io.StringIO()
+    try:
+        start = time.perf_counter()
+        ENGINES[engine](ast, sink, buffer_size=buffer_size).interpret()
+        return time.perf_counter() - start
+    finally:
+        sink.close()
+        if drainer is not None:
+            drainer.join()
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Time printing many lines with and without output buffering.")
+    arg_parser.add_argument('-n', type=int, default=1_000_000, help="lines printed per run")
+    arg_parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES), default=['tree', 'vm'])
+    arg_parser.add_argument('--sinks', nargs='+', choices=['pipe', 'file', 'memory'], default=['pipe', 'file', 'memory'])
+    args = arg_parser.parse_args()
+
+    ast = Parser(Lexer(PROGRAM.replace('{n}', str(args.n))).tokenize()).parse()
+    print(f"{args.n:,} lines per run")
+    print(f"{'engine':<8} {'sink':<8} {'per line':>10} {'buffered':>10} {'speedup':>8}")
+    for engine in args.engines:
+        for sink_name in args.sinks:
+            unbuffered = run(engine, ast, sink_name, 0)
+            buffered = run(engine, ast, sink_name, OUTPUT_BUFFER_SIZE)
+            print(f"{engine:<8} {sink_name:<8} {unbuffered:>9.3f}s {buffered:>9.3f}s {unbuffered / buffered:>7.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from lexer import Lexer
+from main import ENGINES
+from parser import Parser
+from shapes import assign_shapes
+
+# Builds n uniform records, then reads two fields of each in a loop
+PROGRAM = '''
+Femboy person(i) Femboycore
+    Femme {"name": "someone", "age": i, "score": i * 2, "active": Kawaii}
+Periodt
+people is list(map("person", range({n})))
+total is 0
+i is 0
+Otokonoko i < {n} Femboycore
+    p is people[i]
+    total is total + p.age + p.score
+    i++
+Periodt
+UwU Boy total
+'''
+
+# Just the records, to measure what they take up
+BUILD_ONLY = '''
+Femboy person(i) Femboycore
+    Femme {"name": "someone", "age": i, "score": i * 2, "active": Kawaii}
+Periodt
+people is list(map("person", range({n})))
+'''
+
+def run(engine, ast):
+    start = time.perf_counter()
+    ENGINES[engine](ast, io.StringIO()).interpret()
+    return time.perf_counter() - start
+
+def memory(ast):
+    # Bytes still allocated when the program ends, with its variables alive
+    interpreter = ENGINES['tree'](ast, io.StringIO())
+    tracemalloc.start()
+    interpreter.interpret()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compare plain dictionaries with shaped records (--shapes).")
+    arg_parser.add_argument('-n', type=int, default=200_000, help="records per run")
+    arg_parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES), default=sorted(ENGINES))
+    args = arg_parser.parse_args()
+
+    full = Parser(Lexer(PROGRAM.replace('{n}', str(args.n))).tokenize()).parse()
+    build = Parser(Lexer(BUILD_ONLY.replace('{n}', str(args.n))).tokenize()).parse()
+    plain_bytes = memory(build)
+    shaped_bytes = memory(assign_shapes(build))
+    print(f"{args.n:,} records of 4 fields")
+    print(f"memory: {plain_bytes / args.n:.0f} bytes per dict, {shaped_bytes / args.n:.0f} bytes per record ({plain_bytes / shaped_bytes:.2f}x smaller)")
+    # Reading is the full program minus building
+    print(f"{'engine':<8} {'build dicts':>12} {'records':>9} {'read dicts':>11} {'records':>9} {'speedup':>8}")
+    for engine in args.engines:
+        build_plain = run(engine, build)
+        build_shaped = run(engine, assign_shapes(build))
+        read_plain = run(engine, full) - build_plain
+        read_shaped = run(engine, assign_shapes(full)) - build_shaped
+        print(f"{engine:<8} {build_plain:>11.3f}s {build_shaped:>8.3f}s {read_plain:>10.3f}s {read_shaped:>8.3f}s {read_plain / read_shaped:>7.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from lexer import Lexer
+from main import ENGINES
+from parser import Parser
+
+# 100 characters per piece (string values keep their quotes at runtime, so
+# the text between them is 98 characters)
+PIECE = 'x' * 98
+
+# s += piece goes through a StringBuilder; s is "" + s + piece is the same
+# string built by copying s every time, which is what += used to cost
+PROGRAMS = {
+    'append': '''
+s is ""
+i is 0
+Otokonoko i < {n} Femboycore
+    s += "{piece}"
+    i++
+Periodt
+UwU Boy len(s)
+''',
+    'copy': '''
+s is ""
+i is 0
+Otokonoko i < {n} Femboycore
+    s is "" + s + "{piece}"
+    i++
+Periodt
+UwU Boy len(s)
+''',
+}
+
+def run(engine, program, n):
+    source = program.replace('{n}', str(n)).replace('{piece}', PIECE)
+    ast = Parser(Lexer(source).tokenize()).parse()
+    start = time.perf_counter()
+    ENGINES[engine](ast, io.StringIO()).interpret()
+    return time.perf_counter() - start
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Time building a long string piece by piece with +=.")
+    arg_parser.add_argument('--megabytes', type=float, nargs='+', default=[0.5, 1, 2, 5, 10], help="sizes of the built string")
+    arg_parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES), default=sorted(ENGINES))
+    arg_parser.add_argument('--copy-limit', type=float, default=2, help="largest size (MB) also built by copying; copying is quadratic")
+    args = arg_parser.parse_args()
+
+    print(f"{'engine':<8} {'size':>8} {'+=':>9} {'per MB':>9} {'copying':>9}")
+    for engine in args.engines:
+        for megabytes in args.megabytes:
+            n = int(megabytes * 1_000_000) // (len(PIECE) + 2)
+            append = run(engine, PROGRAMS['append'], n)
+            copy = f"{run(engine, PROGRAMS['copy'], n):>8.3f}s" if megabytes <= args.copy_limit else f"{'-':>9}"
+            print(f"{engine:<8} {megabytes:>6g}MB {append:>8.3f}s {append / megabytes:>8.3f}s {copy}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+import argparse
+import contextlib
+import glob
+import io
+import json
+import math
+import os
+import platform
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from interpreter import Interpreter
+from lexer import Lexer
+from parser import Parser
+
+PHASES = ('lex', 'parse', 'interpret')
+
+# Lexing and parsing scale with the source text, running with the workload
+# size n (a loop of n iterations has a source of nearly constant length)
+FIT_AGAINST_BYTES = {'lex', 'parse'}
+
+# A fitted exponent above this means a phase grows faster than linearly
+SUPERLINEAR_EXPONENT = 1.3
+
+# Timings shorter than this are mostly noise and are not gated on
+MIN_COMPARED_SECONDS = 0.001
+
+def straight_line(n):
+    return ''.join(f"x{i} is {i} * 2 + {i % 7}\n" for i in range(n))
+
+def deep_nesting(n):
+    # 50 separate nests of depth n, so even shallow ones take measurable time
+    lines = []
+    for depth in range(n):
+        lines.append('    ' * depth + f"Femboy Feminine {depth} < {n} Femboycore")
+    lines.append('    ' * n + 'hits is 1')
+    for depth in reversed(range(n)):
+        lines.append('    ' * depth + 'Periodt')
+    return ('\n'.join(lines) + '\n') * 50
+
+def tight_loop(n):
+    return f'''i is 0
+total is 0
+Otokonoko i < {n} Femboycore
+    total is total + i * 2
+    i++
+Periodt
+'''
+
+def recursion(n):
+    return f'''Femboy depth(k) Femboycore
+    Femboy Feminine k == 0 Femboycore
+        Femme 0
+    Periodt
+    Femme 1 + depth(k - 1)
+Periodt
+total is 0
+Tomgirl i is range({n}) Femboycore
+    total is total + depth(10)
+Periodt
+'''
+
+def big_literals(n):
+    elements = ', '.join(str(i) for i in range(n))
+    pairs = ', '.join(f'"key{i}": {i}' for i in range(n))
+    return f"numbers is [{elements}]\ntable is {{{pairs}}}\n"
+
+# name -> (source generator, sizes, unit of n). Nesting depth is bounded by
+# Python's recursion limit, so its sizes are never scaled.
+WORKLOADS = {
+    'straight_line': (straight_line, [500, 1_000, 2_000, 4_000], 'statements'),
+    'deep_nesting': (deep_nesting, [10, 20, 40, 80], 'levels'),
+    'tight_loop': (tight_loop, [5_000, 10_000, 20_000, 40_000], 'iterations'),
+    'recursion': (recursion, [250, 500, 1_000, 2_000], 'outer calls'),
+    'big_literals': (big_literals, [1_000, 2_000, 4_000, 8_000], 'elements'),
+}
+FIXED_SIZE_WORKLOADS = {'deep_nesting'}
+
+def run_phases(source, repeat):
+    # Best-of-repeat time for each phase; every phase gets fresh input
+    best = dict.fromkeys(PHASES, math.inf)
+    stdin = sys.stdin
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            tokens = Lexer(source).tokenize()
+            best['lex'] = min(best['lex'], time.perf_counter() - start)
+
+            start = time.perf_counter()
+            ast = Parser(tokens).parse()
+            best['parse'] = min(best['parse'], time.perf_counter() - start)
+
+            # Answers for scripts that call ask()
+            sys.stdin = io.StringIO('femboy\n' * 16)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                Interpreter(ast).interpret()
+            best['interpret'] = min(best['interpret'], time.perf_counter() - start)
+    finally:
+        sys.stdin = stdin
+    return best
+
+def fit_exponent(sizes, times):
+    # Least-squares slope of log(time) against log(size): 1 is linear, 2 quadratic.
+    # Inputs that barely grow give no meaningful slope.
+    if max(sizes) < 2 * min(sizes):
+        return None
+    points = [(math.log(size), math.log(elapsed)) for size, elapsed in zip(sizes, times) if elapsed > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    if variance == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+
+def run_workload(name, scale, repeat):
+    generate, sizes, unit = WORKLOADS[name]
+    if name not in FIXED_SIZE_WORKLOADS:
+        sizes = [max(1, int(size * scale)) for size in sizes]
+    runs = []
+    for size in sizes:
+        source = generate(size)
+        runs.append({'size': size, 'bytes': len(source), 'seconds': run_phases(source, repeat)})
+
+    byte_sizes = [run['bytes'] for run in runs]
+    phases = {}
+    for phase in PHASES:
+        times = [run['seconds'][phase] for run in runs]
+        largest = runs[-1]
+        phases[phase] = {
+            'sizes': sizes,
+            'seconds': times,
+            'exponent': fit_exponent(byte_sizes if phase in FIT_AGAINST_BYTES else sizes, times),
+            'units_per_second': largest['size'] / times[-1] if times[-1] else None,
+        }
+    return {'unit': unit, 'bytes': byte_sizes, 'phases': phases}
+
+def run_examples(repeat):
+    results = {}
+    for path in sorted(glob.glob(os.path.join(ROOT, 'examples', '*.fem'))):
+        with open(path) as f:
+            source = f.read()
+        seconds = run_phases(source, repeat)
+        results[os.path.basename(path)] = {
+            'unit': 'program',
+            'bytes': [len(source)],
+            'phases': {phase: {'sizes': [1], 'seconds': [seconds[phase]], 'exponent': None, 'units_per_second': None} for phase in PHASES},
+        }
+    return results
+
+def print_results(results):
+    print(f"{'workload':<26} {'phase':<10} {'largest n':>10} {'seconds':>10} {'n/second':>12} {'exponent':>9}")
+    for name, result in results.items():
+        for phase, data in result['phases'].items():
+            exponent = data['exponent']
+            rate = data['units_per_second']
+            flag = '  superlinear' if exponent is not None and exponent > SUPERLINEAR_EXPONENT else ''
+            print(
+                f"{name:<26} {phase:<10} {data['sizes'][-1]:>10} {data['seconds'][-1]:>10.4f} "
+                f"{'' if rate is None else f'{rate:,.0f}':>12} {'' if exponent is None else f'{exponent:.2f}':>9}{flag}"
+            )
+
+def compare_with_baseline(results, baseline, threshold):
+    # Compares the time at the largest size common to both runs. Returns the
+    # regressions slower than the baseline by more than threshold (0.25 = 25%).
+    regressions = []
+    print(f"\n{'workload':<26} {'phase':<10} {'baseline s':>11} {'current s':>11} {'change':>8}")
+    for name, result in results.items():
+        if name not in baseline['results']:
+            continue
+        for phase, data in result['phases'].items():
+            old = baseline['results'][name]['phases'].get(phase)
+            if old is None:
+                continue
+            common = sorted(set(data['sizes']) & set(old['sizes']))
+            if not common:
+                continue
+            size = common[-1]
+            current = data['seconds'][data['sizes'].index(size)]
+            previous = old['seconds'][old['sizes'].index(size)]
+            if max(current, previous) < MIN_COMPARED_SECONDS:
+                continue
+            change = current / previous - 1
+            marker = '  REGRESSION' if change > threshold else ''
+            print(f"{name:<26} {phase:<10} {previous:>11.4f} {current:>11.4f} {change:>+8.1%}{marker}")
+            if change > threshold:
+                regressions.append((name, phase, change))
+    return regressions
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Time the lexer, parser and interpreter on generated workloads and the examples.")
+    arg_parser.add_argument('--workloads', nargs='+', choices=sorted(WORKLOADS), default=list(WORKLOADS), help="generated workloads to run")
+    arg_parser.add_argument('--no-examples', action='store_true', help="skip the programs in examples/")
+    arg_parser.add_argument('--scale', type=float, default=1.0, help="multiply every workload size (except nesting depth) by this factor")
+    arg_parser.add_argument('--repeat', type=int, default=3, help="runs per measurement; the fastest is kept")
+    arg_parser.add_argument('--output', metavar='PATH', help="write the results as JSON (use as a later --baseline)")
+    arg_parser.add_argument('--baseline', metavar='PATH', help="compare against results saved with --output")
+    arg_parser.add_argument('--threshold', type=float, default=0.25, help="fail when a phase is slower than the baseline by more than this fraction (default: 0.25)")
+    args = arg_parser.parse_args()
+
+    results = {name: run_workload(name, args.scale, args.repeat) for name in args.workloads}
+    if not args.no_examples:
+        results.update(run_examples(args.repeat))
+    print_results(results)
+
+    if args.output:
+        report = {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'scale': args.scale,
+            'repeat': args.repeat,
+            'results': results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above the {args.threshold:.0%} threshold")
+            sys.exit(1)
+        print(f"\nNo regressions above the {args.threshold:.0%} threshold")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from lexer import Lexer
+from lexer_throughput import make_source
+
+class DictToken:
+    # The original token layout: a plain object with a per-instance __dict__
+    def __init__(self, type, value):
+        self.type = type
+        self.value = value
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tokens = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return len(tokens), allocated
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compare memory per token for the different token layouts.")
+    arg_parser.add_argument('--size', type=int, default=1_000_000, help="source size in bytes")
+    args = arg_parser.parse_args()
+
+    source = make_source(args.size)
+    layouts = [
+        ('dict tokens (list)', lambda: [DictToken(token.type, token.value) for token in Lexer(source).iter_tokens()]),
+        ('slotted tokens (list)', lambda: list(Lexer(source).iter_tokens())),
+        ('TokenArray', lambda: Lexer(source).tokenize()),
+    ]
+    print(f"{'layout':<24} {'tokens':>10} {'bytes':>12} {'bytes/token':>12}")
+    for name, build in layouts:
+        count, allocated = measure(build)
+        print(f"{name:<24} {count:>10} {allocated:>12} {allocated / count:>12.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+import contextlib
+import glob
+import io
+import os
+import signal
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from cache import CACHE_DIRECTORY
+
+class ScriptTimeout(BaseException):
+    # Not an Exception, so a Twink/Bimboy in the script cannot swallow it
+    pass
+
+def collect_scripts(paths):
+    # Files are taken as given; directories contribute every .fem file below
+    # them and quoted glob patterns are expanded, both in sorted order
+    scripts = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, subdirectories, files in os.walk(path):
+                subdirectories[:] = sorted(name for name in subdirectories if name != CACHE_DIRECTORY)
+                scripts.extend(os.path.join(directory, name) for name in sorted(files) if name.endswith('.fem'))
+        elif glob.has_magic(path):
+            scripts.extend(sorted(glob.glob(path, recursive=True)))
+        else:
+            scripts.append(path)
+    return scripts
+
+def raise_timeout(signum, frame):
+    # SIGALRM handler for script timeouts (also used by the warm server)
+    raise ScriptTimeout()
+
+def run_script(path, options):
+    # Runs one script in this (worker) process with its output captured.
+    # Returns (path, status, seconds, stdout, stderr) with status 'ok',
+    # 'error' or 'timeout'.
+    from main import parse_source, recursion_message, run_program
+    from optimizer import Optimizer
+    from shapes import assign_shapes
+
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    status = 'ok'
+    timeout = options['timeout']
+    previous_stdin = sys.stdin
+    sys.stdin = io.StringIO()
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                try:
+                    if timeout:
+                        signal.signal(signal.SIGALRM, raise_timeout)
+                        signal.setitimer(signal.ITIMER_REAL, timeout)
+                    ast = parse_source(path, use_cache=options['use_cache'])
+                    if options['optimize']:
+                        optimizer = Optimizer()
+                        ast = optimizer.optimize_program(ast)
+                        print(optimizer.report(), file=sys.stderr)
+                    if options['shapes']:
+                        ast = assign_shapes(ast)
+                    run_program(ast, options['engine'], options['resolve'], buffer_size=options['buffer_size'])
+                finally:
+                    # Cancelled before the result is handled, so the alarm
+                    # cannot go off in a handler below once the script is done
+                    if timeout:
+                        signal.setitimer(signal.ITIMER_REAL, 0)
+            except ScriptTimeout:
+                status = 'timeout'
+                print(f"Error: timed out after {timeout:g} s", file=sys.stderr)
+            except FileNotFoundError:
+                status = 'error'
+                print(f"Error: File not found: {path}")
+            except RecursionError:
+                status = 'error'
+                print(recursion_message(options['engine']), file=sys.stderr)
+            except Exception:
+                status = 'error'
+                print(traceback.format_exc(), end='', file=sys.stderr)
+    finally:
+        sys.stdin = previous_stdin
+    return path, status, time.perf_counter() - start, stdout.getvalue(), stderr.getvalue()
+
+def run_batch(scripts, jobs, options):
+    # Runs the scripts on a pool of worker processes. Each script's output is
+    # printed as a block, in the order given, followed by a summary. Returns
+    # the number of scripts that failed or timed out.
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for result in executor.map(run_script, scripts, [options] * len(scripts)):
+            path, status, seconds, stdout, stderr = result
+            print(f"==> {path} ({status}, {seconds:.3f} s) <==")
+            sys.stdout.write(stdout)
+            sys.stdout.write(stderr)
+            sys.stdout.flush()
+            results.append(result)
+    elapsed = time.perf_counter() - start
+
+    print()
+    print(f"{'status':<8} {'seconds':>9}  script")
+    for path, status, seconds, _, _ in results:
+        print(f"{status:<8} {seconds:>9.3f}  {path}")
+    counts = {status: sum(1 for result in results if result[1] == status) for status in ('ok', 'error', 'timeout')}
+    total_script_time = sum(result[2] for result in results)
+    print(
+        f"\n{len(results)} scripts: {counts['ok']} ok, {counts['error']} failed, {counts['timeout']} timed out "
+        f"in {elapsed:.3f} s on {jobs} worker{'s' if jobs != 1 else ''} ({total_script_time:.3f} s of script time)"
+    )
+    return counts['error'] + counts['timeout']
@@ -0,0 +1,426 @@
+from functools import partial
+
+from interpreter import BreakLoop, ContinueLoop, ReturnValue
+from parser import BinOp, FunctionCall, LogicalOp, Op
+from shapes import PropertyCache, Record
+from strings import append_operand, append_targets
+
+# Opcodes. Every instruction is two slots wide in CodeObject.instructions:
+# the opcode followed by a single integer argument (0 when unused).
+LOAD_CONST = 0          # push constants[arg]
+LOAD_NAME = 1           # push the variable names[arg], searching every scope
+STORE_NAME = 2          # pop a value into names[arg] in the innermost scope
+BINARY_OP = 3           # pop right, pop left, push BINARY_OPERATORS[Op(arg)](left, right)
+COMPARE_OP = 4          # same as BINARY_OP with COMPARISON_OPERATORS
+JUMP = 5                # continue at offset arg
+POP_JUMP_IF_FALSE = 6   # pop a value and jump to arg if it is falsy
+JUMP_IF_FALSE_OR_POP = 7  # 'and': keep the value and jump if falsy, else pop it
+JUMP_IF_TRUE_OR_POP = 8   # 'or': keep the value and jump if truthy, else pop it
+UNARY_NOT = 9
+INCREMENT = 10          # names[arg] += 1 in the innermost scope
+DECREMENT = 11
+CALL_FUNCTION = 12      # call the function under the arguments of the CallSite constants[arg]
+RETURN_VALUE = 13
+FOR_ITER = 14           # store next(iterator) as the STORE_LOOP_NAME that follows does, or pop the iterator and jump to arg
+PUSH_SCOPE = 15         # push an empty scope (a Tomgirl loop's, reused by every iteration)
+POP_SCOPE = 16
+GET_ITER = 17
+POP_TOP = 18
+PRINT = 19
+BUILD_LIST = 20         # arg is the element count
+BUILD_DICT = 21         # arg is the pair count
+INDEX = 22
+PROPERTY = 23           # property names[arg] of the popped target
+SETUP_TRY = 24          # install an except handler at offset arg
+POP_TRY = 25
+DEFINE_FUNCTION = 26    # register the FunctionCode constants[arg]
+RAISE = 27              # raise the exception class constants[arg] (ReturnValue takes the popped value)
+STORE_LOOP_NAME = 28    # pop the next item into names[arg] in the loop scope, clearing what the last iteration assigned
+LOAD_FUNCTION = 29      # push the entry of the CallSite constants[arg], bound before its arguments are evaluated
+TAIL_CALL = 30          # CALL_FUNCTION that reuses the current frame for a user function; always followed by RETURN_VALUE
+LOAD_APPEND_TARGET = 31  # push names[arg] as stored (a StringBuilder is not joined) for APPEND_NAME
+APPEND_NAME = 32        # pop a value and the target below it into names[arg]: x is x + value
+LOAD_APPENDED_NAME = 33  # LOAD_NAME for a variable assigned by APPEND_NAME, joining a StringBuilder
+BUILD_RECORD = 34       # constants[arg] is a Record class; pop one value per key (see shapes.py)
+CACHED_PROPERTY = 35    # PROPERTY through the PropertyCache constants[arg]
+
+OPCODE_NAMES = {value: name for name, value in list(globals().items()) if name.isupper() and isinstance(value, int)}
+
+# Opcodes whose argument is a jump target, an index into names, or into constants
+JUMP_OPCODES = {JUMP, POP_JUMP_IF_FALSE, JUMP_IF_FALSE_OR_POP, JUMP_IF_TRUE_OR_POP, FOR_ITER, SETUP_TRY}
+NAME_OPCODES = {LOAD_NAME, STORE_NAME, INCREMENT, DECREMENT, STORE_LOOP_NAME, PROPERTY, LOAD_APPEND_TARGET, APPEND_NAME, LOAD_APPENDED_NAME}
+CONST_OPCODES = {LOAD_CONST, LOAD_FUNCTION, CALL_FUNCTION, DEFINE_FUNCTION, RAISE, TAIL_CALL, BUILD_RECORD, CACHED_PROPERTY}
+
+class CodeObject:
+    __slots__ = ('name', 'instructions', 'constants', 'names')
+
+    def __init__(self, name, instructions, constants, names):
+        self.name = name
+        self.instructions = instructions
+        self.constants = constants
+        self.names = names
+
+class FunctionCode:
+    # A compiled user function; deliberately not callable, so the VM can tell
+    # it apart from built-ins in the shared function table
+    __slots__ = ('name', 'parameters', 'code')
+
+    def __init__(self, name, parameters, code):
+        self.name = name
+        self.parameters = parameters
+        self.code = code
+
+class CallSite:
+    # The inline cache of one call: entry is what the name resolved to while
+    # the interpreter's function table was at that version. Function table
+    # versions are never reused (see interpreter.py), so code shared by
+    # several VMs stays correct; entry is replaced as a whole.
+    __slots__ = ('name', 'argc', 'entry')
+
+    def __init__(self, name, argc):
+        self.name = name
+        self.argc = argc
+        # (functions_version, function, is_builtin)
+        self.entry = (None, None, False)
+
+    def __repr__(self):
+        return repr((self.name, self.argc))
+
+class BytecodeCompiler:
+    def __init__(self, name='<module>', in_function=False, append_targets=frozenset()):
+        self.name = name
+        self.in_function = in_function
+        # Names that may hold a StringBuilder (strings.append_targets)
+        self.append_targets = append_targets
+        self.instructions = []
+        self.constants = []
+        self.constant_indexes = {}
+        self.names = []
+        self.name_indexes = {}
+        # One entry per enclosing loop: (kind, try depth at loop entry, break jumps, continue target)
+        self.loops = []
+        self.try_depth = 0
+
+    def compile_program(self, ast):
+        for node in ast:
+            self.compile_statement(node)
+        self.emit(LOAD_CONST, self.constant(None))
+        self.emit(RETURN_VALUE)
+        return self.code_object()
+
+    def code_object(self):
+        return CodeObject(self.name, tuple(self.instructions), tuple(self.constants), tuple(self.names))
+
+    def emit(self, opcode, arg=0):
+        self.instructions.append(opcode)
+        self.instructions.append(arg)
+        return len(self.instructions) - 2
+
+    def label(self):
+        return len(self.instructions)
+
+    def patch(self, offset, target=None):
+        self.instructions[offset + 1] = self.label() if target is None else target
+
+    def constant(self, value):
+        # Key on the type too, so 1, 1.0 and True stay distinct constants
+        key = (type(value), value)
+        if key not in self.constant_indexes:
+            self.constant_indexes[key] = len(self.constants)
+            self.constants.append(value)
+        return self.constant_indexes[key]
+
+    def name_index(self, name):
+        if name not in self.name_indexes:
+            self.name_indexes[name] = len(self.names)
+            self.names.append(name)
+        return self.name_indexes[name]
+
+    def compile_statement(self, node):
+        method = getattr(self, f'statement_{type(node).__name__}', None)
+        if method is not None:
+            method(node)
+        else:
+            # Expression statements (function calls, ++/--) discard their value
+            self.compile_expression(node)
+            self.emit(POP_TOP)
+
+    def compile_expression(self, node):
+        self._compile_work([node])
+
+    def _compile_work(self, work):
+        # Nested expressions are compiled from an explicit work list instead of
+        # Python's stack, so no depth of nesting exhausts the recursion limit.
+        # Each step emits what it can and returns the rest, in order: nodes to
+        # compile, (opcode, argument) pairs to emit and further steps to call.
+        work.reverse()
+        while work:
+            item = work.pop()
+            if item.__class__ is tuple:
+                self.emit(*item)
+                continue
+            if callable(item):
+                rest = item()
+            else:
+                method = getattr(self, f'expression_{type(item).__name__}', None)
+                if method is None:
+                    raise Exception(f'No bytecode rule for {type(item).__name__}')
+                rest = method(item)
+            if rest:
+                work.extend(reversed(rest))
+
+    # Statements
+
+    def statement_Print(self, node):
+        self.compile_expression(node.value)
+        self.emit(PRINT)
+
+    def statement_Assign(self, node):
+        operand = append_operand(node)
+        if operand is not None:
+            # Strings grow in a StringBuilder (see strings.py)
+            name = self.name_index(node.left.value)
+            self.emit(LOAD_APPEND_TARGET, name)
+            self.compile_expression(operand)
+            self.emit(APPEND_NAME, name)
+            return
+        self.compile_expression(node.right)
+        self.emit(STORE_NAME, self.name_index(node.left.value))
+
+    def statement_Increment(self, node):
+        self.emit(INCREMENT, self.name_index(node.var_name.value))
+
+    def statement_Decrement(self, node):
+        self.emit(DECREMENT, self.name_index(node.var_name.value))
+
+    def statement_Block(self, node):
+        for statement in node.statements:
+            self.compile_statement(statement)
+
+    def statement_IfStatement(self, node):
+        self.compile_expression(node.condition)
+        jump_to_else = self.emit(POP_JUMP_IF_FALSE)
+        self.compile_statement(node.if_block)
+        if node.else_block is None:
+            self.patch(jump_to_else)
+            return
+        jump_to_end = self.emit(JUMP)
+        self.patch(jump_to_else)
+        self.compile_statement(node.else_block)
+        self.patch(jump_to_end)
+
+    def statement_WhileStatement(self, node):
+        start = self.label()
+        self.compile_expression(node.condition)
+        exit_jump = self.emit(POP_JUMP_IF_FALSE)
+        loop = ('while', self.try_depth, [], start)
+        self.loops.append(loop)
+        self.compile_statement(node.body)
+        self.loops.pop()
+        self.emit(JUMP, start)
+        self.patch(exit_jump)
+        for offset in loop[2]:
+            self.patch(offset)
+
+    def statement_ForStatement(self, node):
+        self.compile_expression(node.iterable)
+        self.emit(GET_ITER)
+        # One scope serves every iteration, as in the tree-walking engine
+        self.emit(PUSH_SCOPE)
+        start = self.label()
+        exit_jump = self.emit(FOR_ITER)
+        self.emit(STORE_LOOP_NAME, self.name_index(node.var_name))
+        loop = ('for', self.try_depth, [], start)
+        self.loops.append(loop)
+        self.compile_statement(node.body)
+        self.loops.pop()
+        self.emit(JUMP, start)
+        self.patch(exit_jump)
+        for offset in loop[2]:
+            self.patch(offset)
+        self.emit(POP_SCOPE)
+
+    def _leave_try_blocks(self, loop):
+        for _ in range(self.try_depth - loop[1]):
+            self.emit(POP_TRY)
+
+    def statement_BreakStatement(self, node):
+        if not self.loops:
+            # Outside a loop the Break leaves the function; the VM reports it
+            # as an error at the call
+            self.emit(RAISE, self.constant(BreakLoop))
+            return
+        loop = self.loops[-1]
+        self._leave_try_blocks(loop)
+        if loop[0] == 'for':
+            # The loop's iterator; its scope is popped where the loop ends
+            self.emit(POP_TOP)
+        loop[2].append(self.emit(JUMP))
+
+    def statement_ContinueStatement(self, node):
+        if not self.loops:
+            self.emit(RAISE, self.constant(ContinueLoop))
+            return
+        loop = self.loops[-1]
+        self._leave_try_blocks(loop)
+        self.emit(JUMP, loop[3])
+
+    def statement_TryExceptStatement(self, node):
+        setup = self.emit(SETUP_TRY)
+        self.try_depth += 1
+        self.compile_statement(node.try_block)
+        self.try_depth -= 1
+        self.emit(POP_TRY)
+        jump_to_end = self.emit(JUMP)
+        self.patch(setup)
+        self.compile_statement(node.except_block)
+        self.patch(jump_to_end)
+
+    def statement_FunctionDefinition(self, node):
+        function_compiler = BytecodeCompiler(node.name, in_function=True, append_targets=self.append_targets)
+        function_compiler.compile_statement(node.body)
+        function_compiler.emit(LOAD_CONST, function_compiler.constant(None))
+        function_compiler.emit(RETURN_VALUE)
+        function = FunctionCode(node.name, tuple(node.parameters), function_compiler.code_object())
+        self.emit(DEFINE_FUNCTION, self.constant(function))
+
+    def statement_ReturnStatement(self, node):
+        if self.in_function and not self.try_depth and isinstance(node.value, FunctionCall):
+            # Femme f(...) in tail position. Inside a Twink the call is not a
+            # tail call: an error in f must still reach the handler here.
+            self._compile_work(self._call(node.value, TAIL_CALL))
+            self.emit(RETURN_VALUE)
+            return
+        self.compile_expression(node.value)
+        if self.in_function:
+            self.emit(RETURN_VALUE)
+        else:
+            # A top-level Femme has nothing to return to
+            self.emit(RAISE, self.constant(ReturnValue))
+
+    # Expressions
+
+    def expression_Number(self, node):
+        self.emit(LOAD_CONST, self.constant(node.value))
+
+    expression_String = expression_Number
+    expression_Boolean = expression_Number
+
+    def expression_Null(self, node):
+        self.emit(LOAD_CONST, self.constant(None))
+
+    def expression_Variable(self, node):
+        self.emit(LOAD_APPENDED_NAME if node.value in self.append_targets else LOAD_NAME, self.name_index(node.value))
+
+    def _left_spine(self, node, node_type):
+        # a + b + c parses as ((a + b) + c): the leftmost operand, then the
+        # operators from the innermost out
+        spine = []
+        while isinstance(node, node_type):
+            spine.append(node)
+            node = node.left
+        spine.reverse()
+        return node, spine
+
+    def expression_BinOp(self, node):
+        first, spine = self._left_spine(node, BinOp)
+        work = [first]
+        for binop in spine:
+            work += [binop.right, (BINARY_OP, int(binop.op))]
+        return work
+
+    def expression_Comparison(self, node):
+        return [node.left, node.right, (COMPARE_OP, int(node.op))]
+
+    def expression_LogicalOp(self, node):
+        first, spine = self._left_spine(node, LogicalOp)
+        work = [first]
+        for logical_op in spine:
+            work.append(partial(self._short_circuit, logical_op))
+        return work
+
+    def _short_circuit(self, node):
+        # The jump over the right operand is patched once that is compiled
+        jump = self.emit(JUMP_IF_FALSE_OR_POP if node.op is Op.AND else JUMP_IF_TRUE_OR_POP)
+        return [node.right, partial(self.patch, jump)]
+
+    def expression_UnaryOp(self, node):
+        return [node.right, (UNARY_NOT, 0)]
+
+    def expression_Increment(self, node):
+        self.statement_Increment(node)
+        self.emit(LOAD_CONST, self.constant(None))
+
+    def expression_Decrement(self, node):
+        self.statement_Decrement(node)
+        self.emit(LOAD_CONST, self.constant(None))
+
+    def expression_List(self, node):
+        return [*node.elements, (BUILD_LIST, len(node.elements))]
+
+    def expression_Dictionary(self, node):
+        work = []
+        for key, value in node.pairs:
+            work += [key, value]
+        work.append((BUILD_DICT, len(node.pairs)))
+        return work
+
+    def expression_IndexAccess(self, node):
+        return [node.target, node.index, (INDEX, 0)]
+
+    def expression_PropertyAccess(self, node):
+        return [node.target, (PROPERTY, self.name_index(node.property_name))]
+
+    def expression_RecordLiteral(self, node):
+        return [*node.values, (BUILD_RECORD, self.constant(node.record_class))]
+
+    def expression_CachedPropertyAccess(self, node):
+        return [node.target, (CACHED_PROPERTY, self.constant(PropertyCache(node.property_name)))]
+
+    def expression_FunctionCall(self, node):
+        return self._call(node, CALL_FUNCTION)
+
+    def _call(self, node, opcode):
+        # The function is looked up before the arguments run, as in the tree
+        # walker: an argument that redefines it does not change which one is called
+        site = self.constant(CallSite(node.name, len(node.arguments)))
+        return [(LOAD_FUNCTION, site), *node.arguments, (opcode, site)]
+
+def compile_ast(ast):
+    return BytecodeCompiler(append_targets=append_targets(ast)).compile_program(ast)
+
+def disassemble(code, lines=None):
+    # Returns a dis-style listing of code and every function it defines
+    lines = [] if lines is None else lines
+    lines.append(f"Disassembly of {code.name}:")
+    targets = {code.instructions[offset + 1] for offset in range(0, len(code.instructions), 2) if code.instructions[offset] in JUMP_OPCODES}
+    functions = []
+    for offset in range(0, len(code.instructions), 2):
+        opcode, arg = code.instructions[offset], code.instructions[offset + 1]
+        marker = '>>' if offset in targets else '  '
+        detail = ''
+        if opcode in JUMP_OPCODES:
+            detail = f'(to {arg})'
+        elif opcode in NAME_OPCODES:
+            detail = f'({code.names[arg]})'
+        elif opcode in CONST_OPCODES:
+            value = code.constants[arg]
+            if isinstance(value, FunctionCode):
+                functions.append(value)
+                detail = f'(<function {value.name}({", ".join(value.parameters)})>)'
+            elif isinstance(value, type) and issubclass(value, Record):
+                detail = f"(shape {', '.join(map(repr, value.shape_keys))})"
+            elif isinstance(value, PropertyCache):
+                detail = f'({value.property_name})'
+            elif isinstance(value, type):
+                detail = f'({value.__name__})'
+            else:
+                detail = f'({value!r})'
+        elif opcode in (BINARY_OP, COMPARE_OP):
+            detail = f'({Op(arg).name})'
+        show_arg = arg if opcode in JUMP_OPCODES | NAME_OPCODES | CONST_OPCODES | {BINARY_OP, COMPARE_OP, BUILD_LIST, BUILD_DICT} else ''
+        lines.append(f"{marker} {offset:>5} {OPCODE_NAMES[opcode]:<22} {show_arg!s:>4} {detail}".rstrip())
+    for function in functions:
+        lines.append('')
+        disassemble(function.code, lines)
+    return '\n'.join(lines)
@@ -0,0 +1,78 @@
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+
+import lexer
+import parser
+
+CACHE_DIRECTORY = '__femcache__'
+CACHE_SUFFIX = '.femc'
+MAGIC = b'FEMC'
+
+# Bump when the shape of the AST changes in a way the lexer/parser source
+# fingerprint below cannot see
+CACHE_FORMAT = 1
+
+def _interpreter_fingerprint():
+    # Cached trees are only valid for the lexer and parser that built them.
+    # The Python version matters too: it decides the pickle and enum formats.
+    digest = hashlib.sha256(f'{CACHE_FORMAT}:{sys.version_info[0]}.{sys.version_info[1]}'.encode())
+    for module in (lexer, parser):
+        try:
+            with open(module.__file__, 'rb') as f:
+                digest.update(f.read())
+        except (OSError, TypeError):
+            # Frozen builds ship without sources; fall back to CACHE_FORMAT
+            pass
+    return digest.digest()
+
+INTERPRETER_FINGERPRINT = _interpreter_fingerprint()
+
+def cache_key(text):
+    return hashlib.sha256(INTERPRETER_FINGERPRINT + text.encode('utf-8', 'surrogatepass')).digest()
+
+def cache_path(file_path):
+    # examples/hello.fem -> examples/__femcache__/hello.fem.femc
+    directory, file_name = os.path.split(os.path.abspath(file_path))
+    return os.path.join(directory, CACHE_DIRECTORY, file_name + CACHE_SUFFIX)
+
+def load_cached_program(file_path, key):
+    # Returns the cached AST, or None if there is no entry for this exact
+    # source text and interpreter
+    try:
+        with open(cache_path(file_path), 'rb') as f:
+            header = f.read(len(MAGIC) + len(key))
+            if header != MAGIC + key:
+                return None
+            return pickle.load(f)
+    except Exception:
+        # Missing, truncated or unreadable entries are just cache misses
+        return None
+
+def store_cached_program(file_path, key, program):
+    # Writes to a temporary file next to the entry and renames it into place,
+    # so concurrent runs only ever see a complete old or new entry
+    path = cache_path(file_path)
+    directory = os.path.dirname(path)
+    temporary_path = None
+    try:
+        os.makedirs(directory, exist_ok=True)
+        data = pickle.dumps(program, protocol=pickle.HIGHEST_PROTOCOL)
+        fd, temporary_path = tempfile.mkstemp(prefix='.tmp-', suffix=CACHE_SUFFIX, dir=directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC + key)
+            f.write(data)
+        os.replace(temporary_path, path)
+        temporary_path = None
+    except (OSError, RecursionError, pickle.PicklingError):
+        # A read-only directory or a tree too deep to pickle only costs the
+        # next run a re-parse
+        pass
+    finally:
+        if temporary_path is not None:
+            try:
+                os.unlink(temporary_path)
+            except OSError:
+                pass
@@ -0,0 +1,118 @@
+import json
+import os
+import socket
+import struct
+import sys
+
+# Kept free of interpreter imports so the fast path starts in milliseconds
+
+USAGE = "usage: client.py [--engine {closure,python,tree,vm}] [--resolve] [-O] [--stdin] file"
+
+def socket_directory():
+    # $XDG_RUNTIME_DIR is private to the user already. Otherwise the server
+    # creates femcode-<uid> in the temp directory, readable only by its owner.
+    return os.environ.get('XDG_RUNTIME_DIR') or os.path.join(os.environ.get('TMPDIR', '/tmp'), f'femcode-{os.getuid()}')
+
+def default_socket_path():
+    return os.environ.get('FEMCODE_SOCKET') or os.path.join(socket_directory(), 'femcode.sock')
+
+def check_owner(path):
+    # Raises PermissionError unless path belongs to the current user
+    if os.stat(path).st_uid != os.getuid():
+        raise PermissionError(f"{path} belongs to another user")
+
+def parse_arguments(argv):
+    # Returns the run request for the arguments the server understands, or
+    # None when they need the full command line
+    request = {'engine': 'tree', 'resolve': False, 'optimize': False, 'stdin': ''}
+    forward_stdin = False
+    path = None
+    arguments = iter(argv)
+    for argument in arguments:
+        if argument == '--engine':
+            request['engine'] = next(arguments, None)
+        elif argument.startswith('--engine='):
+            request['engine'] = argument.partition('=')[2]
+        elif argument == '--resolve':
+            request['resolve'] = True
+        elif argument in ('-O', '--optimize'):
+            request['optimize'] = True
+        elif argument == '--transpile':
+            request['engine'] = 'python'
+        elif argument == '--stdin':
+            forward_stdin = True
+        elif argument.startswith('-') or path is not None:
+            return None
+        else:
+            path = argument
+    if path is None or request['engine'] not in ('closure', 'python', 'tree', 'vm'):
+        return None
+    if request['resolve'] and request['engine'] != 'tree':
+        return None
+    request['path'] = os.path.abspath(path)
+    request['cwd'] = os.getcwd()
+    if forward_stdin:
+        request['stdin'] = sys.stdin.read()
+    return request
+
+def check_peer(connection, socket_path):
+    # The server's own user, where the platform reports it (Linux). Unlike the
+    # owner of the socket file it cannot change between the check and the
+    # connect.
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return
+    credentials = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+    if struct.unpack('3i', credentials)[1] != os.getuid():
+        raise PermissionError(f"The server on {socket_path} belongs to another user")
+
+def send_request(socket_path, request):
+    # Nothing is sent (script paths, stdin) unless the socket and the server
+    # behind it belong to the current user
+    check_owner(socket_path)
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socket_path)
+        check_peer(connection, socket_path)
+        connection.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        chunks = []
+        while True:
+            chunk = connection.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        connection.close()
+    return json.loads(b''.join(chunks))
+
+def run_locally(argv):
+    # No server, or options only the full command line supports
+    argv = [argument for argument in argv if argument != '--stdin']
+    sys.argv = ['femterpreter'] + argv
+    import main
+    main.main()
+
+def main():
+    argv = sys.argv[1:]
+    if argv in ([], ['-h'], ['--help']):
+        print(USAGE)
+        print("Runs the file on the warm server at $FEMCODE_SOCKET (see server.py); any other femterpreter option, or no running server, runs it in this process instead. --stdin forwards this process's stdin to the script.")
+        return
+
+    request = parse_arguments(argv)
+    if request is None:
+        return run_locally(argv)
+    try:
+        response = send_request(default_socket_path(), request)
+    except (FileNotFoundError, ConnectionRefusedError):
+        return run_locally(argv)
+    except PermissionError as error:
+        print(f"Warning: {error}; running the script without the server", file=sys.stderr)
+        return run_locally(argv)
+
+    sys.stdout.write(response['stdout'])
+    sys.stderr.write(response['stderr'])
+    sys.stdout.flush()
+    sys.exit(response['exit_code'])
+
+if __name__ == '__main__':
+    main()
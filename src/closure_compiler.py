@@ -0,0 +1,335 @@
+from interpreter import CONTROL_FLOW_SIGNALS, Interpreter, ReturnValue, BreakLoop, ContinueLoop, outside_loop_error
+from parser import Op
+from runtime import BINARY_OPERATORS, COMPARISON_OPERATORS, Function, check_iterable, check_numeric, index_access, property_access
+from shapes import Record
+from strings import StringBuilder, append_operand, append_targets, append_value
+
+class ClosureInterpreter(Interpreter):
+    # Walks the AST once and turns every node into a zero-argument Python
+    # closure. Running the program is then just calling closures: there is no
+    # per-node method lookup and no operator string comparison at runtime.
+    # Scopes, functions and built-ins are shared with the tree-walking
+    # Interpreter, so both engines behave identically.
+
+    SUPPORTS_HOOKS = False
+
+    def interpret(self):
+        try:
+            for statement in self.compile_program(self.ast):
+                statement()
+        except (BreakLoop, ContinueLoop) as signal:
+            raise outside_loop_error(signal.statement) from None
+        finally:
+            self.output.flush()
+
+    def compile_program(self, ast):
+        self.append_targets = append_targets(ast)
+        return [self.compile(node) for node in ast]
+
+    def compile(self, node):
+        method_name = f'compile_{type(node).__name__}'
+        method = getattr(self, method_name, self.no_compile_method)
+        return method(node)
+
+    def no_compile_method(self, node):
+        raise Exception(f'No compile_{type(node).__name__} method defined')
+
+    def compile_Number(self, node):
+        value = node.value
+        return lambda: value
+
+    compile_String = compile_Number
+    compile_Boolean = compile_Number
+
+    def compile_Null(self, node):
+        return lambda: None
+
+    def compile_LogicalOp(self, node):
+        left = self.compile(node.left)
+        right = self.compile(node.right)
+        if node.op is Op.AND:
+            return lambda: left() and right()
+        elif node.op is Op.OR:
+            return lambda: left() or right()
+
+    def compile_UnaryOp(self, node):
+        right = self.compile(node.right)
+        if node.op is Op.NOT:
+            return lambda: not right()
+
+    def compile_BinOp(self, node):
+        left = self.compile(node.left)
+        right = self.compile(node.right)
+        operation = BINARY_OPERATORS[node.op]
+        return lambda: operation(left(), right())
+
+    def compile_Comparison(self, node):
+        left = self.compile(node.left)
+        right = self.compile(node.right)
+        operation = COMPARISON_OPERATORS[node.op]
+        return lambda: operation(left(), right())
+
+    def compile_Print(self, node):
+        value = self.compile(node.value)
+        write_line = self.output.write_line
+        return lambda: write_line(value())
+
+    def compile_Assign(self, node):
+        scope_stack = self.scope_stack
+        var_name = node.left.value
+        operand = append_operand(node)
+        if operand is not None:
+            return self._compile_append(var_name, operand)
+        value = self.compile(node.right)
+
+        def assign():
+            scope_stack[-1][var_name] = value()
+        return assign
+
+    def _compile_append(self, var_name, operand):
+        # x is x + value; strings grow in a StringBuilder (see strings.py)
+        scope_stack = self.scope_stack
+        value = self.compile(operand)
+
+        def append():
+            for scope in reversed(scope_stack):
+                if var_name in scope:
+                    current = scope[var_name]
+                    break
+            else:
+                raise NameError(f"name '{var_name}' is not defined")
+            new_value = value()
+            scope = scope_stack[-1]
+            scope[var_name] = append_value(current, new_value, scope.get(var_name))
+        return append
+
+    def _compile_step(self, node, step, action):
+        scope_stack = self.scope_stack
+        var_name = node.var_name.value
+        read = self.compile(node.var_name)
+
+        def update():
+            scope_stack[-1][var_name] = check_numeric(read(), action) + step
+        return update
+
+    def compile_Increment(self, node):
+        return self._compile_step(node, 1, 'increment')
+
+    def compile_Decrement(self, node):
+        return self._compile_step(node, -1, 'decrement')
+
+    def compile_Variable(self, node):
+        scope_stack = self.scope_stack
+        var_name = node.value
+
+        def variable():
+            for scope in reversed(scope_stack):
+                if var_name in scope:
+                    return scope[var_name]
+            raise NameError(f"name '{var_name}' is not defined")
+
+        def appended_variable():
+            # May hold a StringBuilder, which is joined on read
+            for scope in reversed(scope_stack):
+                if var_name in scope:
+                    value = scope[var_name]
+                    if value.__class__ is StringBuilder:
+                        return value.getvalue()
+                    return value
+            raise NameError(f"name '{var_name}' is not defined")
+        return appended_variable if var_name in self.append_targets else variable
+
+    def compile_Block(self, node):
+        statements = tuple(self.compile(statement) for statement in node.statements)
+        if len(statements) == 1:
+            return statements[0]
+
+        def block():
+            for statement in statements:
+                statement()
+        return block
+
+    def compile_IfStatement(self, node):
+        condition = self.compile(node.condition)
+        if_block = self.compile(node.if_block)
+        if node.else_block is None:
+            def if_statement():
+                if condition():
+                    if_block()
+        else:
+            else_block = self.compile(node.else_block)
+
+            def if_statement():
+                if condition():
+                    if_block()
+                else:
+                    else_block()
+        return if_statement
+
+    def compile_WhileStatement(self, node):
+        condition = self.compile(node.condition)
+        body = self.compile(node.body)
+
+        def while_statement():
+            while condition():
+                try:
+                    body()
+                except BreakLoop:
+                    break
+                except ContinueLoop:
+                    continue
+        return while_statement
+
+    def compile_ForStatement(self, node):
+        scope_stack = self.scope_stack
+        var_name = node.var_name
+        iterable = self.compile(node.iterable)
+        body = self.compile(node.body)
+
+        def for_statement():
+            for item in check_iterable(iterable()):
+                scope_stack.append({var_name: item})
+                try:
+                    body()
+                except BreakLoop:
+                    break
+                except ContinueLoop:
+                    continue
+                finally:
+                    scope_stack.pop()
+        return for_statement
+
+    def compile_BreakStatement(self, node):
+        def break_statement():
+            raise BreakLoop()
+        return break_statement
+
+    def compile_ContinueStatement(self, node):
+        def continue_statement():
+            raise ContinueLoop()
+        return continue_statement
+
+    def compile_TryExceptStatement(self, node):
+        try_block = self.compile(node.try_block)
+        except_block = self.compile(node.except_block)
+
+        def try_except_statement():
+            try:
+                try_block()
+            except CONTROL_FLOW_SIGNALS:
+                raise
+            except Exception:
+                except_block()
+        return try_except_statement
+
+    def compile_List(self, node):
+        elements = tuple(self.compile(element) for element in node.elements)
+        return lambda: [element() for element in elements]
+
+    def compile_IndexAccess(self, node):
+        target = self.compile(node.target)
+        index = self.compile(node.index)
+        return lambda: index_access(target(), index())
+
+    def compile_Dictionary(self, node):
+        pairs = tuple((self.compile(key), self.compile(value)) for key, value in node.pairs)
+
+        def dictionary():
+            result = {}
+            for key, value in pairs:
+                result[key()] = value()
+            return result
+        return dictionary
+
+    def compile_PropertyAccess(self, node):
+        target = self.compile(node.target)
+        property_name = node.property_name
+        return lambda: property_access(target(), property_name)
+
+    def compile_RecordLiteral(self, node):
+        record_class = node.record_class
+        values = tuple(self.compile(value) for value in node.values)
+        return lambda: record_class([value() for value in values])
+
+    def compile_CachedPropertyAccess(self, node):
+        target = self.compile(node.target)
+        property_name = node.property_name
+
+        # Inline cache: the record class this site saw last and the
+        # property's position in it
+        cached_class = None
+        cached_index = 0
+
+        def cached_property_access():
+            nonlocal cached_class, cached_index
+            value = target()
+            if value.__class__ is cached_class:
+                return value[cached_index]
+            if isinstance(value, Record):
+                index = value.property_indexes.get(property_name)
+                if index is None:
+                    return None
+                cached_class, cached_index = value.__class__, index
+                return value[index]
+            return property_access(value, property_name)
+        return cached_property_access
+
+    def compile_FunctionDefinition(self, node):
+        define_function = self.define_function
+        name = node.name
+        function = Function(name, node.parameters, self.compile(node.body))
+        return lambda: define_function(name, function)
+
+    def compile_FunctionCall(self, node):
+        interpreter = self
+        scope_stack = self.scope_stack
+        func_name = node.name
+        arguments = tuple(self.compile(argument) for argument in node.arguments)
+        argc = len(arguments)
+
+        # Inline cache: what this call site resolved to, valid as long as the
+        # function table is still at bound_version
+        bound_version = -1
+        function = None
+        is_builtin = False
+
+        def function_call():
+            nonlocal bound_version, function, is_builtin
+            if bound_version != interpreter.functions_version:
+                function, is_builtin = interpreter.lookup_function(func_name, argc)
+                bound_version = interpreter.functions_version
+
+            evaluated_arguments = [argument() for argument in arguments]
+            if is_builtin:
+                return function(*evaluated_arguments)
+
+            scope_stack.append(dict(zip(function.parameters, evaluated_arguments)))
+            try:
+                function.body()
+            except ReturnValue as e:
+                return e.value
+            except (BreakLoop, ContinueLoop) as signal:
+                # A Break/Continue cannot leave the function it appears in
+                raise outside_loop_error(signal.statement) from None
+            finally:
+                scope_stack.pop()
+        return function_call
+
+    def call_function(self, function, arguments):
+        scope_stack = self.scope_stack
+        scope_stack.append(dict(zip(function.parameters, arguments)))
+        try:
+            function.body()
+        except ReturnValue as e:
+            return e.value
+        except (BreakLoop, ContinueLoop) as signal:
+            raise outside_loop_error(signal.statement) from None
+        finally:
+            scope_stack.pop()
+
+    def compile_ReturnStatement(self, node):
+        value = self.compile(node.value)
+
+        def return_statement():
+            raise ReturnValue(value())
+        return return_statement
@@ -0,0 +1,60 @@
+from bytecode import compile_ast
+from interpreter import Interpreter
+from lexer import Lexer
+from optimizer import optimize_program
+from parser import Parser
+from strings import materialize
+from transpiler import TranspilingInterpreter, compile_to_python
+from vm import VirtualMachine
+
+# Embedding API:
+#
+#     program = femcode.compile(source)
+#     result = program.run(globals={'price': 10}, stdout=buffer)['total']
+#
+# Engines whose compiled form can be shared between runs, with the function
+# that compiles it (the tree engine runs the syntax tree itself). The closure
+# engine binds its closures to a single interpreter, so it is not offered.
+ENGINES = {
+    'tree': (Interpreter, None),
+    'vm': (VirtualMachine, compile_ast),
+    'python': (TranspilingInterpreter, compile_to_python),
+}
+
+class Program:
+    # A parsed program and its compiled form. Running it never changes it:
+    # every run() gets a fresh interpreter with its own scopes, function table
+    # and streams, so one Program can be run any number of times, from any
+    # number of threads at once, without parsing or compiling again.
+
+    __slots__ = ('statements', 'engine', 'code')
+
+    def __init__(self, statements, engine='tree'):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of: {', '.join(ENGINES)}")
+        self.statements = statements
+        self.engine = engine
+        compile_code = ENGINES[engine][1]
+        self.code = compile_code(statements) if compile_code is not None else None
+
+    def run(self, globals=None, stdout=None, stdin=None):
+        # Runs the program with the given variables predefined and returns its
+        # global variables afterwards. stdout/stdin default to sys.stdout/sys.stdin.
+        interpreter = ENGINES[self.engine][0](self.statements, stdout, stdin)
+        global_scope = interpreter.scope_stack[0]
+        if globals:
+            global_scope.update(globals)
+        if self.code is None:
+            interpreter.interpret()
+        else:
+            interpreter.run(self.code)
+        # Strings built with += are still StringBuilders inside the scope
+        for name, value in global_scope.items():
+            global_scope[name] = materialize(value)
+        return global_scope
+
+def compile(source, engine='tree', optimize=False):
+    statements = Parser(Lexer(source).tokenize()).parse()
+    if optimize:
+        statements = optimize_program(statements)
+    return Program(statements, engine)
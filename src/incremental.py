@@ -0,0 +1,172 @@
+from array import array
+from bisect import bisect_left
+
+from lexer import Lexer, LineIndex, Token, TokenArray
+from parser import Parser, iter_child_nodes
+
+# Incremental re-parsing for editors and --watch. IncrementalParser keeps the
+# token stream and top-level statements of the last text it parsed. When the
+# text changes, it re-lexes only from the start of the first edited line up
+# to where the new tokens line up with the old ones again, and re-parses only
+# the top-level statements those tokens belong to. Every other statement is
+# reused as is (statements after the edit get their positions shifted), so
+# the result is the same tree a full Parser(Lexer(text).tokenize()).parse()
+# would build, but a one-line edit costs about one statement's worth of work.
+
+class IncrementalParser:
+    def __init__(self):
+        self.text = ''
+        self.tokens = TokenArray(LineIndex(''))
+        self.tokens.append(Token('EOF', None, 0, 0))
+        self.statements = []
+        # For each statement, its nodes that carry a source position
+        self.positioned = []
+        # Token index where each top-level statement starts, followed by the
+        # index of the EOF token
+        self.boundaries = [0]
+        self.relexed_tokens = 0
+        self.reparsed_statements = 0
+
+    def parse(self, text):
+        # Returns the program for text, which may differ from the previous
+        # text anywhere; the edited region is found by comparing the two
+        if text == self.text:
+            self.relexed_tokens = self.reparsed_statements = 0
+            return list(self.statements)
+        start, old_end, new_end = edited_range(self.text, text)
+        return self._update(text, start, old_end, new_end)
+
+    def edit(self, start, end, replacement):
+        # Replaces text[start:end] with replacement, for callers (editors)
+        # that already know what changed
+        if not 0 <= start <= end <= len(self.text):
+            raise ValueError(f"Edit range {start}:{end} is outside the text (length {len(self.text)})")
+        text = self.text[:start] + replacement + self.text[end:]
+        return self._update(text, start, end, start + len(replacement))
+
+    def summary(self):
+        return (
+            f"re-lexed {self.relexed_tokens} of {len(self.tokens)} tokens, "
+            f"re-parsed {self.reparsed_statements} of {len(self.statements)} statements"
+        )
+
+    def _update(self, text, start, old_end, new_end):
+        # text[start:new_end] replaced self.text[start:old_end]. Nothing is
+        # stored until the new text has lexed and parsed, so after a syntax
+        # error the parser still holds the last good version.
+        delta = new_end - old_end
+        old_tokens = self.tokens
+        line_index = LineIndex(text)
+
+        # A token's match never looks past the end of its line (strings that
+        # span lines end after the newline and are re-lexed), so tokens ending
+        # before the edited line are still valid. Lexing resumes where the
+        # last of them ended, exactly where the previous run continued.
+        first_line_start = self.text.rfind('\n', 0, start) + 1
+        lo = bisect_left(old_tokens.ends, first_line_start)
+        lexer = Lexer(text)
+        lexer.pos = old_tokens.ends[lo - 1] if lo else 0
+        relexed = TokenArray()
+        while True:
+            token = lexer.get_next_token()
+            if token.start >= new_end:
+                # Past the edit the text is the old text shifted by delta, so
+                # once a token starts where an old one did, the old tokens
+                # from there on are what lexing would produce again. EOF
+                # always lines up.
+                old_start = token.start - delta
+                hi = bisect_left(old_tokens.starts, old_start, lo)
+                if hi < len(old_tokens) and old_tokens.starts[hi] == old_start:
+                    break
+            relexed.append(token)
+
+        tokens = TokenArray(line_index)
+        tokens.kinds = old_tokens.kinds[:lo] + relexed.kinds + old_tokens.kinds[hi:]
+        tokens.starts = old_tokens.starts[:lo] + relexed.starts + _shifted(old_tokens.starts[hi:], delta)
+        tokens.ends = old_tokens.ends[:lo] + relexed.ends + _shifted(old_tokens.ends[hi:], delta)
+        tokens.values = old_tokens.values[:lo] + relexed.values + old_tokens.values[hi:]
+        token_delta = len(relexed) - (hi - lo)
+        changed_end = lo + len(relexed)
+
+        # Deciding where a statement ends looks at the token after it (an
+        # Androgyny, or an operator continuing the expression), so the
+        # statement that ended right before the first changed token is
+        # parsed again as well
+        boundaries = self.boundaries
+        first = bisect_left(boundaries, lo, 1) - 1
+        parse_start = boundaries[first]
+        parser = Parser(map(tokens.__getitem__, range(parse_start, len(tokens))), line_index)
+        statements = []
+        positioned = []
+        statement_starts = []
+        while True:
+            index = parse_start + parser.pos
+            if index >= changed_end:
+                # Parsing a statement depends only on the tokens from its
+                # start on, so at an old statement boundary after the changed
+                # tokens, the old statements can be taken over
+                reuse = bisect_left(boundaries, index - token_delta, first)
+                if reuse < len(boundaries) and boundaries[reuse] == index - token_delta:
+                    break
+            statement_starts.append(index)
+            statement = parser.parse_statement()
+            statements.append(statement)
+            positioned.append(_positioned_nodes(statement))
+
+        if delta:
+            for nodes in self.positioned[reuse:]:
+                for node in nodes:
+                    node.position += delta
+        self.text = text
+        self.tokens = tokens
+        self.statements = self.statements[:first] + statements + self.statements[reuse:]
+        self.positioned = self.positioned[:first] + positioned + self.positioned[reuse:]
+        self.boundaries = boundaries[:first] + statement_starts + [boundary + token_delta for boundary in boundaries[reuse:]]
+        self.relexed_tokens = len(relexed)
+        self.reparsed_statements = len(statements)
+        return list(self.statements)
+
+def edited_range(old, new):
+    # (start, old_end, new_end) such that only old[start:old_end] was
+    # replaced by new[start:new_end]
+    limit = min(len(old), len(new))
+    prefix = _common_prefix_length(old, new, limit)
+    suffix = _common_suffix_length(old, new, limit - prefix)
+    return prefix, len(old) - suffix, len(new) - suffix
+
+def _common_prefix_length(a, b, limit):
+    # Compares whole blocks (in C), then halves the block size to narrow down
+    # the first difference
+    length = 0
+    step = 4096
+    while step:
+        while length + step <= limit and a[length:length + step] == b[length:length + step]:
+            length += step
+        step //= 2
+    return length
+
+def _common_suffix_length(a, b, limit):
+    length = 0
+    step = 4096
+    while step:
+        while length + step <= limit and a[len(a) - length - step:len(a) - length] == b[len(b) - length - step:len(b) - length]:
+            length += step
+        step //= 2
+    return length
+
+def _shifted(offsets, delta):
+    if not delta:
+        return offsets
+    return array('q', [offset + delta for offset in offsets])
+
+def _positioned_nodes(statement):
+    # Collected once per parse so that shifting a statement that moved does
+    # not have to walk its tree
+    nodes = []
+    stack = [statement]
+    while stack:
+        node = stack.pop()
+        if getattr(node, 'position', None) is not None:
+            nodes.append(node)
+        stack.extend(iter_child_nodes(node))
+    return nodes
@@ -1,28 +1,203 @@
+import itertools
+import sys
+
+from numeric import equal, make_array, mean, not_equal
+from output import OUTPUT_BUFFER_SIZE, OutputBuffer
+from parser import BinOp, ForStatement, Op, TryExceptStatement, Variable, WhileStatement
+from runtime import BINARY_OPERATORS, COMPARISON_OPERATORS, Function, check_arity, check_iterable, check_numeric, index_access, property_access
+from streams import Stream, lines, text_value
+from strings import StringBuilder, append_value, format_text, join, split
+
+# Events accepted by Interpreter.add_hook and the arguments their callbacks get:
+#   enter(node), exit(node, result)          every node the tree walker visits
+#   call(function, arguments), return(function, value)   user-defined functions
+#   loop_iteration(loop_node)                before each Otokonoko/Tomgirl iteration
+#   exception_caught(try_node, exception)    when a Bimboy block handles an error
+HOOK_EVENTS = ('enter', 'exit', 'call', 'return', 'loop_iteration', 'exception_caught')
+
+# Function table versions come from one counter, so no two interpreters ever
+# share a version and a call-site cache in compiled code can outlive one run
+FUNCTIONS_VERSIONS = itertools.count()
+
+class DispatchTable(dict):
+    # type(node) -> bound visit_* method, looked up on first use
+    def __init__(self, interpreter):
+        super().__init__()
+        self.interpreter = interpreter
+
+    def __missing__(self, node_type):
+        method = getattr(self.interpreter, f'visit_{node_type.__name__}', self.interpreter.no_visit_method)
+        self[node_type] = method
+        return method
+
+class HookedDispatchTable(DispatchTable):
+    # type(node) -> the visit_* method wrapped with the registered hooks.
+    # Interpreter.visit only uses this table while hooks are registered, so
+    # the plain table's hot path never checks for them.
+    def __init__(self, interpreter, hooks):
+        super().__init__(interpreter)
+        self.hooks = hooks
+        # Loop body / except Block -> the statement that visits it
+        self.loop_bodies = {}
+        self.except_blocks = {}
+
+    def __missing__(self, node_type):
+        method = super().__missing__(node_type)
+        hooks = self.hooks
+        enter_hooks = hooks['enter']
+        exit_hooks = hooks['exit']
+        loop_bodies = self.loop_bodies
+        except_blocks = self.except_blocks
+
+        if issubclass(node_type, (WhileStatement, ForStatement)):
+            def register(node):
+                loop_bodies[node.body] = node
+        elif issubclass(node_type, TryExceptStatement):
+            def register(node):
+                except_blocks[node.except_block] = node
+        else:
+            register = None
+
+        def hooked(node):
+            if register is not None:
+                register(node)
+            # Loops visit their body once per iteration, and Twink visits its
+            # except block from inside the except clause that caught the error
+            loop = loop_bodies.get(node)
+            if loop is not None:
+                for hook in hooks['loop_iteration']:
+                    hook(loop)
+            try_node = except_blocks.get(node)
+            if try_node is not None:
+                exception = sys.exc_info()[1]
+                for hook in hooks['exception_caught']:
+                    hook(try_node, exception)
+            for hook in enter_hooks:
+                hook(node)
+            result = method(node)
+            for hook in exit_hooks:
+                hook(node, result)
+            return result
+
+        self[node_type] = hooked
+        return hooked
+
 class Interpreter:
-    def __init__(self, ast):
+    # Engines that do not run the program through visit() cannot fire hooks
+    SUPPORTS_HOOKS = True
+
+    def __init__(self, ast, stdout=None, stdin=None, buffer_size=OUTPUT_BUFFER_SIZE):
         self.ast = ast
+        # Streams for UwU Boy and ask(); None means sys.stdout / sys.stdin at
+        # the time of use, so contextlib.redirect_stdout keeps working.
+        # Printed lines are buffered (see output.py).
+        self.output = OutputBuffer(stdout, buffer_size)
+        self.stdin = stdin
+        self.dispatch = DispatchTable(self)
+        self.hooks = {event: [] for event in HOOK_EVENTS}
         self.scope_stack = [{}]
         self.functions = {
             "ask": self._ask_builtin,
             "len": self._len_builtin,
-            "type": self._type_builtin
+            "type": self._type_builtin,
+            "range": self._range_builtin,
+            "array": make_array,
+            "equal": equal,
+            "not_equal": not_equal,
+            "sum": self._sum_builtin,
+            "min": self._min_builtin,
+            "max": self._max_builtin,
+            "mean": mean,
+            "lines": lines,
+            "map": self._map_builtin,
+            "filter": self._filter_builtin,
+            "list": self._list_builtin,
+            "join": join,
+            "split": split,
+            "format": format_text,
         }
+        # Changed whenever a function is (re)defined; call sites bound to an
+        # older version look their function up again
+        self.functions_version = next(FUNCTIONS_VERSIONS)
+        # FunctionCall node -> (functions_version, function, is_builtin)
+        self.call_sites = {}
+        # Value of the most recent Femme, read by the caller on RETURN
+        self.return_value = None
 
     def _ask_builtin(self, prompt):
-        return input(prompt)
+        # Everything printed so far must be visible before the prompt
+        output = self.output
+        if self.stdin is None and output.sink is None:
+            output.flush()
+            return input(prompt)
+        output.write(str(prompt))
+        output.flush()
+        line = (self.stdin or sys.stdin).readline()
+        if not line:
+            raise EOFError("EOF when reading a line")
+        return line[:-1] if line.endswith('\n') else line
 
     @property
     def current_scope(self):
         return self.scope_stack[-1]
 
     def interpret(self):
-        for node in self.ast:
-            self.visit(node)
+        try:
+            for node in self.ast:
+                completion = self.visit(node)
+                if completion is not None and completion.__class__ is Completion:
+                    # Nothing at the top level can absorb a Break/Continue/Femme
+                    self.raise_completion(completion)
+        finally:
+            self.output.flush()
+
+    def raise_completion(self, completion):
+        if completion is RETURN:
+            raise ReturnValue(self.return_value)
+        raise outside_loop_error(completion.name)
 
     def visit(self, node):
-        method_name = f'visit_{type(node).__name__}'
-        method = getattr(self, method_name, self.no_visit_method)
-        return method(node)
+        return self.dispatch[type(node)](node)
+
+    def add_hook(self, event, callback):
+        if not self.SUPPORTS_HOOKS:
+            raise NotImplementedError(f"{type(self).__name__} does not support hooks; use the tree-walking Interpreter")
+        if event not in self.hooks:
+            raise ValueError(f"Unknown hook event '{event}', expected one of: {', '.join(HOOK_EVENTS)}")
+        self.hooks[event].append(callback)
+        self._install_hooks()
+
+    def remove_hook(self, event, callback):
+        self.hooks[event].remove(callback)
+        self._install_hooks()
+
+    def _install_hooks(self):
+        # Swaps in the hooked dispatch table and call path only while some
+        # hook needs them; with no hooks the interpreter runs unchanged
+        hooks = self.hooks
+        if any(hooks[event] for event in ('enter', 'exit', 'loop_iteration', 'exception_caught')):
+            if not isinstance(self.dispatch, HookedDispatchTable):
+                self.dispatch = HookedDispatchTable(self, hooks)
+        else:
+            self.dispatch = DispatchTable(self)
+
+        if hooks['call'] or hooks['return']:
+            self.call_function = self._hooked_call_function
+        else:
+            # del rather than touching __dict__, which would slow down every
+            # later attribute access on this interpreter
+            try:
+                del self.call_function
+            except AttributeError:
+                pass
+
+    def _hooked_call_function(self, function, arguments):
+        for hook in self.hooks['call']:
+            hook(function, arguments)
+        value = type(self).call_function(self, function, arguments)
+        for hook in self.hooks['return']:
+            hook(function, value)
+        return value
 
     def no_visit_method(self, node):
         raise Exception(f'No visit_{type(node).__name__} method defined')
@@ -36,126 +211,140 @@ class Interpreter:
     def visit_Boolean(self, node):
         return node.value
 
+    def visit_Null(self, node):
+        return None
+
     def visit_LogicalOp(self, node):
-        if node.op.type == 'AND':
+        if node.op is Op.AND:
             return self.visit(node.left) and self.visit(node.right)
-        elif node.op.type == 'OR':
+        elif node.op is Op.OR:
             return self.visit(node.left) or self.visit(node.right)
 
     def visit_UnaryOp(self, node):
-        if node.op.type == 'NOT':
+        if node.op is Op.NOT:
             return not self.visit(node.right)
 
     def visit_BinOp(self, node):
         left_val = self.visit(node.left)
         right_val = self.visit(node.right)
-        if node.op.type == 'PLUS':
-            return left_val + right_val
-        elif node.op.type == 'MINUS':
-            return left_val - right_val
-        elif node.op.type == 'MUL':
-            return left_val * right_val
-        elif node.op.type == 'DIV':
-            return left_val / right_val
+        return BINARY_OPERATORS[node.op](left_val, right_val)
 
     def visit_Comparison(self, node):
         left_val = self.visit(node.left)
         right_val = self.visit(node.right)
-        if node.op.type == 'EQ':
-            return left_val == right_val
-        elif node.op.type == 'NEQ':
-            return left_val != right_val
-        elif node.op.type == 'GT':
-            return left_val > right_val
-        elif node.op.type == 'GTE':
-            return left_val >= right_val
-        elif node.op.type == 'LT':
-            return left_val < right_val
-        elif node.op.type == 'LTE':
-            return left_val <= right_val
+        return COMPARISON_OPERATORS[node.op](left_val, right_val)
 
     def visit_Print(self, node):
-        value_to_print = self.visit(node.value)
-        print(value_to_print)
+        self.output.write_line(self.visit(node.value))
 
     def visit_Assign(self, node):
         var_name = node.left.value
-        value = self.visit(node.right)
-        self.current_scope[var_name] = value
+        right = node.right
+        # x is x + value grows strings in a StringBuilder (see strings.py).
+        # With hooks installed the BinOp is visited normally so they see it.
+        if (right.__class__ is BinOp and right.left.__class__ is Variable and right.left.value == var_name
+                and right.op is Op.PLUS and self.dispatch.__class__ is DispatchTable):
+            current = self.lookup_stored(var_name)
+            value = self.visit(right.right)
+            scope = self.scope_stack[-1]
+            scope[var_name] = append_value(current, value, scope.get(var_name))
+            return
+        value = self.visit(right)
+        self.scope_stack[-1][var_name] = value
 
     def visit_Increment(self, node):
         var_name = node.var_name.value
-        current_value = self.visit(node.var_name)
-        if not isinstance(current_value, (int, float)):
-            raise TypeError(f"Cannot increment non-numeric type {type(current_value).__name__}")
+        current_value = check_numeric(self.visit(node.var_name), 'increment')
         self.current_scope[var_name] = current_value + 1
 
     def visit_Decrement(self, node):
         var_name = node.var_name.value
-        current_value = self.visit(node.var_name)
-        if not isinstance(current_value, (int, float)):
-            raise TypeError(f"Cannot decrement non-numeric type {type(current_value).__name__}")
+        current_value = check_numeric(self.visit(node.var_name), 'decrement')
         self.current_scope[var_name] = current_value - 1
 
     def visit_Variable(self, node):
         var_name = node.value
         # Search up the scope stack for the variable
+        for scope in reversed(self.scope_stack):
+            if var_name in scope:
+                value = scope[var_name]
+                if value.__class__ is StringBuilder:
+                    return value.getvalue()
+                return value
+        raise NameError(f"name '{var_name}' is not defined")
+
+    def lookup_stored(self, var_name):
+        # The variable's value as stored, without joining a StringBuilder
         for scope in reversed(self.scope_stack):
             if var_name in scope:
                 return scope[var_name]
         raise NameError(f"name '{var_name}' is not defined")
 
+    # Statements return None, or a Completion (BREAK, CONTINUE, RETURN) that
+    # propagates up through enclosing blocks until a loop or call absorbs it.
+    # Expression statements may return ordinary values, which are ignored.
+
     def visit_Block(self, node):
         for statement in node.statements:
-            self.visit(statement)
+            completion = self.visit(statement)
+            if completion is not None and completion.__class__ is Completion:
+                return completion
 
     def visit_IfStatement(self, node):
         condition_result = self.visit(node.condition)
         if condition_result:
-            self.visit(node.if_block)
+            return self.visit(node.if_block)
         elif node.else_block:
-            self.visit(node.else_block)
+            return self.visit(node.else_block)
 
     def visit_WhileStatement(self, node):
         while self.visit(node.condition):
-            try:
-                self.visit(node.body)
-            except BreakLoop:
-                break
-            except ContinueLoop:
-                continue
+            completion = self.visit(node.body)
+            if completion is not None:
+                if completion is BREAK:
+                    break
+                if completion is RETURN:
+                    return completion
 
     def visit_ForStatement(self, node):
-        iterable = self.visit(node.iterable)
-        if not isinstance(iterable, (list, str)):
-            raise TypeError(f"'for' loop can only iterate over lists or strings, got {type(iterable).__name__}")
-
-        for item in iterable:
-            self.scope_stack.append({})
-            self.current_scope[node.var_name] = item
-            try:
-                self.visit(node.body)
-            except BreakLoop:
-                self.scope_stack.pop()
-                break
-            except ContinueLoop:
-                self.scope_stack.pop()
-                continue
+        iterable = check_iterable(self.visit(node.iterable))
+        var_name = node.var_name
+
+        # One scope serves every iteration. It is only cleared when the body
+        # assigned something besides the loop variable, so each iteration
+        # still starts from a fresh scope.
+        loop_scope = {}
+        self.scope_stack.append(loop_scope)
+        try:
+            for item in iterable:
+                if len(loop_scope) > 1:
+                    loop_scope.clear()
+                loop_scope[var_name] = item
+                completion = self.visit(node.body)
+                if completion is not None:
+                    if completion is BREAK:
+                        break
+                    if completion is RETURN:
+                        return completion
+        finally:
             self.scope_stack.pop()
 
     def visit_BreakStatement(self, node):
-        raise BreakLoop()
+        return BREAK
 
     def visit_ContinueStatement(self, node):
-        raise ContinueLoop()
+        return CONTINUE
 
     def visit_TryExceptStatement(self, node):
         try:
-            self.visit(node.try_block)
+            return self.visit(node.try_block)
+        except CONTROL_FLOW_SIGNALS:
+            # Break/Continue/Femme are not errors and must pass through
+            raise
         except Exception as e:
             # For now, catch all Python exceptions and execute the except block
             # In a more advanced interpreter, you might map specific Femcode errors
-            self.visit(node.except_block)
+            return self.visit(node.except_block)
 
     def visit_List(self, node):
         elements = [self.visit(element) for element in node.elements]
@@ -164,10 +353,7 @@ class Interpreter:
     def visit_IndexAccess(self, node):
         target = self.visit(node.target)
         index = self.visit(node.index)
-        if isinstance(target, list):
-            return target[index]
-        else:
-            raise TypeError(f"Cannot index type {type(target).__name__}")
+        return index_access(target, index)
 
     def visit_Dictionary(self, node):
         dictionary = {}
@@ -179,53 +365,86 @@ class Interpreter:
 
     def visit_PropertyAccess(self, node):
         target = self.visit(node.target)
-        property_name = node.property_name
-        if isinstance(target, dict):
-            return target.get(property_name)
-        else:
-            raise TypeError(f"Cannot access property '{property_name}' on type {type(target).__name__}")
-
-    def visit_FunctionDefinition(self, node):
-        self.functions[node.name] = {
-            'parameters': node.parameters,
-            'body': node.body
-        }
+        return property_access(target, node.property_name)
 
-    def visit_FunctionCall(self, node):
-        func_name = node.name
-        if func_name not in self.functions:
-            raise NameError(f"Function '{func_name}' is not defined")
+    def visit_RecordLiteral(self, node):
+        return node.record_class([self.visit(value) for value in node.values])
 
-        func_info = self.functions[func_name]
+    def visit_CachedPropertyAccess(self, node):
+        target = self.visit(node.target)
+        cache = node.cache
+        record_class, index = cache.entry
+        if target.__class__ is record_class:
+            return target[index]
+        return cache.miss(target)
 
-        # Evaluate arguments
-        evaluated_arguments = [self.visit(arg) for arg in node.arguments]
+    def define_function(self, name, function):
+        self.functions[name] = function
+        self.functions_version = next(FUNCTIONS_VERSIONS)
 
-        # Check if it's a built-in function
-        if callable(func_info):
-            return func_info(*evaluated_arguments)
+    def visit_FunctionDefinition(self, node):
+        self.define_function(node.name, Function(node.name, node.parameters, node.body))
+
+    def lookup_function(self, func_name, argc):
+        # Returns (function, is_builtin) for a call with argc arguments. The
+        # number of arguments at a call site never changes, so engines that
+        # cache the result per call site check a user function's arity once.
+        function = self.functions.get(func_name)
+        if function is None:
+            raise NameError(f"Function '{func_name}' is not defined")
+        is_builtin = not isinstance(function, Function)
+        if not is_builtin:
+            check_arity(func_name, function.parameters, argc)
+        return function, is_builtin
 
-        # Existing logic for user-defined functions
-        # Create a new scope for the function call
-        new_scope = {}
-        for i, param_name in enumerate(func_info['parameters']):
-            new_scope[param_name] = evaluated_arguments[i]
+    def bind_call_site(self, node):
+        function, is_builtin = self.lookup_function(node.name, len(node.arguments))
+        site = (self.functions_version, function, is_builtin)
+        self.call_sites[node] = site
+        return site
 
-        self.scope_stack.append(new_scope)
+    def visit_FunctionCall(self, node):
+        site = self.call_sites.get(node)
+        if site is None or site[0] != self.functions_version:
+            site = self.bind_call_site(node)
 
-        # Execute function body
+        evaluated_arguments = [self.visit(arg) for arg in node.arguments]
+        if site[2]:
+            return site[1](*evaluated_arguments)
+        return self.call_function(site[1], evaluated_arguments)
+
+    def invoke(self, func_name, arguments):
+        # Calls a Femcode function (or built-in) by name from Python, e.g. from
+        # map()/filter(). Each engine stores user functions in its own form and
+        # runs them through its call_function; callables (built-ins and the
+        # python engine's functions) are called directly.
+        function = self.functions.get(func_name)
+        if function is None:
+            raise NameError(f"Function '{func_name}' is not defined")
+        if callable(function):
+            return function(*arguments)
+        check_arity(func_name, function.parameters, len(arguments))
+        return self.call_function(function, arguments)
+
+    def call_function(self, function, arguments):
+        scope_stack = self.scope_stack
+        scope_stack.append(dict(zip(function.parameters, arguments)))
         try:
-            self.visit(func_info['body'])
-        except ReturnValue as e:
-            self.scope_stack.pop() # Pop the function scope
-            return e.value
+            completion = self.visit(function.body)
         finally:
-            # Ensure scope is popped even if no return or an error occurs
-            if len(self.scope_stack) > 1: # Don't pop global scope
-                self.scope_stack.pop()
+            scope_stack.pop()
+
+        if completion is RETURN:
+            value = self.return_value
+            self.return_value = None
+            return value
+        if completion is not None:
+            # A Break/Continue cannot leave the function it appears in
+            self.raise_completion(completion)
 
     def visit_ReturnStatement(self, node):
-        raise ReturnValue(self.visit(node.value))
+        self.return_value = self.visit(node.value)
+        return RETURN
 
     @staticmethod
     def _len_builtin(obj):
@@ -235,18 +454,68 @@ class Interpreter:
     def _type_builtin(obj):
         return str(type(obj).__name__)
 
+    @staticmethod
+    def _range_builtin(*args):
+        # Lazy: counting loops never materialize a list
+        return range(*args)
+
+    # Lazy: map() and filter() return streams that call the function (given
+    # by name) only when the next item is needed
+    def _map_builtin(self, func_name, values):
+        func_name = text_value(func_name)
+        invoke = self.invoke
+        return Stream(invoke(func_name, [item]) for item in check_iterable(values, 'map()'))
+
+    def _filter_builtin(self, func_name, values):
+        func_name = text_value(func_name)
+        invoke = self.invoke
+        return Stream(item for item in check_iterable(values, 'filter()') if invoke(func_name, [item]))
+
+    @staticmethod
+    def _list_builtin(values):
+        return list(check_iterable(values, 'list()'))
+
+    # Reductions over lists, ranges, arrays and streams; arrays are scanned in C
+    @staticmethod
+    def _sum_builtin(values):
+        return sum(values)
+
+    @staticmethod
+    def _min_builtin(values):
+        return min(values)
+
+    @staticmethod
+    def _max_builtin(values):
+        return max(values)
+
 class ReturnValue(Exception):
     def __init__(self, value):
         self.value = value
 
 class BreakLoop(Exception):
-    pass
+    statement = 'Break'
 
 class ContinueLoop(Exception):
-    pass
+    statement = 'Continue'
 
-class BreakLoop(Exception):
-    pass
+# Exceptions used to implement control flow rather than to report errors
+CONTROL_FLOW_SIGNALS = (ReturnValue, BreakLoop, ContinueLoop)
 
-class ContinueLoop(Exception):
-    pass
\ No newline at end of file
+def outside_loop_error(statement):
+    # A Break/Continue that leaves the function (or program) it is in without
+    # meeting a loop; reported where the function was called
+    return SyntaxError(f"'{statement}' outside loop")
+
+class Completion:
+    # How a statement finished when it did not simply fall through
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f'Completion({self.name})'
+
+BREAK = Completion('Break')
+CONTINUE = Completion('Continue')
+RETURN = Completion('Femme')
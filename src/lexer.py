@@ -1,141 +1,300 @@
+import contextlib
+import mmap
+import os
 import re
+import sys
+from array import array
+from bisect import bisect_right
+from collections import deque
 
 class Token:
-    def __init__(self, type, value):
+    __slots__ = ('type', 'value', 'start', 'end')
+
+    def __init__(self, type, value, start=None, end=None):
         self.type = type
         self.value = value
+        # Offsets into the source; None for tokens synthesized by the parser
+        self.start = start
+        self.end = end
 
     def __repr__(self):
         return f'Token({self.type}, {self.value!r})'
 
+# Ordered (pattern, token type) pairs. Earlier entries win ties, so longer
+# operators come before their prefixes (e.g. '++' before '+').
+TOKEN_PATTERNS = [
+    (r'(?:\s|EXTRA_SPACE)+|#[^\n]*', 'SKIP'), # Whitespace and single-line comments
+    (r'"[^"]*"|\'[^\']*\'', 'STRING'), # Double- or single-quoted string literals
+    (r'\d+\.\d+', 'FLOAT'), # Floating-point numbers
+    (r'\d+', 'INTEGER'), # Integer numbers
+
+    (r'\+\+', 'INCREMENT'),
+    (r'--', 'DECREMENT'),
+    (r'\+=', 'PLUS_ASSIGN'),
+    (r'-=', 'MINUS_ASSIGN'),
+    (r'\*=', 'MUL_ASSIGN'),
+    (r'/=', 'DIV_ASSIGN'),
+    (r'==', 'EQ'),
+    (r'!=', 'NEQ'),
+    (r'>=', 'GTE'),
+    (r'<=', 'LTE'),
+
+    (r'\(', 'LPAREN'),
+    (r'\)', 'RPAREN'),
+    (r'\[', 'LBRACKET'),
+    (r'\]', 'RBRACKET'),
+    (r'{', 'LBRACE'),
+    (r'}', 'RBRACE'),
+    (r':', 'COLON'),
+    (r'\.', 'DOT'),
+    (r'\+', 'PLUS'),
+    (r'-', 'MINUS'),
+    (r'\*', 'MUL'),
+    (r'/', 'DIV'),
+    (r',', 'COMMA'),
+    (r'=', 'ASSIGN'),
+    (r'!', 'BANG'),
+    (r'>', 'GT'),
+    (r'<', 'LT'),
+
+    (r'Femboy Feminine\b|UwU Boy\b', 'PHRASE'), # Multi-word keywords, resolved via KEYWORDS
+    (r'[a-zA-Z_][a-zA-Z0-9_]*\b', 'ID'), # Identifiers and single-word keywords
+]
+
+# Keywords are matched as identifiers first and then resolved here, so adding
+# a keyword never costs an extra regex alternative.
+KEYWORDS = {
+    'Femboy Feminine': 'FEMBOY_FEMININE',
+    'UwU Boy': 'PRINT',
+    'Androgyny': 'ANDROGYNY',
+    'Otokonoko': 'OTOKONOKO',
+    'Femboy': 'FUNCTION_DEF',
+    'Femme': 'RETURN',
+    'Femboycore': 'FEMBOYCORE',
+    'Periodt': 'PERIODT',
+    'Kawaii': 'KAWAII',
+    'Cringe': 'CRINGE',
+    'Ghosted': 'NULL',
+    'Tomgirl': 'FOR',
+    'Slay': 'PASS',
+    'Break': 'BREAK',
+    'Continue': 'CONTINUE',
+    'Twink': 'TRY',
+    'Bimboy': 'EXCEPT',
+    'and': 'AND',
+    'or': 'OR',
+    'not': 'NOT',
+    'is': 'ASSIGN', # 'is' is now a keyword for assignment
+}
+
+class StringLiteral(str):
+    # The value of a string literal: its text with the quotes, like every
+    # Femcode string at runtime. Built-ins that take a path or a function
+    # name use a literal without its quotes (streams.text_value); strings read
+    # or computed at runtime are always used as they are. Reported as str by
+    # type().
+    __slots__ = ()
+
+StringLiteral.__name__ = 'str'
+
+# Token types whose value is not the matched text itself
+VALUE_CONVERTERS = {
+    'STRING': StringLiteral,
+    'INTEGER': int,
+    'FLOAT': float,
+    'KAWAII': lambda value: True,
+    'CRINGE': lambda value: False,
+    'NULL': lambda value: None,
+}
+
+# Group names that map onto an existing token type
+GROUP_ALIASES = {
+    'BANG': 'NOT',
+}
+
+# Whitespace that str.isspace() accepts beyond the ASCII \s, such as the
+# no-break space. The master patterns are compiled with re.ASCII, so \s, \d and
+# \b mean the same for str and for bytes (--stream), and these characters are
+# spelled out for each: as characters for str, as their UTF-8 encodings for
+# bytes.
+EXTRA_SPACES = '\x1c\x1d\x1e\x1f\x85\xa0\u1680\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000'
+
+def compile_master_pattern(extra_space, encode=False):
+    pattern = '|'.join(f'(?P<{token_type}>{pattern})' for pattern, token_type in TOKEN_PATTERNS)
+    pattern = pattern.replace('EXTRA_SPACE', extra_space)
+    return re.compile(pattern.encode('ascii') if encode else pattern, re.ASCII)
+
+MASTER_PATTERN = compile_master_pattern('[' + ''.join(f'\\u{ord(char):04x}' for char in EXTRA_SPACES) + ']')
+# Same grammar over raw UTF-8 bytes, used when lexing straight from an mmap
+BYTES_MASTER_PATTERN = compile_master_pattern(
+    '|'.join(''.join(f'\\x{byte:02x}' for byte in char.encode('utf-8')) for char in EXTRA_SPACES),
+    encode=True,
+)
+
+# Every token type as a small integer, used by the compact TokenArray
+TOKEN_TYPES = tuple(dict.fromkeys(
+    [token_type for _, token_type in TOKEN_PATTERNS if token_type not in ('SKIP', 'PHRASE') and token_type not in GROUP_ALIASES]
+    + list(KEYWORDS.values())
+    + ['EOF']
+))
+TOKEN_KINDS = {token_type: kind for kind, token_type in enumerate(TOKEN_TYPES)}
+
+EOF_TOKEN = Token('EOF', None)
+
+class LineIndex:
+    # Maps source offsets to 1-based (line, column) pairs. The table of line
+    # start offsets is only built the first time a position is looked up, so
+    # programs that never report an error never pay for it.
+    def __init__(self, source):
+        self.source = source
+        self._line_starts = None
+
+    def _build(self):
+        newline = '\n' if isinstance(self.source, str) else b'\n'
+        find = self.source.find
+        line_starts = array('q', [0])
+        pos = find(newline)
+        while pos != -1:
+            line_starts.append(pos + 1)
+            pos = find(newline, pos + 1)
+        self._line_starts = line_starts
+
+    def line_col(self, offset):
+        if self._line_starts is None:
+            self._build()
+        line = bisect_right(self._line_starts, offset)
+        return line, offset - self._line_starts[line - 1] + 1
+
+    def describe(self, offset):
+        line, column = self.line_col(offset)
+        return f"line {line}, column {column}"
+
+class TokenArray:
+    # Compact, list-like token store: kinds, offsets and values live in
+    # parallel arrays instead of one Python object per token. Indexing or
+    # iterating materializes short-lived Token objects on demand.
+    __slots__ = ('kinds', 'starts', 'ends', 'values', 'line_index')
+
+    def __init__(self, line_index=None):
+        self.kinds = array('B')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.values = []
+        self.line_index = line_index
+
+    def append(self, token):
+        self.kinds.append(TOKEN_KINDS[token.type])
+        self.starts.append(-1 if token.start is None else token.start)
+        self.ends.append(-1 if token.end is None else token.end)
+        self.values.append(token.value)
+
+    def _make_token(self, kind, value, start, end):
+        return Token(TOKEN_TYPES[kind], value, None if start < 0 else start, None if end < 0 else end)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self._make_token(self.kinds[index], self.values[index], self.starts[index], self.ends[index])
+
+    def __iter__(self):
+        make_token = self._make_token
+        for kind, value, start, end in zip(self.kinds, self.values, self.starts, self.ends):
+            yield make_token(kind, value, start, end)
+
+    def __repr__(self):
+        return f'TokenArray({list(self)!r})'
+
+@contextlib.contextmanager
+def mapped_source(file_path):
+    # Memory-maps a source file so it can be lexed without reading it into a string
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+class TokenStream:
+    # Bounded lookahead over any token iterable; the parser never needs more
+    # than a couple of tokens past the current one, so a generator feeding
+    # this stream keeps token memory constant regardless of program size.
+    def __init__(self, tokens):
+        self._tokens = iter(tokens)
+        self._buffer = deque()
+
+    def peek(self, offset=0):
+        buffer = self._buffer
+        while len(buffer) <= offset:
+            # Past the end of the input every lookahead sees EOF
+            buffer.append(next(self._tokens, EOF_TOKEN))
+        return buffer[offset]
+
+    def advance(self):
+        if not self._buffer:
+            self.peek()
+        return self._buffer.popleft()
+
 class Lexer:
     def __init__(self, text):
+        # text may be a str or a bytes-like object such as an mmap
         self.text = text
         self.pos = 0
-        self.token_patterns = [
-            (r'"[^"]*"', 'STRING'), # Double-quoted string literals
-            (r"'[^']*'", 'STRING'), # Single-quoted string literals
-            (r'\d+\.\d+', 'FLOAT'), # Floating-point numbers
-            (r'\d+', 'INTEGER'), # Integer numbers
-
-            (r'\+\+', 'INCREMENT'),
-            (r'--', 'DECREMENT'),
-            (r'\+=', 'PLUS_ASSIGN'),
-            (r'-=', 'MINUS_ASSIGN'),
-            (r'\*=', 'MUL_ASSIGN'),
-            (r'/=', 'DIV_ASSIGN'),
-            (r'==', 'EQ'),
-            (r'!=', 'NEQ'),
-            (r'>=', 'GTE'),
-            (r'<=', 'LTE'),
-
-            (r'\(', 'LPAREN'),
-            (r'\)', 'RPAREN'),
-            (r'\[', 'LBRACKET'),
-            (r'\]', 'RBRACKET'),
-            (r'{', 'LBRACE'),
-            (r'}', 'RBRACE'),
-            (r':', 'COLON'),
-            (r'\.', 'DOT'),
-            (r'\+', 'PLUS'),
-            (r'-', 'MINUS'),
-            (r'\*', 'MUL'),
-            (r'/', 'DIV'),
-            (r',', 'COMMA'),
-            (r'=', 'ASSIGN'),
-            (r'!', 'NOT'),
-            (r'>', 'GT'),
-            (r'<', 'LT'),
-
-            (r'\bFemboy Feminine\b', 'FEMBOY_FEMININE'),
-            (r'\bUwU Boy\b', 'PRINT'),
-            (r'\bAndrogyny\b', 'ANDROGYNY'),
-            (r'\bOtokonoko\b', 'OTOKONOKO'),
-            (r'\bFemboy\b', 'FUNCTION_DEF'),
-            (r'\bFemme\b', 'RETURN'),
-            (r'\bFemboycore\b', 'FEMBOYCORE'),
-            (r'\bPeriodt\b', 'PERIODT'),
-            (r'\bKawaii\b', 'KAWAII'),
-            (r'\bCringe\b', 'CRINGE'),
-            (r'\bGhosted\b', 'NULL'),
-            (r'\bTomgirl\b', 'FOR'),
-            (r'\bSlay\b', 'PASS'),
-            (r'\bBreak\b', 'BREAK'),
-            (r'\bContinue\b', 'CONTINUE'),
-            (r'\bTwink\b', 'TRY'),
-            (r'\bBimboy\b', 'EXCEPT'),
-            (r'\band\b', 'AND'),
-            (r'\bor\b', 'OR'),
-            (r'\bnot\b', 'NOT'),
-            (r'\bis\b', 'ASSIGN'), # 'is' is now a keyword for assignment
-            (r'\b[a-zA-Z_][a-zA-Z0-9_]*\b', 'ID'), # Identifiers
-        ]
+        self.is_binary = not isinstance(text, str)
+        self.pattern = BYTES_MASTER_PATTERN if self.is_binary else MASTER_PATTERN
+        self.line_index = LineIndex(text)
 
     def error(self, message="Invalid character"):
-        raise Exception(f"{message} at position {self.pos}: '{self.text[self.pos]}'")
+        char = self.text[self.pos:self.pos + 1]
+        if self.is_binary:
+            char = bytes(char).decode('utf-8', errors='replace')
+        raise Exception(f"{message} at {self.line_index.describe(self.pos)} (position {self.pos}): '{char}'")
 
     def get_next_token(self):
-        while self.pos < len(self.text):
-            # 1. Consume whitespace and comments
-            self.skip_whitespace_and_comments()
-
-            # If we've reached the end after skipping, return EOF
-            if self.pos >= len(self.text):
-                return Token('EOF', None)
-
-            longest_match = None
-            matched_type = None
-
-            # 2. Match tokens
-            for pattern, token_type in self.token_patterns:
-                match = re.match(pattern, self.text[self.pos:], re.IGNORECASE if token_type == 'ID' else 0)
-                if match:
-                    if longest_match is None or len(match.group(0)) > len(longest_match.group(0)):
-                        longest_match = match
-                        matched_type = token_type
-            
-            if longest_match:
-                value = longest_match.group(0)
-                self.pos += len(value)
-                if matched_type == 'INTEGER':
-                    return Token(matched_type, int(value))
-                elif matched_type == 'FLOAT':
-                    return Token(matched_type, float(value))
-                elif matched_type == 'KAWAII':
-                    return Token(matched_type, True)
-                elif matched_type == 'CRINGE':
-                    return Token(matched_type, False)
-                elif matched_type == 'NULL':
-                    return Token(matched_type, None)
-                else:
-                    return Token(matched_type, value)
-            else:
+        text = self.text
+        pattern = self.pattern
+        end = len(text)
+        while self.pos < end:
+            match = pattern.match(text, self.pos)
+            if match is None:
                 self.error()
 
-        return Token('EOF', None)
-
-    def skip_whitespace_and_comments(self):
-        while self.pos < len(self.text):
-            # Try to match whitespace
-            whitespace_match = re.match(r'\s+', self.text[self.pos:])
-            if whitespace_match:
-                self.pos += len(whitespace_match.group(0))
+            token_type = match.lastgroup
+            start = self.pos
+            self.pos = match.end()
+            if token_type == 'SKIP':
                 continue
 
-            # Try to match comments
-            comment_match = re.match(r'#.*(?:\n|$)', self.text[self.pos:])
-            if comment_match:
-                self.pos += len(comment_match.group(0))
-                continue
-            
-            # If neither whitespace nor comment, break the loop
-            break
+            value = match.group()
+            if self.is_binary:
+                value = value.decode('utf-8')
+            if token_type == 'ID' or token_type == 'PHRASE':
+                token_type = KEYWORDS.get(value, 'ID')
+            elif token_type in GROUP_ALIASES:
+                token_type = GROUP_ALIASES[token_type]
 
-    def tokenize(self):
-        tokens = []
+            converter = VALUE_CONVERTERS.get(token_type)
+            if converter is not None:
+                value = converter(value)
+            else:
+                # Identifiers and operators repeat constantly; share one string each
+                value = sys.intern(value)
+            return Token(token_type, value, start, self.pos)
+
+        return Token('EOF', None, end, end)
+
+    def iter_tokens(self):
+        # Lazily yields tokens up to and including EOF
         while True:
             token = self.get_next_token()
-            tokens.append(token)
+            yield token
             if token.type == 'EOF':
-                break
-        return tokens
\ No newline at end of file
+                return
+
+    def tokenize(self):
+        tokens = TokenArray(self.line_index)
+        for token in self.iter_tokens():
+            tokens.append(token)
+        return tokens
@@ -1,29 +1,232 @@
+import argparse
+import glob
+import os
 import sys
-from lexer import Lexer
+import time
+import traceback
+from lexer import Lexer, mapped_source
 from parser import Parser
 from interpreter import Interpreter
+from closure_compiler import ClosureInterpreter
+from vm import VirtualMachine
+from transpiler import TranspilingInterpreter, to_python_source
+from bytecode import compile_ast, disassemble
+from resolver import ResolvedInterpreter
+from optimizer import Optimizer
+from shapes import assign_shapes
+from output import OUTPUT_BUFFER_SIZE
+from cache import cache_key, load_cached_program, store_cached_program
+from profiler import ProfilingInterpreter
+from batch import collect_scripts, run_batch
+from incremental import IncrementalParser
+
+# Execution engines selectable with --engine; all share the same semantics
+ENGINES = {
+    'tree': Interpreter,
+    'closure': ClosureInterpreter,
+    'vm': VirtualMachine,
+    'python': TranspilingInterpreter,
+}
+
+RECURSION_HINT = "Error: maximum recursion depth exceeded. Run with --engine vm, which does not use Python's stack for Femcode calls."
+NESTING_ERROR = "Error: maximum recursion depth exceeded. The program is nested too deeply."
+
+def recursion_message(engine):
+    # The VM keeps Femcode calls and expressions off Python's stack, so there
+    # the limit was hit by a pass over a very deeply nested program
+    return NESTING_ERROR if engine == 'vm' else RECURSION_HINT
+
+# Seconds between checks of a watched file for changes
+WATCH_INTERVAL = 0.2
+
+def parse_source(file_path, stream=False, use_cache=True):
+    if stream:
+        # Lex straight from a memory-mapped file and let the parser pull tokens
+        # on demand, so neither the source text nor the token list is held in memory
+        with mapped_source(file_path) as source:
+            lexer = Lexer(source)
+            return Parser(lexer.iter_tokens(), lexer.line_index).parse()
+
+    with open(file_path, 'r') as f:
+        text = f.read()
+
+    if use_cache:
+        key = cache_key(text)
+        program = load_cached_program(file_path, key)
+        if program is not None:
+            return program
+
+    lexer = Lexer(text)
+    tokens = lexer.tokenize()
+
+    parser = Parser(tokens)
+    program = parser.parse()
+    if use_cache:
+        store_cached_program(file_path, key, program)
+    return program
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python3 main.py <femcode_file>")
-        sys.exit(1)
+    arg_parser = argparse.ArgumentParser(prog='femterpreter', description="Run a Femcode program.")
+    arg_parser.add_argument('files', nargs='+', metavar='file', help="path to the .fem file to run; several files, directories or glob patterns run as a batch")
+    arg_parser.add_argument('--engine', choices=sorted(ENGINES), default='tree', help="execution engine to run the program with (default: tree)")
+    arg_parser.add_argument('--resolve', action='store_true', help="resolve variables to frame slots with lexical scoping before running (tree engine only)")
+    arg_parser.add_argument('--transpile', action='store_true', help="translate the program to Python and run it natively (same as --engine python)")
+    arg_parser.add_argument('--emit-python', action='store_true', help="print the Python code generated by --transpile instead of running it")
+    arg_parser.add_argument('--disassemble', action='store_true', help="print the program's bytecode instead of running it")
+    arg_parser.add_argument('-O', '--optimize', action='store_true', help="fold constants, prune dead branches and simplify the tree before running; reports the nodes eliminated on stderr")
+    arg_parser.add_argument('--shapes', action='store_true', help="build dictionary literals with constant keys as compact records that share a shape, with inline caches for property access")
+    arg_parser.add_argument('--stream', action='store_true', help="lex the file lazily from a memory map (for very large sources)")
+    arg_parser.add_argument('--profile', action='store_true', help="profile the program (tree engine only): print per-function and per-statement statistics to stderr and write collapsed stacks for flamegraph tools")
+    arg_parser.add_argument('--profile-stacks', metavar='PATH', help="where --profile writes the collapsed stacks (default: <script name>.folded in the current directory)")
+    arg_parser.add_argument('--no-cache', action='store_true', help="always parse the file instead of using (and writing) the __femcache__ parse cache")
+    arg_parser.add_argument('--output', metavar='PATH', help="write the program's output to this file instead of stdout")
+    arg_parser.add_argument('--output-buffer', type=int, metavar='CHARS', default=OUTPUT_BUFFER_SIZE, help=f"characters of output collected before writing (default: {OUTPUT_BUFFER_SIZE}); 0 writes every line immediately")
+    arg_parser.add_argument('-j', '--jobs', type=int, metavar='N', help="run the files as a batch on N worker processes (default for batches: one per CPU)")
+    arg_parser.add_argument('--timeout', type=float, metavar='SECONDS', help="in a batch, stop any script that runs longer than this")
+    arg_parser.add_argument('--watch', action='store_true', help="run the file again every time it changes, re-parsing only the edited statements")
+    args = arg_parser.parse_args()
+    if args.resolve and (args.engine != 'tree' or args.transpile):
+        arg_parser.error("--resolve is only supported by the tree engine")
+    if args.profile and (args.engine != 'tree' or args.transpile or args.resolve):
+        arg_parser.error("--profile is only supported by the tree engine, without --resolve")
+
+    if args.output_buffer < 0:
+        arg_parser.error("--output-buffer cannot be negative")
+
+    if args.jobs is not None or len(args.files) > 1 or os.path.isdir(args.files[0]) or glob.has_magic(args.files[0]):
+        if args.emit_python or args.disassemble or args.profile or args.stream or args.output or args.watch:
+            arg_parser.error("--emit-python, --disassemble, --profile, --stream, --output and --watch take a single file")
+        if args.jobs is not None and args.jobs < 1:
+            arg_parser.error("--jobs must be at least 1")
+        return run_files(args)
+    if args.timeout is not None:
+        arg_parser.error("--timeout is only supported for batches (use --jobs)")
+    if args.watch and args.stream:
+        arg_parser.error("--watch cannot be combined with --stream")
 
-    file_path = sys.argv[1]
+    file_path = args.files[0]
+    if args.watch:
+        return watch(file_path, args)
     try:
-        with open(file_path, 'r') as f:
-            text = f.read()
+        ast = parse_source(file_path, stream=args.stream, use_cache=not args.no_cache)
     except FileNotFoundError:
         print(f"Error: File not found: {file_path}")
         sys.exit(1)
 
-    lexer = Lexer(text)
-    tokens = lexer.tokenize()
+    try:
+        execute(ast, file_path, args)
+    except RecursionError:
+        print(recursion_message('python' if args.transpile else args.engine), file=sys.stderr)
+        sys.exit(1)
 
-    parser = Parser(tokens)
-    ast = parser.parse()
+def execute(ast, file_path, args):
+    # Everything a single-file run does once the program is parsed
+    if args.optimize:
+        optimizer = Optimizer()
+        ast = optimizer.optimize_program(ast)
+        print(optimizer.report(), file=sys.stderr)
+    if args.shapes:
+        ast = assign_shapes(ast)
+
+    if args.disassemble:
+        print(disassemble(compile_ast(ast)))
+        return
+
+    if args.emit_python:
+        print(to_python_source(ast))
+        return
+
+    engine = 'python' if args.transpile else args.engine
+    output_file = open(args.output, 'w') if args.output else None
+    try:
+        if args.profile:
+            return run_profiled(ast, file_path, args, output_file)
+        run_program(ast, engine, args.resolve, output_file, args.output_buffer)
+    finally:
+        if output_file is not None:
+            output_file.close()
+
+def watch(file_path, args):
+    # Runs the file, then again after every change until interrupted. The
+    # parser keeps the previous version, so a save only re-lexes and
+    # re-parses the statements that were edited. Errors are reported and the
+    # watch goes on.
+    if not os.path.isfile(file_path):
+        print(f"Error: File not found: {file_path}")
+        sys.exit(1)
+    incremental = IncrementalParser()
+    last_seen = None
+    try:
+        while True:
+            try:
+                stat = os.stat(file_path)
+                seen = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                # Some editors save by replacing the file; wait for the new one
+                seen = last_seen
+            if seen != last_seen:
+                last_seen = seen
+                run_watched(incremental, file_path, args)
+            time.sleep(WATCH_INTERVAL)
+    except KeyboardInterrupt:
+        pass
 
-    interpreter = Interpreter(ast)
-    interpreter.interpret()
+def run_watched(incremental, file_path, args):
+    try:
+        with open(file_path, 'r') as f:
+            text = f.read()
+        start = time.perf_counter()
+        ast = incremental.parse(text)
+        print(f"[watch] {file_path}: {incremental.summary()} in {(time.perf_counter() - start) * 1000:.1f} ms", file=sys.stderr)
+    except Exception as error:
+        # Syntax errors are common mid-edit; the message says where
+        print(f"Error: {error}", file=sys.stderr)
+    else:
+        try:
+            execute(ast, file_path, args)
+        except RecursionError:
+            print(recursion_message('python' if args.transpile else args.engine), file=sys.stderr)
+        except Exception:
+            traceback.print_exc()
+    print(f"[watch] Waiting for changes to {file_path} (Ctrl+C to stop)", file=sys.stderr)
+
+def run_program(ast, engine='tree', resolve=False, stdout=None, buffer_size=OUTPUT_BUFFER_SIZE):
+    interpreter_class = ResolvedInterpreter if resolve else ENGINES[engine]
+    interpreter_class(ast, stdout, buffer_size=buffer_size).interpret()
+
+def run_files(args):
+    scripts = collect_scripts(args.files)
+    if not scripts:
+        print("Error: No .fem files found", file=sys.stderr)
+        sys.exit(1)
+    options = {
+        'engine': 'python' if args.transpile else args.engine,
+        'resolve': args.resolve,
+        'optimize': args.optimize,
+        'shapes': args.shapes,
+        'use_cache': not args.no_cache,
+        'timeout': args.timeout,
+        'buffer_size': args.output_buffer,
+    }
+    failures = run_batch(scripts, args.jobs or os.cpu_count() or 1, options)
+    if failures:
+        sys.exit(1)
+
+def run_profiled(ast, file_path, args, output_file=None):
+    # Statement positions are offsets into the text the parser saw: bytes
+    # with --stream, decoded text otherwise
+    with open(file_path, 'rb' if args.stream else 'r') as f:
+        source = f.read()
+    stacks_path = args.profile_stacks or os.path.splitext(os.path.basename(file_path))[0] + '.folded'
+
+    profiler = ProfilingInterpreter(ast, source, output_file, args.output_buffer)
+    try:
+        profiler.interpret()
+    finally:
+        # Report even when the program fails; the profile of a crash is still useful
+        print(profiler.report(), file=sys.stderr)
+        profiler.write_collapsed_stacks(stacks_path)
+        print(f"Collapsed stacks written to {stacks_path}", file=sys.stderr)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,207 @@
+import operator
+from array import array
+from itertools import repeat
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Packed numeric arrays: array(values) stores int64 ('q') or float64 ('d')
+# elements contiguously. Arithmetic and the ordering comparisons work
+# elementwise with another array of the same length or with a number. == and
+# != compare whole arrays, like lists, so they can be used as conditions;
+# equal() and not_equal() compare element by element.
+#
+# With NumPy installed, float arithmetic runs as NumPy ufuncs over the same
+# buffers (no conversion, results written straight into the new array).
+# Integer arithmetic always uses Python ints so it raises OverflowError
+# instead of wrapping around, and mixed int/float comparisons keep Python's
+# exact semantics. Results are the same with or without NumPy (except for
+# dividing integers beyond 2**53, which NumPy converts to float first).
+
+NUMPY_DTYPES = {'q': 'int64', 'd': 'float64'}
+
+NUMPY_FUNCTIONS = {} if numpy is None else {
+    operator.add: numpy.add,
+    operator.sub: numpy.subtract,
+    operator.mul: numpy.multiply,
+    operator.truediv: numpy.true_divide,
+    operator.eq: numpy.equal,
+    operator.ne: numpy.not_equal,
+    operator.lt: numpy.less,
+    operator.le: numpy.less_equal,
+    operator.gt: numpy.greater,
+    operator.ge: numpy.greater_equal,
+}
+
+def _is_number(value):
+    return isinstance(value, (int, float))
+
+class NumericArray:
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __getitem__(self, index):
+        # Reads one element from the packed buffer; nothing is copied
+        return self.data[index]
+
+    def __repr__(self):
+        return f"array({self.data.tolist()})"
+
+    __hash__ = None
+
+    def _typecode(self, other, operation):
+        if operation is operator.truediv or self.data.typecode == 'd':
+            return 'd'
+        if isinstance(other, NumericArray):
+            return other.data.typecode
+        return 'd' if isinstance(other, float) else 'q'
+
+    def _operands(self, other):
+        # (own elements, other elements) with other an array or a number
+        if isinstance(other, NumericArray):
+            if len(other.data) != len(self.data):
+                raise ValueError(f"Arrays have different lengths ({len(self.data)} and {len(other.data)})")
+            return self.data, other.data
+        return self.data, other
+
+    def _arithmetic(self, other, operation, reflected=False):
+        if not (isinstance(other, NumericArray) or _is_number(other)):
+            return NotImplemented
+        left, right = self._operands(other)
+        if reflected:
+            left, right = right, left
+        if operation is operator.truediv and (right == 0 if _is_number(right) else 0 in right):
+            # NumPy would produce inf/nan; Femcode raises like scalar division
+            raise ZeroDivisionError("division by zero")
+
+        typecode = self._typecode(other, operation)
+        if numpy is not None and typecode == 'd':
+            result = array('d', [0.0]) * len(self.data)
+            # Overflow to inf and inf - inf = nan are silent, as for Python floats
+            with numpy.errstate(all='ignore'):
+                NUMPY_FUNCTIONS[operation](_as_numpy(left), _as_numpy(right), out=numpy.frombuffer(result, dtype='float64'))
+            return NumericArray(result)
+        if _is_number(left):
+            values = map(operation, repeat(left), right)
+        elif _is_number(right):
+            values = map(operation, left, repeat(right))
+        else:
+            values = map(operation, left, right)
+        return NumericArray(array(typecode, values))
+
+    def _comparison(self, other, operation):
+        if not (isinstance(other, NumericArray) or _is_number(other)):
+            return NotImplemented
+        left, right = self._operands(other)
+        if numpy is not None and left.typecode == 'd' and (isinstance(right, float) or getattr(right, 'typecode', None) == 'd'):
+            with numpy.errstate(all='ignore'):
+                return NUMPY_FUNCTIONS[operation](_as_numpy(left), _as_numpy(right)).tolist()
+        if _is_number(right):
+            return list(map(operation, left, repeat(right)))
+        return list(map(operation, left, right))
+
+    def __add__(self, other):
+        return self._arithmetic(other, operator.add)
+
+    def __radd__(self, other):
+        return self._arithmetic(other, operator.add, reflected=True)
+
+    def __sub__(self, other):
+        return self._arithmetic(other, operator.sub)
+
+    def __rsub__(self, other):
+        return self._arithmetic(other, operator.sub, reflected=True)
+
+    def __mul__(self, other):
+        return self._arithmetic(other, operator.mul)
+
+    def __rmul__(self, other):
+        return self._arithmetic(other, operator.mul, reflected=True)
+
+    def __truediv__(self, other):
+        return self._arithmetic(other, operator.truediv)
+
+    def __rtruediv__(self, other):
+        return self._arithmetic(other, operator.truediv, reflected=True)
+
+    def __eq__(self, other):
+        if isinstance(other, NumericArray):
+            return self.data == other.data
+        return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __lt__(self, other):
+        return self._comparison(other, operator.lt)
+
+    def __le__(self, other):
+        return self._comparison(other, operator.le)
+
+    def __gt__(self, other):
+        return self._comparison(other, operator.gt)
+
+    def __ge__(self, other):
+        return self._comparison(other, operator.ge)
+
+def _as_numpy(operand):
+    if isinstance(operand, array):
+        return numpy.frombuffer(operand, dtype=NUMPY_DTYPES[operand.typecode])
+    return operand
+
+def _elementwise(left, right, operation, name):
+    # == and != are symmetric, so the array can be either operand
+    result = NotImplemented
+    if isinstance(left, NumericArray):
+        result = left._comparison(right, operation)
+    elif isinstance(right, NumericArray):
+        result = right._comparison(left, operation)
+    if result is NotImplemented:
+        raise TypeError(f"{name}() needs an array and an array or number, got {type(left).__name__} and {type(right).__name__}")
+    return result
+
+def equal(left, right):
+    return _elementwise(left, right, operator.eq, 'equal')
+
+def not_equal(left, right):
+    return _elementwise(left, right, operator.ne, 'not_equal')
+
+def make_array(values):
+    # Integers (and booleans) pack as int64; any float makes the array float64
+    if isinstance(values, NumericArray):
+        return NumericArray(array(values.data.typecode, values.data))
+    if not isinstance(values, (list, range)):
+        raise TypeError(f"array() needs a list or range of numbers, got {type(values).__name__}")
+    try:
+        return NumericArray(array('q', values))
+    except TypeError:
+        pass
+    try:
+        return NumericArray(array('d', values))
+    except TypeError:
+        raise TypeError("array() needs a list or range of numbers") from None
+
+def mean(values):
+    if isinstance(values, (list, range, NumericArray)):
+        count = len(values)
+        total = sum(values)
+    else:
+        # Streams can only be read once: count while summing
+        count = 0
+        total = 0
+        for value in values:
+            total += value
+            count += 1
+    if not count:
+        raise ValueError("mean() of an empty sequence")
+    return total / count
@@ -0,0 +1,228 @@
+from lexer import Token
+from parser import (
+    AST, Assign, BinOp, Block, Boolean, Decrement, ForStatement, FunctionDefinition, IfStatement,
+    Increment, Null, Number, Op, String, Variable, WhileStatement, copy_position, count_nodes,
+    iter_child_nodes,
+)
+from runtime import BINARY_OPERATORS, COMPARISON_OPERATORS
+
+CONSTANT_NODES = (Number, String, Boolean, Null)
+
+# Folding never produces strings longer than this, so `"ab" * 1000000` stays
+# a computation instead of bloating the tree
+MAX_FOLDED_LENGTH = 4096
+
+def is_constant(node):
+    return isinstance(node, CONSTANT_NODES)
+
+def constant_value(node):
+    return None if isinstance(node, Null) else node.value
+
+def make_constant(value):
+    if value is None:
+        return Null()
+    if isinstance(value, bool):
+        return Boolean(Token('KAWAII' if value else 'CRINGE', value))
+    if isinstance(value, int):
+        return Number(Token('INTEGER', value))
+    if isinstance(value, float):
+        return Number(Token('FLOAT', value))
+    return String(Token('STRING', value))
+
+def step_amount(node):
+    # The number n of x is x + n / x is x - n, or None
+    right = node.right
+    if (
+        isinstance(right, BinOp)
+        and right.op in (Op.PLUS, Op.MINUS)
+        and isinstance(right.left, Variable)
+        and right.left.value == node.left.value
+        and isinstance(right.right, Number)
+    ):
+        return right.right
+    return None
+
+def numeric_names(program):
+    # Names that hold a number whenever the program has set them: every
+    # assignment to them anywhere is a number literal or x +/- a number, and
+    # they are never a parameter or a loop variable
+    names = set()
+    other = set()
+    stack = list(program)
+    while stack:
+        node = stack.pop()
+        if node.__class__ is Assign:
+            numeric = isinstance(node.right, Number) or step_amount(node) is not None
+            (names if numeric else other).add(node.left.value)
+        elif node.__class__ is ForStatement:
+            other.add(node.var_name)
+        elif node.__class__ is FunctionDefinition:
+            other.update(node.parameters)
+        stack.extend(iter_child_nodes(node))
+    return names - other
+
+class Optimizer:
+    # Simplifies a parsed program before it is run. Every rewrite keeps the
+    # program's behaviour, including its runtime errors: an operation that
+    # would raise (1 / 0, "a" - 1) is left in the tree to raise when it runs.
+    # The input tree is not modified; changed nodes are rebuilt.
+
+    def __init__(self):
+        self.folded = 0
+        self.pruned = 0
+        self.empty_blocks = 0
+        self.steps = 0
+        self.nodes_before = 0
+        self.nodes_after = 0
+        # Variables known to hold a number in the statement being optimized
+        self.numeric = set()
+
+    def optimize_program(self, program):
+        self.nodes_before = count_nodes(program)
+        # A name in numeric_names is a number from the first top-level
+        # x is <number> on, in every scope: variables predefined by the host
+        # (femcode.Program.run) are overwritten by then, and no assignment
+        # after it stores anything else
+        always_numeric = numeric_names(program)
+        statements = []
+        for node in program:
+            statements.extend(self.statements([node]))
+            if node.__class__ is Assign and isinstance(node.right, Number) and node.left.value in always_numeric:
+                self.numeric.add(node.left.value)
+        self.nodes_after = count_nodes(statements)
+        return statements
+
+    def report(self):
+        return (
+            f"Optimizer: {self.nodes_before} -> {self.nodes_after} nodes "
+            f"({self.nodes_before - self.nodes_after} eliminated; "
+            f"{self.folded} constant expressions folded, {self.pruned} branches pruned, "
+            f"{self.empty_blocks} empty blocks removed, {self.steps} assignments turned into ++/--)"
+        )
+
+    def statements(self, nodes):
+        # Blocks do not open a scope, so a Block left in a statement list (an
+        # empty Slay, or the surviving branch of a pruned if) is spliced in
+        result = []
+        for node in nodes:
+            optimized = self.optimize(node)
+            if isinstance(optimized, Block):
+                if isinstance(node, Block) and not optimized.statements:
+                    self.empty_blocks += 1
+                result.extend(optimized.statements)
+            else:
+                result.append(optimized)
+        return result
+
+    def optimize(self, node):
+        method = getattr(self, f'optimize_{type(node).__name__}', None)
+        if method is not None:
+            return method(node)
+        return self.optimize_children(node)
+
+    def optimize_children(self, node):
+        optimized = object.__new__(type(node))
+        for field in type(node).__slots__:
+            setattr(optimized, field, self.optimize_value(getattr(node, field)))
+        return copy_position(optimized, node)
+
+    def optimize_value(self, value):
+        if isinstance(value, AST):
+            return self.optimize(value)
+        if isinstance(value, list):
+            return [self.optimize_value(item) for item in value]
+        if isinstance(value, tuple):
+            return tuple(self.optimize_value(item) for item in value)
+        return value
+
+    def fold(self, operation, *operands):
+        try:
+            value = operation(*operands)
+        except Exception:
+            return None
+        if isinstance(value, str) and len(value) > MAX_FOLDED_LENGTH:
+            return None
+        if value is not None and not isinstance(value, (bool, int, float, str)):
+            return None
+        self.folded += 1
+        return make_constant(value)
+
+    # Statements
+
+    def optimize_Block(self, node):
+        return Block(self.statements(node.statements))
+
+    def optimize_IfStatement(self, node):
+        condition = self.optimize(node.condition)
+        if is_constant(condition):
+            self.pruned += 1
+            branch = node.if_block if constant_value(condition) else node.else_block
+            return self.optimize(branch) if branch is not None else Block([])
+
+        else_block = self.optimize(node.else_block) if node.else_block is not None else None
+        return copy_position(IfStatement(condition, self.optimize(node.if_block), else_block), node)
+
+    def optimize_WhileStatement(self, node):
+        condition = self.optimize(node.condition)
+        if is_constant(condition) and not constant_value(condition):
+            self.pruned += 1
+            return Block([])
+        return copy_position(WhileStatement(condition, self.optimize(node.body)), node)
+
+    def optimize_Assign(self, node):
+        optimized = self.optimize_children(node)
+        # x is x + 1 (and x += 1) -> x++, x is x - 1 -> x--. Only for the int 1:
+        # x + 1.0 would turn an int into a float, which ++ never does. Only
+        # when x is known to be a number: on anything else ++ fails with its
+        # own error instead of the one + gives.
+        amount = step_amount(optimized)
+        if (
+            amount is not None
+            and type(amount.value) is int
+            and amount.value == 1
+            and node.left.value in self.numeric
+        ):
+            self.steps += 1
+            step = Increment(optimized.left) if optimized.right.op is Op.PLUS else Decrement(optimized.left)
+            return copy_position(step, node)
+        return optimized
+
+    # Expressions
+
+    def optimize_BinOp(self, node):
+        optimized = self.optimize_children(node)
+        if is_constant(optimized.left) and is_constant(optimized.right):
+            folded = self.fold(BINARY_OPERATORS[node.op], constant_value(optimized.left), constant_value(optimized.right))
+            if folded is not None:
+                return folded
+        return optimized
+
+    def optimize_Comparison(self, node):
+        optimized = self.optimize_children(node)
+        if is_constant(optimized.left) and is_constant(optimized.right):
+            folded = self.fold(COMPARISON_OPERATORS[node.op], constant_value(optimized.left), constant_value(optimized.right))
+            if folded is not None:
+                return folded
+        return optimized
+
+    def optimize_LogicalOp(self, node):
+        optimized = self.optimize_children(node)
+        if not is_constant(optimized.left):
+            return optimized
+        # Like Python's and/or, the result is one of the operands: a constant
+        # left side either decides the result or hands over to the right side
+        self.folded += 1
+        left_value = constant_value(optimized.left)
+        if node.op is Op.AND:
+            return optimized.right if left_value else optimized.left
+        return optimized.left if left_value else optimized.right
+
+    def optimize_UnaryOp(self, node):
+        optimized = self.optimize_children(node)
+        if node.op is Op.NOT and is_constant(optimized.right):
+            self.folded += 1
+            return make_constant(not constant_value(optimized.right))
+        return optimized
+
+def optimize_program(program):
+    return Optimizer().optimize_program(program)
@@ -0,0 +1,41 @@
+import sys
+
+# Characters collected before UwU Boy output is written out
+OUTPUT_BUFFER_SIZE = 64 * 1024
+
+class OutputBuffer:
+    # Collects printed lines and writes them to the sink in large chunks
+    # instead of one write per UwU Boy. The interpreter flushes it when the
+    # buffer is full, before ask() shows a prompt, and when the program ends,
+    # normally or with an error. A size of 0 writes every line immediately.
+    # With no sink, output goes to whatever sys.stdout is at flush time, so
+    # contextlib.redirect_stdout still captures it.
+
+    __slots__ = ('sink', 'size', 'parts', 'pending')
+
+    def __init__(self, sink=None, size=OUTPUT_BUFFER_SIZE):
+        self.sink = sink
+        self.size = size
+        self.parts = []
+        self.pending = 0
+
+    def write_line(self, value):
+        text = f"{value}\n"
+        self.parts.append(text)
+        self.pending += len(text)
+        if self.pending >= self.size:
+            self.flush()
+
+    def write(self, text):
+        self.parts.append(text)
+        self.pending += len(text)
+        if self.pending >= self.size:
+            self.flush()
+
+    def flush(self):
+        sink = self.sink if self.sink is not None else sys.stdout
+        if self.parts:
+            sink.write(''.join(self.parts))
+            self.parts.clear()
+            self.pending = 0
+        sink.flush()
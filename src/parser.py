@@ -1,149 +1,292 @@
-from lexer import Token
+from enum import IntEnum
+
+from lexer import Token, TokenStream
+
+class Op(IntEnum):
+    # Operator kinds stored on AST nodes in place of the operator Token
+    PLUS = 1
+    MINUS = 2
+    MUL = 3
+    DIV = 4
+    EQ = 5
+    NEQ = 6
+    GT = 7
+    GTE = 8
+    LT = 9
+    LTE = 10
+    AND = 11
+    OR = 12
+    NOT = 13
+    ASSIGN = 14
 
 class AST:
-    pass
+    # Nodes declare their fields in __slots__, in child order, so tree walkers
+    # can iterate them generically and no node carries a __dict__
+    __slots__ = ()
+
+class Statement(AST):
+    # Nodes that can stand as a statement. position is the source offset of
+    # the statement's first token; it is set by Parser.parse_statement and is
+    # not part of the node's own __slots__, so generic walkers never see it.
+    __slots__ = ('position',)
+
+def copy_position(target, source):
+    # Carries a statement's source position over to a node rebuilt from it
+    position = getattr(source, 'position', None)
+    if position is not None and isinstance(target, Statement):
+        target.position = position
+    return target
+
+def iter_child_nodes(node):
+    # Yields the direct AST children of node, including those inside lists
+    # (statements, arguments) and the (key, value) pairs of a Dictionary
+    for field in type(node).__slots__:
+        value = getattr(node, field)
+        if isinstance(value, AST):
+            yield value
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                if isinstance(item, AST):
+                    yield item
+                elif isinstance(item, tuple):
+                    for pair_item in item:
+                        if isinstance(pair_item, AST):
+                            yield pair_item
+
+def count_nodes(nodes):
+    count = 0
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(iter_child_nodes(node))
+    return count
 
 class Number(AST):
+    __slots__ = ('value',)
+
     def __init__(self, token):
-        self.token = token
         self.value = token.value
 
 class String(AST):
+    __slots__ = ('value',)
+
     def __init__(self, token):
-        self.token = token
         self.value = token.value
 
 class Boolean(AST):
+    __slots__ = ('value',)
+
     def __init__(self, token):
-        self.token = token
         self.value = token.value
 
+class Null(AST):
+    __slots__ = ()
+
 class LogicalOp(AST):
+    __slots__ = ('left', 'op', 'right')
+
     def __init__(self, left, op, right=None):
         self.left = left
-        self.op = op
+        self.op = Op[op.type]
         self.right = right
 
 class UnaryOp(AST):
+    __slots__ = ('op', 'right')
+
     def __init__(self, op, right):
-        self.op = op
+        self.op = Op[op.type]
         self.right = right
 
 class BinOp(AST):
+    __slots__ = ('left', 'op', 'right')
+
     def __init__(self, left, op, right):
         self.left = left
-        self.token = self.op = op
+        self.op = Op[op.type]
         self.right = right
 
 class Comparison(AST):
+    __slots__ = ('left', 'op', 'right')
+
     def __init__(self, left, op, right):
         self.left = left
-        self.op = op
+        self.op = Op[op.type]
         self.right = right
 
-class Print(AST):
+class Print(Statement):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
-class Assign(AST):
+class Assign(Statement):
+    __slots__ = ('left', 'op', 'right')
+
     def __init__(self, left, op, right):
         self.left = left
-        self.op = op
+        self.op = Op[op.type]
         self.right = right
 
 class Variable(AST):
+    __slots__ = ('value',)
+
     def __init__(self, token):
-        self.token = token
         self.value = token.value
 
-class Block(AST):
+class Block(Statement):
+    __slots__ = ('statements',)
+
     def __init__(self, statements):
         self.statements = statements
 
-class IfStatement(AST):
+class IfStatement(Statement):
+    __slots__ = ('condition', 'if_block', 'else_block')
+
     def __init__(self, condition, if_block, else_block=None):
         self.condition = condition
         self.if_block = if_block
         self.else_block = else_block
 
-class WhileStatement(AST):
+class WhileStatement(Statement):
+    __slots__ = ('condition', 'body')
+
     def __init__(self, condition, body):
         self.condition = condition
         self.body = body
 
-class ForStatement(AST):
+class ForStatement(Statement):
+    __slots__ = ('var_name', 'iterable', 'body')
+
     def __init__(self, var_name, iterable, body):
         self.var_name = var_name
         self.iterable = iterable
         self.body = body
 
-class BreakStatement(AST):
-    pass
+class BreakStatement(Statement):
+    __slots__ = ()
+
+class ContinueStatement(Statement):
+    __slots__ = ()
 
-class ContinueStatement(AST):
-    pass
+class TryExceptStatement(Statement):
+    __slots__ = ('try_block', 'except_block')
 
-class TryExceptStatement(AST):
     def __init__(self, try_block, except_block):
         self.try_block = try_block
         self.except_block = except_block
 
-class Increment(AST):
+class Increment(Statement):
+    __slots__ = ('var_name',)
+
     def __init__(self, var_name):
         self.var_name = var_name
 
-class Decrement(AST):
+class Decrement(Statement):
+    __slots__ = ('var_name',)
+
     def __init__(self, var_name):
         self.var_name = var_name
 
-class FunctionDefinition(AST):
+class FunctionDefinition(Statement):
+    __slots__ = ('name', 'parameters', 'body')
+
     def __init__(self, name, parameters, body):
         self.name = name
         self.parameters = parameters
         self.body = body
 
-class FunctionCall(AST):
+class FunctionCall(Statement):
+    __slots__ = ('name', 'arguments')
+
     def __init__(self, name, arguments):
         self.name = name
         self.arguments = arguments
 
-class ReturnStatement(AST):
+class ReturnStatement(Statement):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
 class List(AST):
+    __slots__ = ('elements',)
+
     def __init__(self, elements):
         self.elements = elements
 
 class IndexAccess(AST):
+    __slots__ = ('target', 'index')
+
     def __init__(self, target, index):
         self.target = target
         self.index = index
 
 class Dictionary(AST):
+    __slots__ = ('pairs',)
+
     def __init__(self, pairs):
         self.pairs = pairs # List of (key_expr, value_expr) tuples
 
 class PropertyAccess(AST):
+    __slots__ = ('target', 'property_name')
+
     def __init__(self, target, property_name):
         self.target = target
         self.property_name = property_name
 
+# Binding strength of the binary operators. and/or bind loosest and share a
+# level, as do the comparisons.
+BINARY_PRECEDENCE = {
+    'AND': 1, 'OR': 1,
+    'EQ': 2, 'NEQ': 2, 'GT': 2, 'GTE': 2, 'LT': 2, 'LTE': 2,
+    'PLUS': 3, 'MINUS': 3,
+    'MUL': 4, 'DIV': 4,
+}
+COMPARISON_PRECEDENCE = 2
+BINARY_NODES = {1: LogicalOp, 2: Comparison, 3: BinOp, 4: BinOp}
+
+class OpenExpression:
+    # A bracket Parser.expression has opened and not closed yet: '(' (group),
+    # 'f(' (call), 'x[' (index), '[' (list) or '{' (dictionary). target is the
+    # called function's name, the indexed variable or a dictionary's pending
+    # key; items are the arguments, elements or (key, value) pairs so far.
+    __slots__ = ('kind', 'target', 'items', 'operands', 'operators')
+
+    def __init__(self, kind, target=None):
+        self.kind = kind
+        self.target = target
+        self.items = []
+        self.operands = []
+        self.operators = []
+
 class Parser:
-    def __init__(self, tokens):
-        self.tokens = tokens
+    def __init__(self, tokens, line_index=None):
+        # tokens may be a list or any iterable (e.g. Lexer.iter_tokens()),
+        # which is consumed lazily through a small lookahead buffer
+        self.line_index = line_index if line_index is not None else getattr(tokens, 'line_index', None)
+        self.tokens = tokens if isinstance(tokens, TokenStream) else TokenStream(tokens)
         self.pos = 0
 
+    def error(self, message, token=None):
+        token = token if token is not None else self.get_current_token()
+        if self.line_index is not None and token.start is not None:
+            message = f"{message} at {self.line_index.describe(token.start)}"
+        raise Exception(message)
+
     def get_current_token(self):
-        if self.pos < len(self.tokens):
-            return self.tokens[self.pos]
-        return Token('EOF', None)
+        return self.tokens.peek()
+
+    def peek_token(self, offset=1):
+        return self.tokens.peek(offset)
 
     def consume(self, token_type):
-        if self.get_current_token().type == token_type:
+        token = self.tokens.peek()
+        if token.type == token_type:
+            self.tokens.advance()
             self.pos += 1
         else:
-            raise Exception(f"Expected {token_type}, got {self.get_current_token().type}")
+            self.error(f"Expected {token_type}, got {token.type}", token)
 
     def parse(self):
         statements = []
@@ -152,6 +295,13 @@ class Parser:
         return statements
 
     def parse_statement(self):
+        start = self.get_current_token().start
+        node = self.parse_statement_node()
+        if start is not None:
+            node.position = start
+        return node
+
+    def parse_statement_node(self):
         token = self.get_current_token()
 
         if token.type == 'PRINT':
@@ -159,10 +309,10 @@ class Parser:
 
         if token.type == 'ID':
             # Check for assignment
-            if self.pos + 1 < len(self.tokens) and self.tokens[self.pos + 1].type in ('ASSIGN', 'PLUS_ASSIGN', 'MINUS_ASSIGN', 'MUL_ASSIGN', 'DIV_ASSIGN'):
+            if self.peek_token().type in ('ASSIGN', 'PLUS_ASSIGN', 'MINUS_ASSIGN', 'MUL_ASSIGN', 'DIV_ASSIGN'):
                 return self.parse_assignment_statement()
             # Check for increment/decrement as a statement
-            if self.pos + 1 < len(self.tokens) and self.tokens[self.pos + 1].type in ('INCREMENT', 'DECREMENT'):
+            if self.peek_token().type in ('INCREMENT', 'DECREMENT'):
                 var_token = self.get_current_token()
                 self.consume('ID')
                 op_token = self.get_current_token()
@@ -172,7 +322,7 @@ class Parser:
                 else:
                     return Decrement(Variable(var_token))
             # Check for function call as a statement
-            if self.pos + 1 < len(self.tokens) and self.tokens[self.pos + 1].type == 'LPAREN':
+            if self.peek_token().type == 'LPAREN':
                 # Consume the ID token first, then parse the function call
                 name_token = self.get_current_token()
                 self.consume('ID') # Consume the ID token
@@ -208,7 +358,7 @@ class Parser:
         if token.type == 'TRY':
             return self.parse_try_except_statement()
 
-        raise Exception(f"Invalid statement starting with token {token.type}")
+        self.error(f"Invalid statement starting with token {token.type}", token)
 
     def parse_print_statement(self):
         self.consume('PRINT')
@@ -224,7 +374,7 @@ class Parser:
         if assign_op_token.type in ('ASSIGN', 'PLUS_ASSIGN', 'MINUS_ASSIGN', 'MUL_ASSIGN', 'DIV_ASSIGN'):
             self.consume(assign_op_token.type)
         else:
-            raise Exception(f"Expected assignment operator, got {assign_op_token.type}")
+            self.error(f"Expected assignment operator, got {assign_op_token.type}", assign_op_token)
 
         right_expr = self.expression()
 
@@ -339,7 +489,63 @@ class Parser:
         value = self.expression()
         return ReturnStatement(value)
 
-    def factor(self):
+    # Expressions are parsed without recursion, with an explicit stack of the
+    # brackets still open, so nesting depth is only limited by memory. Each
+    # open bracket keeps its own operand and operator stacks (shunting-yard).
+
+    def expression(self):
+        stack = [OpenExpression('expression')]
+        while True:
+            frame = stack[-1]
+            # Operand position: any number of `not`, then a value or the
+            # start of a nested expression
+            while self.get_current_token().type == 'NOT':
+                token = self.get_current_token()
+                self.consume('NOT')
+                frame.operators.append(token)
+            node = self.operand(stack)
+            while node is not None:
+                frame = stack[-1]
+                # not applies to the operand right after it
+                operators = frame.operators
+                while operators and operators[-1].type == 'NOT':
+                    node = UnaryOp(operators.pop(), node)
+                frame.operands.append(node)
+
+                token = self.get_current_token()
+                precedence = BINARY_PRECEDENCE.get(token.type)
+                if precedence is not None:
+                    if operators:
+                        self.reduce(frame, precedence)
+                    self.consume(token.type)
+                    operators.append(token)
+                    break
+                # The expression inside this frame is complete
+                if operators:
+                    self.reduce(frame, 0)
+                node = frame.operands.pop()
+                if len(stack) == 1:
+                    return node
+                node = self.close_bracket(stack, node)
+
+    def reduce(self, frame, precedence):
+        # Builds the nodes for the stacked operators that bind at least as
+        # tightly as an operator of the given precedence. Comparisons group
+        # to the right: a < b < c is a < (b < c).
+        operators = frame.operators
+        operands = frame.operands
+        while operators:
+            top = BINARY_PRECEDENCE[operators[-1].type]
+            if top < precedence or (top == precedence and top == COMPARISON_PRECEDENCE):
+                break
+            op_token = operators.pop()
+            right = operands.pop()
+            left = operands.pop()
+            operands.append(BINARY_NODES[top](left=left, op=op_token, right=right))
+
+    def operand(self, stack):
+        # Returns the value at the current token, or None after opening a
+        # bracket whose contents are parsed next
         token = self.get_current_token()
         if token.type == 'INTEGER':
             self.consume('INTEGER')
@@ -364,13 +570,20 @@ class Parser:
             next_token = self.get_current_token()
             if next_token.type == 'LPAREN':
                 # It's a function call
-                return self.parse_function_call(id_token)
+                self.consume('LPAREN')
+                if self.get_current_token().type == 'RPAREN':
+                    self.consume('RPAREN')
+                    return FunctionCall(id_token.value, [])
+                stack.append(OpenExpression('call', id_token.value))
+                return None
             elif next_token.type == 'DOT':
                 # It's a property access
                 return self.parse_property_access(Variable(id_token)) # Pass Variable node as target
             elif next_token.type == 'LBRACKET':
                 # It's an index access
-                return self.parse_index_access(Variable(id_token))
+                self.consume('LBRACKET')
+                stack.append(OpenExpression('index', Variable(id_token)))
+                return None
             elif next_token.type == 'INCREMENT':
                 self.consume('INCREMENT')
                 return Increment(Variable(id_token))
@@ -382,57 +595,62 @@ class Parser:
                 return Variable(id_token)
         elif token.type == 'LPAREN': # Handle parenthesized expressions
             self.consume('LPAREN')
-            node = self.expression()
-            self.consume('RPAREN')
-            return node
+            stack.append(OpenExpression('group'))
+            return None
         elif token.type == 'LBRACKET': # Handle list literals
-            return self.parse_list_literal()
+            self.consume('LBRACKET')
+            if self.get_current_token().type == 'RBRACKET':
+                self.consume('RBRACKET')
+                return List([])
+            stack.append(OpenExpression('list'))
+            return None
         elif token.type == 'LBRACE': # Handle dictionary literals
-            return self.parse_dictionary_literal()
+            self.consume('LBRACE')
+            if self.get_current_token().type == 'RBRACE':
+                self.consume('RBRACE')
+                return Dictionary([])
+            stack.append(OpenExpression('dictionary'))
+            return None
         else:
-            raise Exception(f"Expected integer, string, boolean, identifier, or literal, got {token.type}")
-
-    def unary_expression(self):
-        token = self.get_current_token()
-        if token.type == 'NOT':
-            self.consume('NOT')
-            right_node = self.unary_expression() # NOT applies to the next unary_expression
-            return UnaryOp(token, right_node)
-        return self.factor()
-
-    def term(self):
-        node = self.unary_expression()
-        while self.get_current_token().type in ('MUL', 'DIV'):
-            token = self.get_current_token()
-            self.consume(token.type)
-            node = BinOp(left=node, op=token, right=self.unary_expression())
-        return node
-
-    def comparison_expression(self):
-        node = self.term()
-
-        # Handle addition/subtraction
-        while self.get_current_token().type in ('PLUS', 'MINUS'):
-            token = self.get_current_token()
-            self.consume(token.type)
-            node = BinOp(left=node, op=token, right=self.term())
-
-        # Handle comparisons
-        if self.get_current_token().type in ('EQ', 'NEQ', 'GT', 'GTE', 'LT', 'LTE'):
-            op_token = self.get_current_token()
-            self.consume(op_token.type)
-            right_node = self.comparison_expression() # Recursively parse right side of comparison
-            node = Comparison(left=node, op=op_token, right=right_node)
-
-        return node
-
-    def expression(self):
-        node = self.comparison_expression()
-        while self.get_current_token().type in ('AND', 'OR'):
-            op_token = self.get_current_token()
-            self.consume(op_token.type)
-            right_node = self.comparison_expression()
-            node = LogicalOp(left=node, op=op_token, right=right_node)
+            self.error(f"Expected integer, string, boolean, identifier, or literal, got {token.type}", token)
+
+    def close_bracket(self, stack, node):
+        # node is a complete expression inside the innermost open bracket.
+        # Returns the bracketed value once the bracket closes, or None when
+        # another expression follows inside it (after a comma or a colon).
+        frame = stack[-1]
+        kind = frame.kind
+        if kind == 'group':
+            self.consume('RPAREN')
+        elif kind == 'index':
+            self.consume('RBRACKET')
+            node = IndexAccess(frame.target, node)
+        elif kind == 'dictionary':
+            if frame.target is None:
+                # node is a key; its value follows
+                self.consume('COLON')
+                frame.target = node
+                return None
+            frame.items.append((frame.target, node))
+            frame.target = None
+            if self.get_current_token().type == 'COMMA':
+                self.consume('COMMA')
+                return None
+            self.consume('RBRACE')
+            node = Dictionary(frame.items)
+        else:
+            # Function arguments and list elements
+            frame.items.append(node)
+            if self.get_current_token().type == 'COMMA':
+                self.consume('COMMA')
+                return None
+            if kind == 'call':
+                self.consume('RPAREN')
+                node = FunctionCall(frame.target, frame.items)
+            else:
+                self.consume('RBRACKET')
+                node = List(frame.items)
+        stack.pop()
         return node
 
     def parse_function_call(self, name_token):
@@ -448,59 +666,6 @@ class Parser:
         self.consume('RPAREN')
         return FunctionCall(name_token.value, arguments)
 
-    def parse_list_literal(self):
-        self.consume('LBRACKET')
-        elements = []
-        # Check if the list is empty
-        if self.get_current_token().type == 'RBRACKET':
-            self.consume('RBRACKET')
-            return List(elements)
-
-        # Parse first element
-        elements.append(self.expression())
-
-        # Parse subsequent elements
-        while self.get_current_token().type == 'COMMA':
-            self.consume('COMMA')
-            elements.append(self.expression())
-
-        # Expect closing bracket
-        self.consume('RBRACKET')
-
-        return List(elements)
-
-    def parse_dictionary_literal(self):
-        self.consume('LBRACE')
-        pairs = []
-        # Check if the dictionary is empty
-        if self.get_current_token().type == 'RBRACE':
-            self.consume('RBRACE')
-            return Dictionary(pairs)
-
-        # Parse first key-value pair
-        key = self.expression()
-        self.consume('COLON')
-        value = self.expression()
-        pairs.append((key, value))
-
-        # Parse subsequent key-value pairs
-        while self.get_current_token().type == 'COMMA':
-            self.consume('COMMA')
-            key = self.expression()
-            self.consume('COLON')
-            value = self.expression()
-            pairs.append((key, value))
-
-        # Expect closing brace
-        self.consume('RBRACE')
-        return Dictionary(pairs)
-
-    def parse_index_access(self, target_node):
-        self.consume('LBRACKET')
-        index_node = self.expression()
-        self.consume('RBRACKET')
-        return IndexAccess(target_node, index_node)
-
     def parse_property_access(self, target_node):
         self.consume('DOT') # Assuming DOT token for property access
         property_name_token = self.get_current_token()
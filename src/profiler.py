@@ -0,0 +1,111 @@
+from time import perf_counter
+
+from interpreter import Interpreter
+from lexer import LineIndex
+from output import OUTPUT_BUFFER_SIZE
+
+MODULE_NAME = '<module>'
+
+class ProfilingInterpreter(Interpreter):
+    # Tree-walking interpreter that records, per Femcode function, the number
+    # of calls and the inclusive/exclusive time, the exclusive time of every
+    # distinct call stack (for flamegraphs), and how often each statement ran.
+
+    def __init__(self, ast, source, stdout=None, buffer_size=OUTPUT_BUFFER_SIZE):
+        super().__init__(ast, stdout, buffer_size=buffer_size)
+        self.line_index = LineIndex(source)
+        self.source = source
+        self.total_time = 0.0
+        # statement position -> hits
+        self.statement_hits = {}
+        # function name -> [calls, inclusive seconds, exclusive seconds]
+        self.function_stats = {}
+        # 'a;b;c' -> exclusive seconds spent with that call stack
+        self.stack_times = {}
+        # [function name, seconds spent in callees] per live call
+        self.call_stack = []
+        # function name -> live calls, so recursion is not counted twice in inclusive time
+        self.active_calls = {}
+
+    def interpret(self):
+        root = [MODULE_NAME, 0.0]
+        self.call_stack.append(root)
+        start = perf_counter()
+        try:
+            super().interpret()
+        finally:
+            self.total_time = perf_counter() - start
+            self.call_stack.pop()
+            self._add_stack_time(MODULE_NAME, self.total_time - root[1])
+
+    def visit(self, node):
+        position = getattr(node, 'position', None)
+        if position is not None:
+            hits = self.statement_hits
+            hits[position] = hits.get(position, 0) + 1
+        return super().visit(node)
+
+    def call_function(self, function, arguments):
+        name = function.name
+        call_stack = self.call_stack
+        active_calls = self.active_calls
+        frame = [name, 0.0]
+        call_stack.append(frame)
+        active_calls[name] = active_calls.get(name, 0) + 1
+        start = perf_counter()
+        try:
+            return super().call_function(function, arguments)
+        finally:
+            elapsed = perf_counter() - start
+            call_stack.pop()
+            active_calls[name] -= 1
+
+            stats = self.function_stats.get(name)
+            if stats is None:
+                stats = self.function_stats[name] = [0, 0.0, 0.0]
+            stats[0] += 1
+            if not active_calls[name]:
+                stats[1] += elapsed
+            exclusive = elapsed - frame[1]
+            stats[2] += exclusive
+            call_stack[-1][1] += elapsed
+            self._add_stack_time(';'.join(entry[0] for entry in call_stack) + ';' + name, exclusive)
+
+    def _add_stack_time(self, stack, seconds):
+        self.stack_times[stack] = self.stack_times.get(stack, 0.0) + seconds
+
+    def _source_line(self, source_lines, line):
+        text = source_lines[line - 1] if line <= len(source_lines) else ''
+        if isinstance(text, bytes):
+            text = text.decode('utf-8', 'replace')
+        return text.strip()
+
+    def report(self, limit=30):
+        lines = [f"Profile: {self.total_time * 1000:.3f} ms total", '']
+
+        lines.append(f"{'function':<24} {'calls':>10} {'inclusive ms':>14} {'exclusive ms':>14} {'ms/call':>10}")
+        for name, (calls, inclusive, exclusive) in sorted(self.function_stats.items(), key=lambda item: item[1][2], reverse=True):
+            lines.append(f"{name:<24} {calls:>10} {inclusive * 1000:>14.3f} {exclusive * 1000:>14.3f} {inclusive * 1000 / calls:>10.4f}")
+        if not self.function_stats:
+            lines.append("(no Femcode functions were called)")
+
+        lines.append('')
+        lines.append(f"{'hits':>10}  {'line:col':<10} statement")
+        # Split exactly where LineIndex counts lines
+        source_lines = self.source.split('\n' if isinstance(self.source, str) else b'\n')
+        hottest = sorted(self.statement_hits.items(), key=lambda item: (-item[1], item[0]))
+        for position, hits in hottest[:limit]:
+            line, column = self.line_index.line_col(position)
+            lines.append(f"{hits:>10}  {f'{line}:{column}':<10} {self._source_line(source_lines, line)}")
+        if len(hottest) > limit:
+            lines.append(f"{'':>10}  ({len(hottest) - limit} more statements)")
+        return '\n'.join(lines)
+
+    def write_collapsed_stacks(self, path):
+        # One "frame;frame;frame microseconds" line per call stack, the input
+        # format of flamegraph.pl, speedscope, inferno and similar tools
+        with open(path, 'w') as f:
+            for stack, seconds in sorted(self.stack_times.items()):
+                microseconds = round(seconds * 1_000_000)
+                if microseconds > 0:
+                    f.write(f"{stack} {microseconds}\n")
@@ -0,0 +1,297 @@
+from interpreter import BREAK, RETURN, Interpreter
+from output import OUTPUT_BUFFER_SIZE
+from parser import AST, Assign, Decrement, ForStatement, FunctionDefinition, Increment, copy_position, iter_child_nodes
+from runtime import check_arity, check_iterable, check_numeric
+from strings import StringBuilder, append_operand, append_value
+
+# Marks a frame slot whose variable has not been assigned yet
+UNBOUND = object()
+
+# Nodes produced by the resolver. Frames are plain lists; "level" indexes the
+# lexical chain of frames (0 is the global frame, then the function frame and
+# one frame per enclosing Tomgirl loop).
+
+class SlotVariable(AST):
+    __slots__ = ('name', 'candidates')
+
+    def __init__(self, name, candidates):
+        self.name = name
+        # (level, slot) pairs to try, innermost first. A scope only shadows an
+        # outer one once the variable has actually been assigned in it.
+        self.candidates = candidates
+
+class SlotAssign(AST):
+    __slots__ = ('name', 'level', 'slot', 'right')
+
+    def __init__(self, name, level, slot, right):
+        self.name = name
+        self.level = level
+        self.slot = slot
+        self.right = right
+
+class SlotAppend(AST):
+    # x is x + value, where x is looked up through candidates and assigned to
+    # (level, slot); strings grow in a StringBuilder (see strings.py)
+    __slots__ = ('name', 'candidates', 'level', 'slot', 'value')
+
+    def __init__(self, name, candidates, level, slot, value):
+        self.name = name
+        self.candidates = candidates
+        self.level = level
+        self.slot = slot
+        self.value = value
+
+class SlotStep(AST):
+    # Increment (step 1) or Decrement (step -1)
+    __slots__ = ('name', 'candidates', 'level', 'slot', 'step')
+
+    def __init__(self, name, candidates, level, slot, step):
+        self.name = name
+        self.candidates = candidates
+        self.level = level
+        self.slot = slot
+        self.step = step
+
+class SlotForStatement(AST):
+    __slots__ = ('var_name', 'frame_size', 'iterable', 'body')
+
+    def __init__(self, var_name, frame_size, iterable, body):
+        self.var_name = var_name
+        self.frame_size = frame_size # The loop variable always takes slot 0
+        self.iterable = iterable
+        self.body = body
+
+class SlotFunctionDefinition(AST):
+    __slots__ = ('name', 'parameters', 'parameter_slots', 'frame_size', 'body')
+
+    def __init__(self, name, parameters, parameter_slots, frame_size, body):
+        self.name = name
+        self.parameters = parameters
+        self.parameter_slots = parameter_slots
+        self.frame_size = frame_size
+        self.body = body
+
+class Scope:
+    __slots__ = ('kind', 'name', 'level', 'parent', 'slots')
+
+    def __init__(self, kind, name, parent=None):
+        self.kind = kind
+        self.name = name
+        self.parent = parent
+        self.level = 0 if parent is None else parent.level + 1
+        self.slots = {}
+
+    def declare(self, var_name):
+        if var_name not in self.slots:
+            self.slots[var_name] = len(self.slots)
+        return self.slots[var_name]
+
+    def candidates(self, var_name):
+        scope = self
+        found = []
+        while scope is not None:
+            if var_name in scope.slots:
+                found.append((scope.level, scope.slots[var_name]))
+            scope = scope.parent
+        return tuple(found)
+
+class Resolver:
+    # Assigns every variable to a slot in a preallocated frame using lexical
+    # scopes: a name is local to its loop iteration or function if it is
+    # assigned there, otherwise it refers to an enclosing loop, the function,
+    # or the global frame. Functions see their own locals and globals only,
+    # never the variables of whoever called them.
+
+    def __init__(self):
+        self.errors = []
+
+    def resolve_program(self, program):
+        global_scope = Scope('module', '<module>')
+        self.declare_all(program, global_scope)
+        statements = [self.resolve(node, global_scope) for node in program]
+        if self.errors:
+            raise NameError("Undefined names found before execution:\n" + '\n'.join(f"    {error}" for error in self.errors))
+        return statements, len(global_scope.slots)
+
+    def declare_all(self, nodes, scope):
+        # Every name written anywhere in a scope gets a slot up front, like
+        # Python's local-variable analysis
+        for node in nodes:
+            if isinstance(node, FunctionDefinition):
+                continue
+            if isinstance(node, Assign):
+                scope.declare(node.left.value)
+            elif isinstance(node, (Increment, Decrement)):
+                scope.declare(node.var_name.value)
+            if isinstance(node, ForStatement):
+                # The iterable is evaluated in this scope; the body gets its own
+                self.declare_all([node.iterable], scope)
+                continue
+            self.declare_all(iter_child_nodes(node), scope)
+
+    def resolve(self, node, scope):
+        method = getattr(self, f'resolve_{type(node).__name__}', None)
+        if method is not None:
+            return method(node, scope)
+        return self.resolve_children(node, scope)
+
+    def resolve_children(self, node, scope):
+        resolved = object.__new__(type(node))
+        for field in type(node).__slots__:
+            setattr(resolved, field, self.resolve_value(getattr(node, field), scope))
+        return copy_position(resolved, node)
+
+    def resolve_value(self, value, scope):
+        if isinstance(value, AST):
+            return self.resolve(value, scope)
+        if isinstance(value, list):
+            return [self.resolve_value(item, scope) for item in value]
+        if isinstance(value, tuple):
+            return tuple(self.resolve_value(item, scope) for item in value)
+        return value
+
+    def resolve_Variable(self, node, scope):
+        candidates = scope.candidates(node.value)
+        if not candidates:
+            self.errors.append(f"name '{node.value}' is not defined (in {scope.name})")
+        return SlotVariable(node.value, candidates)
+
+    def resolve_Assign(self, node, scope):
+        var_name = node.left.value
+        operand = append_operand(node)
+        if operand is not None:
+            target = self.resolve_Variable(node.right.left, scope)
+            return SlotAppend(var_name, target.candidates, scope.level, scope.slots[var_name], self.resolve(operand, scope))
+        return SlotAssign(var_name, scope.level, scope.slots[var_name], self.resolve(node.right, scope))
+
+    def _resolve_step(self, node, scope, step):
+        var_name = node.var_name.value
+        return SlotStep(var_name, scope.candidates(var_name), scope.level, scope.slots[var_name], step)
+
+    def resolve_Increment(self, node, scope):
+        return self._resolve_step(node, scope, 1)
+
+    def resolve_Decrement(self, node, scope):
+        return self._resolve_step(node, scope, -1)
+
+    def resolve_ForStatement(self, node, scope):
+        iterable = self.resolve(node.iterable, scope)
+        loop_scope = Scope('loop', scope.name, scope)
+        loop_scope.declare(node.var_name)
+        self.declare_all(node.body.statements, loop_scope)
+        body = self.resolve(node.body, loop_scope)
+        return SlotForStatement(node.var_name, len(loop_scope.slots), iterable, body)
+
+    def resolve_FunctionDefinition(self, node, scope):
+        global_scope = scope
+        while global_scope.parent is not None:
+            global_scope = global_scope.parent
+        function_scope = Scope('function', f"function '{node.name}'", global_scope)
+        parameter_slots = tuple(function_scope.declare(parameter) for parameter in node.parameters)
+        self.declare_all(node.body.statements, function_scope)
+        body = self.resolve(node.body, function_scope)
+        return SlotFunctionDefinition(node.name, node.parameters, parameter_slots, len(function_scope.slots), body)
+
+def resolve_program(program):
+    return Resolver().resolve_program(program)
+
+class ResolvedInterpreter(Interpreter):
+    # Tree-walking interpreter over a resolved AST: variables live in list
+    # frames indexed by slot instead of dicts searched by name.
+
+    SUPPORTS_HOOKS = False
+
+    def __init__(self, ast, stdout=None, stdin=None, buffer_size=OUTPUT_BUFFER_SIZE):
+        statements, global_frame_size = resolve_program(ast)
+        super().__init__(statements, stdout, stdin, buffer_size)
+        self.frames = [[UNBOUND] * global_frame_size]
+
+    def _load(self, name, candidates):
+        value = self._load_stored(name, candidates)
+        if value.__class__ is StringBuilder:
+            return value.getvalue()
+        return value
+
+    def _load_stored(self, name, candidates):
+        frames = self.frames
+        for level, slot in candidates:
+            value = frames[level][slot]
+            if value is not UNBOUND:
+                return value
+        raise NameError(f"name '{name}' is not defined")
+
+    def visit_SlotVariable(self, node):
+        return self._load(node.name, node.candidates)
+
+    def visit_SlotAssign(self, node):
+        value = self.visit(node.right)
+        self.frames[node.level][node.slot] = value
+
+    def visit_SlotAppend(self, node):
+        current = self._load_stored(node.name, node.candidates)
+        value = self.visit(node.value)
+        frame = self.frames[node.level]
+        frame[node.slot] = append_value(current, value, frame[node.slot])
+
+    def visit_SlotStep(self, node):
+        current_value = check_numeric(self._load(node.name, node.candidates), 'increment' if node.step > 0 else 'decrement')
+        self.frames[node.level][node.slot] = current_value + node.step
+
+    def visit_SlotForStatement(self, node):
+        iterable = check_iterable(self.visit(node.iterable))
+        frames = self.frames
+
+        # One frame for the whole loop; the body's slots are reset to UNBOUND
+        # in place before every iteration
+        frame = [UNBOUND] * node.frame_size
+        body_slots = slice(1, None)
+        unbound_body = frame[1:]
+        frames.append(frame)
+        try:
+            for item in iterable:
+                frame[0] = item
+                if unbound_body:
+                    frame[body_slots] = unbound_body
+                completion = self.visit(node.body)
+                if completion is not None:
+                    if completion is BREAK:
+                        break
+                    if completion is RETURN:
+                        return completion
+        finally:
+            frames.pop()
+
+    def visit_SlotFunctionDefinition(self, node):
+        self.define_function(node.name, node)
+
+    def visit_FunctionCall(self, node):
+        func_name = node.name
+        if func_name not in self.functions:
+            raise NameError(f"Function '{func_name}' is not defined")
+
+        func_info = self.functions[func_name]
+        evaluated_arguments = [self.visit(arg) for arg in node.arguments]
+        if callable(func_info):
+            return func_info(*evaluated_arguments)
+
+        if len(func_info.parameters) != len(evaluated_arguments):
+            check_arity(func_name, func_info.parameters, len(evaluated_arguments))
+        return self.call_function(func_info, evaluated_arguments)
+
+    def call_function(self, func_info, arguments):
+        frame = [UNBOUND] * func_info.frame_size
+        for slot, value in zip(func_info.parameter_slots, arguments):
+            frame[slot] = value
+
+        caller_frames = self.frames
+        self.frames = [caller_frames[0], frame]
+        try:
+            completion = self.visit(func_info.body)
+            if completion is RETURN:
+                value = self.return_value
+                self.return_value = None
+                return value
+            if completion is not None:
+                self.raise_completion(completion)
+        finally:
+            self.frames = caller_frames
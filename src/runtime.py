@@ -0,0 +1,67 @@
+import operator
+
+from numeric import NumericArray
+from parser import Op
+from streams import Stream
+
+# Semantics shared by every execution engine, so the tree walker and the
+# compiled engines cannot drift apart.
+
+BINARY_OPERATORS = {
+    Op.PLUS: operator.add,
+    Op.MINUS: operator.sub,
+    Op.MUL: operator.mul,
+    Op.DIV: operator.truediv,
+}
+
+COMPARISON_OPERATORS = {
+    Op.EQ: operator.eq,
+    Op.NEQ: operator.ne,
+    Op.GT: operator.gt,
+    Op.GTE: operator.ge,
+    Op.LT: operator.lt,
+    Op.LTE: operator.le,
+}
+
+def check_iterable(iterable, consumer="'for' loop"):
+    if not isinstance(iterable, (list, str, range, NumericArray, Stream)):
+        raise TypeError(f"{consumer} can only iterate over lists, strings, ranges, arrays or streams, got {type(iterable).__name__}")
+    return iterable
+
+def index_access(target, index):
+    if isinstance(target, (list, range, NumericArray)):
+        return target[index]
+    raise TypeError(f"Cannot index type {type(target).__name__}")
+
+def property_access(target, property_name):
+    if isinstance(target, dict):
+        if property_name in target:
+            return target[property_name]
+        # String keys keep their quotes at runtime: {"name": ...}.name and
+        # {'name': ...}.name
+        key = f'"{property_name}"'
+        if key in target:
+            return target[key]
+        return target.get(f"'{property_name}'")
+    raise TypeError(f"Cannot access property '{property_name}' on type {type(target).__name__}")
+
+def check_numeric(value, action):
+    # ++/-- on an array steps every element, like x + 1
+    if not isinstance(value, (int, float, NumericArray)):
+        raise TypeError(f"Cannot {action} non-numeric type {type(value).__name__}")
+    return value
+
+class Function:
+    # A user-defined function as stored in an engine's function table. body is
+    # whatever that engine executes: a Block, a compiled closure, ...
+    __slots__ = ('name', 'parameters', 'body')
+
+    def __init__(self, name, parameters, body):
+        self.name = name
+        self.parameters = tuple(parameters)
+        self.body = body
+
+def check_arity(name, parameters, argc):
+    if argc != len(parameters):
+        expected = len(parameters)
+        raise TypeError(f"Function '{name}' takes {expected} argument{'' if expected == 1 else 's'} ({', '.join(parameters)}) but {argc} {'was' if argc == 1 else 'were'} given")
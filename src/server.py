@@ -0,0 +1,197 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import traceback
+from collections import OrderedDict
+
+from batch import ScriptTimeout, raise_timeout
+from client import check_owner, default_socket_path, socket_directory
+from main import ENGINES, parse_source, recursion_message, run_program
+from optimizer import Optimizer
+
+# Parsed programs kept in memory; the least recently used is dropped first
+MAX_CACHED_PROGRAMS = 256
+
+# Seconds a run may take before it is stopped (--timeout); the server runs one
+# request at a time, so a script that never ends would block every client
+DEFAULT_TIMEOUT = 30.0
+
+class ProgramCache:
+    # Parsed (and optionally optimized) programs keyed by path. An entry is
+    # reused while the file's mtime and size are unchanged. Programs are never
+    # modified by the engines, so one tree can serve any number of runs.
+
+    def __init__(self, max_entries=MAX_CACHED_PROGRAMS):
+        self.max_entries = max_entries
+        # (path, optimize) -> (mtime_ns, size, program, optimizer report or None)
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path, optimize=False):
+        stat = os.stat(path)
+        key = (path, optimize)
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        else:
+            self.misses += 1
+            program = parse_source(path)
+            report = None
+            if optimize:
+                optimizer = Optimizer()
+                program = optimizer.optimize_program(program)
+                report = optimizer.report()
+            entry = self.entries[key] = (stat.st_mtime_ns, stat.st_size, program, report)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+        if entry[3] is not None:
+            # Reported on every run, like the command line does
+            print(entry[3], file=sys.stderr)
+        return entry[2]
+
+class RunRequestHandler(socketserver.StreamRequestHandler):
+    # One JSON request line in, one JSON response line out:
+    #   {"path": ..., "cwd": ..., "engine": "tree", "resolve": false, "optimize": false, "stdin": ""}
+    #   {"stdout": ..., "stderr": ..., "exit_code": 0}
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            response = self.server.run(request)
+        except Exception:
+            response = {'stdout': '', 'stderr': traceback.format_exc(), 'exit_code': 2}
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+class FemcodeServer(socketserver.UnixStreamServer):
+    # Keeps the interpreter imported and parsed programs cached between runs.
+    # Requests are handled one at a time: each run gets a fresh interpreter,
+    # its own working directory and its own stdin/stdout/stderr. With a
+    # timeout, runs are stopped by SIGALRM, so serve_forever must then be
+    # called from the main thread.
+
+    def __init__(self, socket_path, timeout=None):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.programs = ProgramCache()
+        remove_stale_socket(socket_path)
+        # Only the owner may connect and run programs
+        umask = os.umask(0o077)
+        try:
+            super().__init__(socket_path, RunRequestHandler)
+        finally:
+            os.umask(umask)
+
+    def server_close(self):
+        super().server_close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.socket_path)
+
+    def run(self, request):
+        engine = request.get('engine', 'tree')
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}'")
+        resolve = bool(request.get('resolve', False))
+        timeout = self.timeout
+        if timeout and threading.current_thread() is not threading.main_thread():
+            raise RuntimeError("A server with a timeout must serve from the main thread")
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        exit_code = 0
+
+        previous_directory = os.getcwd()
+        previous_stdin = sys.stdin
+        sys.stdin = io.StringIO(request.get('stdin', ''))
+        try:
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                os.chdir(request.get('cwd', previous_directory))
+                path = os.path.abspath(request['path'])
+                try:
+                    ast = self.programs.get(path, bool(request.get('optimize', False)))
+                except FileNotFoundError:
+                    print(f"Error: File not found: {request['path']}")
+                    exit_code = 1
+                else:
+                    try:
+                        try:
+                            if timeout:
+                                signal.signal(signal.SIGALRM, raise_timeout)
+                                signal.setitimer(signal.ITIMER_REAL, timeout)
+                            run_program(ast, engine, resolve)
+                        finally:
+                            if timeout:
+                                signal.setitimer(signal.ITIMER_REAL, 0)
+                    except ScriptTimeout:
+                        print(f"Error: timed out after {timeout:g} s", file=sys.stderr)
+                        exit_code = 1
+                    except RecursionError:
+                        print(recursion_message(engine), file=sys.stderr)
+                        exit_code = 1
+                    except Exception:
+                        print(traceback.format_exc(), end='', file=sys.stderr)
+                        exit_code = 1
+        finally:
+            sys.stdin = previous_stdin
+            os.chdir(previous_directory)
+        return {'stdout': stdout.getvalue(), 'stderr': stderr.getvalue(), 'exit_code': exit_code}
+
+def make_private_directory(directory):
+    # Where the default socket lives. Anyone who could write to it could put
+    # their own socket in place of ours, so it must be the user's alone.
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    check_owner(directory)
+    if os.stat(directory).st_mode & 0o077:
+        raise PermissionError(f"{directory} is accessible to other users")
+
+def remove_stale_socket(socket_path):
+    # A socket file left behind by a server that died is removed; one that
+    # still accepts connections belongs to a running server
+    if not os.path.exists(socket_path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except OSError:
+        os.unlink(socket_path)
+    else:
+        raise OSError(f"A Femcode server is already listening on {socket_path}")
+    finally:
+        probe.close()
+
+def main():
+    arg_parser = argparse.ArgumentParser(prog='femcode-server', description="Serve Femcode runs over a Unix socket from a warm process (see client.py).")
+    arg_parser.add_argument('--socket', metavar='PATH', default=default_socket_path(), help="socket to listen on (default: $FEMCODE_SOCKET, or femcode.sock in $XDG_RUNTIME_DIR or in a private femcode-<uid> directory in the temp directory)")
+    arg_parser.add_argument('--timeout', type=float, metavar='SECONDS', default=DEFAULT_TIMEOUT, help=f"stop any run that takes longer than this (default: {DEFAULT_TIMEOUT:g}); 0 lets runs take as long as they need")
+    args = arg_parser.parse_args()
+    if args.timeout < 0:
+        arg_parser.error("--timeout cannot be negative")
+
+    try:
+        if os.path.dirname(os.path.abspath(args.socket)) == os.path.abspath(socket_directory()):
+            make_private_directory(socket_directory())
+        server = FemcodeServer(args.socket, args.timeout or None)
+    except OSError as error:
+        print(f"Error: {error}", file=sys.stderr)
+        sys.exit(1)
+    print(f"Femcode server listening on {args.socket}", file=sys.stderr)
+    # Stop cleanly (removing the socket) when a service manager stops us
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+from parser import AST, Boolean, Dictionary, Number, String, copy_position
+from runtime import property_access
+from streams import text_value
+
+# Shaped dictionaries (--shapes). A dictionary literal whose keys are all
+# constants always builds a dictionary with the same keys, so instead of a
+# dict it builds a Record: a tuple of the values, of a class made once per key
+# set (its shape) that maps each key to its position. Records with the same
+# keys share one class, so a record costs a tuple and no hash table.
+#
+# Every obj.field site keeps an inline cache of the last shape it saw and the
+# position of field in it. While the site keeps seeing that shape, reading
+# the field is a class check and a tuple index; another shape or a plain dict
+# takes the slower lookup and re-caches. Dictionary literals with computed or
+# repeated keys stay plain dicts.
+
+# Record classes by key tuple, shared by every program
+_SHAPES = {}
+
+class Record(tuple):
+    # Behaves like the dict it stands for wherever a program can tell: it
+    # iterates over and contains its keys, compares equal to a dict with the
+    # same items, prints like a dict and does not support tuple operators
+    __slots__ = ()
+    # Set on each shape's class
+    shape_keys = ()
+    key_indexes = {}
+    # Property name (a string key without its runtime quotes) -> position
+    property_indexes = {}
+
+    def __iter__(self):
+        return iter(self.shape_keys)
+
+    def __contains__(self, key):
+        return key in self.key_indexes
+
+    def items(self):
+        return zip(self.shape_keys, tuple.__iter__(self))
+
+    def __eq__(self, other):
+        if other.__class__ is self.__class__:
+            return tuple.__eq__(self, other)
+        if isinstance(other, (Record, dict)):
+            return dict(self.items()) == dict(other.items())
+        if isinstance(other, tuple):
+            # Otherwise tuple's own == would compare the values
+            return False
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def _unsupported(self, other):
+        return NotImplemented
+
+    __add__ = __mul__ = __rmul__ = _unsupported
+    __lt__ = __le__ = __gt__ = __ge__ = _unsupported
+    __hash__ = None
+
+    def __repr__(self):
+        return '{' + ', '.join(f'{key!r}: {value!r}' for key, value in self.items()) + '}'
+
+def shape_for(keys):
+    # The Record class for dictionaries with exactly these keys, in this order
+    # Key on the types too, so {1: ...}, {1.0: ...} and {Kawaii: ...} get
+    # their own classes and print their own keys
+    shape_key = tuple((type(key), key) for key in keys)
+    record_class = _SHAPES.get(shape_key)
+    if record_class is None:
+        # Named dict so type() and error messages see the type it stands for
+        key_indexes = {key: index for index, key in enumerate(keys)}
+        # Looked up like a dict's properties, so a record finds the same key
+        # as the dict it stands for (even with both {"a": ..., 'a': ...})
+        property_names = {text_value(key) for key in keys if isinstance(key, str)}
+        record_class = type('dict', (Record,), {
+            '__slots__': (),
+            'shape_keys': keys,
+            'key_indexes': key_indexes,
+            'property_indexes': {name: property_access(key_indexes, name) for name in property_names},
+        })
+        record_class = _SHAPES.setdefault(shape_key, record_class)
+    return record_class
+
+class PropertyCache:
+    # The inline cache of one obj.field site. entry is replaced as a whole,
+    # so a site shared between threads never pairs a shape with another
+    # shape's position.
+    __slots__ = ('property_name', 'entry')
+
+    def __init__(self, property_name):
+        self.property_name = property_name
+        # (record class, position of the property in it)
+        self.entry = (None, 0)
+
+    def get(self, target):
+        record_class, index = self.entry
+        if target.__class__ is record_class:
+            return target[index]
+        return self.miss(target)
+
+    def miss(self, target):
+        if isinstance(target, Record):
+            index = target.property_indexes.get(self.property_name)
+            if index is None:
+                return None
+            self.entry = (target.__class__, index)
+            return target[index]
+        return property_access(target, self.property_name)
+
+class RecordLiteral(AST):
+    # A dictionary literal with constant keys, built as record_class(values)
+    __slots__ = ('record_class', 'values')
+
+    def __init__(self, record_class, values):
+        self.record_class = record_class
+        self.values = values
+
+class CachedPropertyAccess(AST):
+    __slots__ = ('target', 'property_name', 'cache')
+
+    def __init__(self, target, property_name):
+        self.target = target
+        self.property_name = property_name
+        self.cache = PropertyCache(property_name)
+
+CONSTANT_KEYS = (Number, String, Boolean)
+
+class ShapeAssigner:
+    # Rewrites a parsed program to build records and cache property reads.
+    # The input tree is not modified; changed nodes are rebuilt.
+
+    def assign_program(self, program):
+        return [self.assign(node) for node in program]
+
+    def assign(self, node):
+        method = getattr(self, f'assign_{type(node).__name__}', None)
+        if method is not None:
+            return method(node)
+        return self.assign_children(node)
+
+    def assign_children(self, node):
+        assigned = object.__new__(type(node))
+        for field in type(node).__slots__:
+            setattr(assigned, field, self.assign_value(getattr(node, field)))
+        return copy_position(assigned, node)
+
+    def assign_value(self, value):
+        if isinstance(value, AST):
+            return self.assign(value)
+        if isinstance(value, list):
+            return [self.assign_value(item) for item in value]
+        if isinstance(value, tuple):
+            return tuple(self.assign_value(item) for item in value)
+        return value
+
+    def assign_Dictionary(self, node):
+        pairs = self.assign_value(node.pairs)
+        if not all(isinstance(key, CONSTANT_KEYS) for key, _ in pairs):
+            return Dictionary(pairs)
+        keys = tuple(key.value for key, _ in pairs)
+        # 1, 1.0 and Kawaii are the same dict key; such literals stay dicts
+        if len(set(keys)) != len(keys):
+            return Dictionary(pairs)
+        return RecordLiteral(shape_for(keys), [value for _, value in pairs])
+
+    def assign_PropertyAccess(self, node):
+        return CachedPropertyAccess(self.assign(node.target), node.property_name)
+
+def assign_shapes(program):
+    return ShapeAssigner().assign_program(program)
@@ -0,0 +1,36 @@
+from lexer import StringLiteral
+
+# Lazy, single-pass sequences. A Stream produces its items only as a Tomgirl
+# loop (or sum, list, ...) asks for them, so lines(path) can walk a file of
+# any size in constant memory and map()/filter() chains never build
+# intermediate lists. Like a Python iterator, a stream can be consumed once.
+
+class Stream:
+    __slots__ = ('iterator',)
+
+    def __init__(self, iterable):
+        self.iterator = iter(iterable)
+
+    def __iter__(self):
+        return self.iterator
+
+    def __repr__(self):
+        return '<stream>'
+
+def text_value(value):
+    # A path or function name written as a string literal, without the quotes
+    # the literal keeps at runtime. Any other string is used as it is, quotes
+    # and all, so data that happens to be quoted is never changed.
+    if value.__class__ is StringLiteral:
+        return value[1:-1]
+    return value
+
+def lines(path):
+    # Opened right away so a missing file fails at the call, not at the loop
+    file = open(text_value(path), encoding='utf-8', errors='replace')
+    return Stream(_read_lines(file))
+
+def _read_lines(file):
+    with file:
+        for line in file:
+            yield line[:-1] if line.endswith('\n') else line
@@ -0,0 +1,112 @@
+from string import Formatter
+
+from parser import Assign, BinOp, Op, Variable, iter_child_nodes
+from streams import text_value
+
+# Strings built up piece by piece. `x is x + value` (which is what x += value
+# expands to) would copy all of x for every piece, so building an n-character
+# string that way takes O(n^2) time. Instead, when x holds a string and value
+# is a string, every engine stores a StringBuilder in x's variable and appends
+# the piece to it. Reading x in any other way (UwU Boy x, len(x), y is x, ...)
+# joins the pieces once and returns an ordinary string, so a builder never
+# leaves the variable that owns it and programs cannot tell the difference.
+
+# Pieces collected before they are joined into one chunk, which keeps the
+# per-piece overhead of very long builds small
+BUILDER_CHUNK_SIZE = 1024
+
+class StringBuilder:
+    __slots__ = ('chunks', 'pieces')
+
+    def __init__(self, text):
+        self.chunks = [text]
+        self.pieces = []
+
+    def append(self, text):
+        pieces = self.pieces
+        pieces.append(text)
+        if len(pieces) >= BUILDER_CHUNK_SIZE:
+            self.chunks.append(''.join(pieces))
+            pieces.clear()
+
+    def getvalue(self):
+        chunks = self.chunks
+        if len(chunks) > 1 or self.pieces:
+            chunks.extend(self.pieces)
+            self.pieces.clear()
+            chunks[:] = [''.join(chunks)]
+        return chunks[0]
+
+def append_operand(node):
+    # For an assignment `x is x + value`, the value expression; None for any
+    # other assignment
+    right = node.right
+    if right.__class__ is BinOp and right.op is Op.PLUS and right.left.__class__ is Variable and right.left.value == node.left.value:
+        return right.right
+    return None
+
+def append_targets(program):
+    # Names assigned with x is x + value anywhere in the program. Only these
+    # variables can ever hold a StringBuilder, so the compiling engines read
+    # every other variable without checking for one.
+    names = set()
+    stack = list(program)
+    while stack:
+        node = stack.pop()
+        if node.__class__ is Assign and append_operand(node) is not None:
+            names.add(node.left.value)
+        stack.extend(iter_child_nodes(node))
+    return names
+
+def append_value(current, value, stored):
+    # The new value of x for `x is x + value`. current is x as it was looked
+    # up (possibly a builder) before value was evaluated; stored is what the
+    # scope being assigned holds for x now. A builder is only extended in
+    # place when it is stored there: if x was found in an enclosing scope,
+    # that variable has to keep its value.
+    # isinstance, because string literals are a str subclass (StringLiteral)
+    if current.__class__ is StringBuilder:
+        if isinstance(value, str):
+            if stored is not current:
+                current = StringBuilder(current.getvalue())
+            current.append(value)
+            return current
+        current = current.getvalue()
+    elif isinstance(current, str) and isinstance(value, str):
+        builder = StringBuilder(current)
+        builder.append(value)
+        return builder
+    return current + value
+
+def materialize(value):
+    return value.getvalue() if value.__class__ is StringBuilder else value
+
+# Built-ins. A separator or template written as a string literal is used
+# without its quotes (streams.text_value); the strings being joined, split or
+# formatted are data and are used as they are. Results are plain text.
+
+def join(separator, values):
+    return text_value(separator).join(map(str, values))
+
+def split(text, separator=None):
+    if not isinstance(text, str):
+        raise TypeError(f"split() needs a string, got {type(text).__name__}")
+    if separator is None:
+        return text.split()
+    separator = text_value(separator)
+    if not separator:
+        raise ValueError("split() separator cannot be empty")
+    return text.split(separator)
+
+def format_text(template, *values):
+    # Python's format syntax ({}, {0}, {:>8}, {:.2f}, ...) without attribute
+    # or item access in the placeholders
+    template = text_value(template)
+    for _, field_name, format_spec, _ in Formatter().parse(template):
+        if field_name is None:
+            continue
+        if field_name and not field_name.isdigit():
+            raise ValueError(f"format() placeholders must be {{}} or numbered like {{0}}, got {{{field_name}}}")
+        if '{' in format_spec:
+            raise ValueError("format() does not support nested placeholders")
+    return template.format(*values)
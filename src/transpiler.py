@@ -0,0 +1,365 @@
+import ast as pyast
+
+from interpreter import Interpreter, ReturnValue, BreakLoop, ContinueLoop, outside_loop_error
+from lexer import StringLiteral
+from parser import Op
+from runtime import check_arity, check_iterable, check_numeric, index_access, property_access
+from shapes import PropertyCache, shape_for
+from strings import StringBuilder, append_operand, append_targets, append_value
+
+PYTHON_OPERATORS = {
+    Op.PLUS: pyast.Add,
+    Op.MINUS: pyast.Sub,
+    Op.MUL: pyast.Mult,
+    Op.DIV: pyast.Div,
+    Op.EQ: pyast.Eq,
+    Op.NEQ: pyast.NotEq,
+    Op.GT: pyast.Gt,
+    Op.GTE: pyast.GtE,
+    Op.LT: pyast.Lt,
+    Op.LTE: pyast.LtE,
+    Op.AND: pyast.And,
+    Op.OR: pyast.Or,
+}
+
+def _name(identifier, ctx=pyast.Load):
+    return pyast.Name(id=identifier, ctx=ctx())
+
+def _call(function, *arguments):
+    return pyast.Call(func=function if isinstance(function, pyast.AST) else _name(function), args=list(arguments), keywords=[])
+
+def _constant(value):
+    return pyast.Constant(value=value)
+
+def _signals(*names):
+    return pyast.Tuple(elts=[_name(name) for name in names], ctx=pyast.Load())
+
+def _current_scope_item(var_name, ctx=pyast.Store):
+    # _scopes[-1]['var_name']
+    current_scope = pyast.Subscript(value=_name('_scopes'), slice=pyast.UnaryOp(op=pyast.USub(), operand=_constant(1)), ctx=pyast.Load())
+    return pyast.Subscript(value=current_scope, slice=_constant(var_name), ctx=ctx())
+
+class Transpiler:
+    # Translates a Femcode AST into a Python ast.Module. Control flow,
+    # operators and function definitions become native Python; variables
+    # still live in the shared scope stack (_scopes), because Femcode looks
+    # names up dynamically through every enclosing scope.
+
+    def __init__(self):
+        self.loop_depth = 0
+        self.in_function = False
+        # Names that may hold a StringBuilder (strings.append_targets)
+        self.append_targets = frozenset()
+        # Assignments run before the program: record classes and the inline
+        # caches of property sites (see shapes.py)
+        self.prologue = []
+        # Prologue name of each string literal
+        self.literals = {}
+
+    def transpile(self, program):
+        self.append_targets = append_targets(program)
+        body = self.statements(program)
+        module = pyast.Module(body=self.prologue + body, type_ignores=[])
+        return pyast.fix_missing_locations(module)
+
+    def statements(self, nodes):
+        body = []
+        for node in nodes:
+            body.extend(self.statement(node))
+        return body or [pyast.Pass()]
+
+    def statement(self, node):
+        method = getattr(self, f'statement_{type(node).__name__}', None)
+        if method is not None:
+            return method(node)
+        # Expression statements (function calls, ++/--)
+        return [pyast.Expr(value=self.expression(node))]
+
+    def expression(self, node):
+        method = getattr(self, f'expression_{type(node).__name__}', None)
+        if method is None:
+            raise Exception(f'No Python translation for {type(node).__name__}')
+        return method(node)
+
+    # Statements
+
+    def statement_Print(self, node):
+        return [pyast.Expr(value=_call('_print', self.expression(node.value)))]
+
+    def statement_Assign(self, node):
+        operand = append_operand(node)
+        if operand is not None:
+            # _append('x', _load('x'), value): strings grow in a StringBuilder
+            var_name = _constant(node.left.value)
+            return [pyast.Expr(value=_call('_append', var_name, _call('_load', var_name), self.expression(operand)))]
+        return [pyast.Assign(targets=[_current_scope_item(node.left.value)], value=self.expression(node.right))]
+
+    def statement_Block(self, node):
+        return self.statements(node.statements)
+
+    def statement_IfStatement(self, node):
+        orelse = self.statement(node.else_block) if node.else_block is not None else []
+        return [pyast.If(test=self.expression(node.condition), body=self.statement(node.if_block), orelse=orelse)]
+
+    def _loop_body(self, body):
+        self.loop_depth += 1
+        try:
+            return self.statement(body)
+        finally:
+            self.loop_depth -= 1
+
+    def statement_WhileStatement(self, node):
+        return [pyast.While(test=self.expression(node.condition), body=self._loop_body(node.body), orelse=[])]
+
+    def statement_ForStatement(self, node):
+        # for _item_N in _check_iterable(iterable):
+        #     _scopes.append({'var_name': _item_N})
+        #     try: body
+        #     finally: _scopes.pop()
+        item_name = f'_item_{self.loop_depth}'
+        push_scope = pyast.Expr(value=_call(
+            pyast.Attribute(value=_name('_scopes'), attr='append', ctx=pyast.Load()),
+            pyast.Dict(keys=[_constant(node.var_name)], values=[_name(item_name)]),
+        ))
+        pop_scope = pyast.Expr(value=_call(pyast.Attribute(value=_name('_scopes'), attr='pop', ctx=pyast.Load())))
+        body = pyast.Try(body=self._loop_body(node.body), handlers=[], orelse=[], finalbody=[pop_scope])
+        return [pyast.For(
+            target=_name(item_name, pyast.Store),
+            iter=_call('_check_iterable', self.expression(node.iterable)),
+            body=[push_scope, body],
+            orelse=[],
+        )]
+
+    def statement_BreakStatement(self, node):
+        if self.loop_depth:
+            return [pyast.Break()]
+        # Outside a loop the Break leaves the function, whose call reports it
+        return [pyast.Raise(exc=_call('_BreakLoop'), cause=None)]
+
+    def statement_ContinueStatement(self, node):
+        if self.loop_depth:
+            return [pyast.Continue()]
+        return [pyast.Raise(exc=_call('_ContinueLoop'), cause=None)]
+
+    def statement_TryExceptStatement(self, node):
+        # try: try_block
+        # except (_ReturnValue, _BreakLoop, _ContinueLoop): raise
+        # except Exception: except_block
+        signals = pyast.ExceptHandler(type=_signals('_ReturnValue', '_BreakLoop', '_ContinueLoop'), name=None, body=[pyast.Raise(exc=None, cause=None)])
+        handler = pyast.ExceptHandler(type=_name('Exception'), name=None, body=self.statement(node.except_block))
+        return [pyast.Try(body=self.statement(node.try_block), handlers=[signals, handler], orelse=[], finalbody=[])]
+
+    def statement_FunctionDefinition(self, node):
+        # def _femcode_name(*_args):
+        #     if len(_args) != N: _check_arity('name', ('a', ...), len(_args))
+        #     _scopes.append({'a': _args[0], ...})
+        #     try: body
+        #     except (_BreakLoop, _ContinueLoop) as _signal:
+        #         raise _outside_loop_error(_signal.statement) from None
+        #     finally: _scopes.pop()
+        # _functions['name'] = _femcode_name
+        python_name = f'_femcode_{node.name}'
+        outer_state = (self.loop_depth, self.in_function)
+        self.loop_depth, self.in_function = 0, True
+        try:
+            body = self.statement(node.body)
+        finally:
+            self.loop_depth, self.in_function = outer_state
+
+        argc = _call('len', _name('_args'))
+        check_arity = pyast.If(
+            test=pyast.Compare(left=argc, ops=[pyast.NotEq()], comparators=[_constant(len(node.parameters))]),
+            body=[pyast.Expr(value=_call('_check_arity', _constant(node.name), _constant(tuple(node.parameters)), argc))],
+            orelse=[],
+        )
+        scope = pyast.Dict(
+            keys=[_constant(parameter) for parameter in node.parameters],
+            values=[pyast.Subscript(value=_name('_args'), slice=_constant(i), ctx=pyast.Load()) for i in range(len(node.parameters))],
+        )
+        push_scope = pyast.Expr(value=_call(pyast.Attribute(value=_name('_scopes'), attr='append', ctx=pyast.Load()), scope))
+        pop_scope = pyast.Expr(value=_call(pyast.Attribute(value=_name('_scopes'), attr='pop', ctx=pyast.Load())))
+        outside_loop = pyast.ExceptHandler(
+            type=_signals('_BreakLoop', '_ContinueLoop'),
+            name='_signal',
+            body=[pyast.Raise(exc=_call('_outside_loop_error', pyast.Attribute(value=_name('_signal'), attr='statement', ctx=pyast.Load())), cause=_constant(None))],
+        )
+        function = pyast.FunctionDef(
+            name=python_name,
+            args=pyast.arguments(posonlyargs=[], args=[], vararg=pyast.arg(arg='_args'), kwonlyargs=[], kw_defaults=[], kwarg=None, defaults=[]),
+            body=[check_arity, push_scope, pyast.Try(body=body, handlers=[outside_loop], orelse=[], finalbody=[pop_scope])],
+            decorator_list=[],
+            returns=None,
+        )
+        register = pyast.Assign(
+            targets=[pyast.Subscript(value=_name('_functions'), slice=_constant(node.name), ctx=pyast.Store())],
+            value=_name(python_name),
+        )
+        return [function, register]
+
+    def statement_ReturnStatement(self, node):
+        if self.in_function:
+            return [pyast.Return(value=self.expression(node.value))]
+        return [pyast.Raise(exc=_call('_ReturnValue', self.expression(node.value)), cause=None)]
+
+    # Expressions
+
+    def expression_Number(self, node):
+        return _constant(node.value)
+
+    expression_Boolean = expression_Number
+
+    def expression_String(self, node):
+        return self.constant(node.value)
+
+    def constant(self, value):
+        # A Python constant cannot be a StringLiteral, so each distinct literal
+        # is made once in the prologue: _literal_N = _StringLiteral('"text"')
+        if value.__class__ is not StringLiteral:
+            return _constant(value)
+        name = self.literals.get(value)
+        if name is None:
+            name = self.literals[value] = self.prologue_name('_literal', _call('_StringLiteral', _constant(str(value))))
+        return _name(name)
+
+    def expression_Null(self, node):
+        return _constant(None)
+
+    def expression_Variable(self, node):
+        if node.value in self.append_targets:
+            return _call('_load_appended', _constant(node.value))
+        return _call('_load', _constant(node.value))
+
+    def expression_BinOp(self, node):
+        return pyast.BinOp(left=self.expression(node.left), op=PYTHON_OPERATORS[node.op](), right=self.expression(node.right))
+
+    def expression_Comparison(self, node):
+        # Femcode comparisons nest instead of chaining, so never merge them
+        return pyast.Compare(left=self.expression(node.left), ops=[PYTHON_OPERATORS[node.op]()], comparators=[self.expression(node.right)])
+
+    def expression_LogicalOp(self, node):
+        return pyast.BoolOp(op=PYTHON_OPERATORS[node.op](), values=[self.expression(node.left), self.expression(node.right)])
+
+    def expression_UnaryOp(self, node):
+        return pyast.UnaryOp(op=pyast.Not(), operand=self.expression(node.right))
+
+    def expression_Increment(self, node):
+        return _call('_step', _constant(node.var_name.value), _constant(1), _constant('increment'))
+
+    def expression_Decrement(self, node):
+        return _call('_step', _constant(node.var_name.value), _constant(-1), _constant('decrement'))
+
+    def expression_List(self, node):
+        return pyast.List(elts=[self.expression(element) for element in node.elements], ctx=pyast.Load())
+
+    def expression_Dictionary(self, node):
+        return pyast.Dict(keys=[self.expression(key) for key, _ in node.pairs], values=[self.expression(value) for _, value in node.pairs])
+
+    def expression_IndexAccess(self, node):
+        return _call('_index', self.expression(node.target), self.expression(node.index))
+
+    def expression_PropertyAccess(self, node):
+        return _call('_property', self.expression(node.target), _constant(node.property_name))
+
+    def prologue_name(self, prefix, value):
+        name = f'{prefix}_{len(self.prologue)}'
+        self.prologue.append(pyast.Assign(targets=[_name(name, pyast.Store)], value=value))
+        return name
+
+    def expression_RecordLiteral(self, node):
+        # _record_N = _shape(keys) ... _record_N((value, ...))
+        keys = pyast.Tuple(elts=[self.constant(key) for key in node.record_class.shape_keys], ctx=pyast.Load())
+        record_class = self.prologue_name('_record', _call('_shape', keys))
+        values = pyast.Tuple(elts=[self.expression(value) for value in node.values], ctx=pyast.Load())
+        return _call(record_class, values)
+
+    def expression_CachedPropertyAccess(self, node):
+        # _property_N = _PropertyCache('name').get ... _property_N(target)
+        cache = pyast.Attribute(value=_call('_PropertyCache', _constant(node.property_name)), attr='get', ctx=pyast.Load())
+        return _call(self.prologue_name('_property', cache), self.expression(node.target))
+
+    def expression_FunctionCall(self, node):
+        # The function is resolved before its arguments are evaluated, as in the tree walker
+        return _call(_call('_function', _constant(node.name)), *[self.expression(argument) for argument in node.arguments])
+
+def transpile(program):
+    return Transpiler().transpile(program)
+
+def compile_to_python(program):
+    return compile(transpile(program), '<femcode>', 'exec')
+
+def to_python_source(program):
+    return pyast.unparse(transpile(program))
+
+class TranspilingInterpreter(Interpreter):
+    # Runs a program by transpiling it to Python and letting CPython execute
+    # the resulting code object. Scopes, functions and built-ins are shared
+    # with the tree-walking Interpreter.
+
+    SUPPORTS_HOOKS = False
+
+    def interpret(self):
+        self.run(compile_to_python(self.ast))
+
+    def run(self, code):
+        try:
+            exec(code, self.runtime_namespace())
+        except (BreakLoop, ContinueLoop) as signal:
+            raise outside_loop_error(signal.statement) from None
+        finally:
+            self.output.flush()
+
+    def runtime_namespace(self):
+        scope_stack = self.scope_stack
+        functions = self.functions
+
+        def load(var_name):
+            for scope in reversed(scope_stack):
+                if var_name in scope:
+                    return scope[var_name]
+            raise NameError(f"name '{var_name}' is not defined")
+
+        def load_appended(var_name):
+            # A variable _append assigns may hold a StringBuilder
+            value = load(var_name)
+            if value.__class__ is StringBuilder:
+                return value.getvalue()
+            return value
+
+        def append(var_name, current, value):
+            scope = scope_stack[-1]
+            scope[var_name] = append_value(current, value, scope.get(var_name))
+
+        def function(func_name):
+            func_info = functions.get(func_name)
+            if func_info is None:
+                raise NameError(f"Function '{func_name}' is not defined")
+            return func_info
+
+        def step(var_name, amount, action):
+            value = load(var_name)
+            if value.__class__ is StringBuilder:
+                value = value.getvalue()
+            scope_stack[-1][var_name] = check_numeric(value, action) + amount
+
+        return {
+            '__builtins__': __builtins__,
+            '_scopes': scope_stack,
+            '_print': self.output.write_line,
+            '_functions': functions,
+            '_load': load,
+            '_load_appended': load_appended,
+            '_append': append,
+            '_function': function,
+            '_step': step,
+            '_check_arity': check_arity,
+            '_check_iterable': check_iterable,
+            '_index': index_access,
+            '_property': property_access,
+            '_shape': shape_for,
+            '_PropertyCache': PropertyCache,
+            '_ReturnValue': ReturnValue,
+            '_BreakLoop': BreakLoop,
+            '_ContinueLoop': ContinueLoop,
+            '_outside_loop_error': outside_loop_error,
+            '_StringLiteral': StringLiteral,
+        }
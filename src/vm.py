@@ -0,0 +1,373 @@
+from bytecode import (
+    LOAD_CONST, LOAD_NAME, STORE_NAME, BINARY_OP, COMPARE_OP, JUMP, POP_JUMP_IF_FALSE,
+    JUMP_IF_FALSE_OR_POP, JUMP_IF_TRUE_OR_POP, UNARY_NOT, INCREMENT, DECREMENT,
+    CALL_FUNCTION, RETURN_VALUE, FOR_ITER, PUSH_SCOPE, POP_SCOPE, GET_ITER, POP_TOP,
+    PRINT, BUILD_LIST, BUILD_DICT, INDEX, PROPERTY, SETUP_TRY, POP_TRY,
+    DEFINE_FUNCTION, RAISE, STORE_LOOP_NAME, LOAD_FUNCTION, TAIL_CALL, LOAD_APPEND_TARGET, APPEND_NAME, LOAD_APPENDED_NAME,
+    BUILD_RECORD, CACHED_PROPERTY, OPCODE_NAMES, compile_ast,
+)
+from interpreter import CONTROL_FLOW_SIGNALS, BreakLoop, ContinueLoop, Interpreter, ReturnValue, outside_loop_error
+from output import OUTPUT_BUFFER_SIZE
+from runtime import BINARY_OPERATORS, COMPARISON_OPERATORS, check_arity, check_iterable, check_numeric, index_access, property_access
+from strings import StringBuilder, append_value
+
+# BINARY_OP and COMPARE_OP arguments are Op values; index straight into one table
+OPERATORS = [None] * (max(max(BINARY_OPERATORS), max(COMPARISON_OPERATORS)) + 1)
+for op, operation in {**BINARY_OPERATORS, **COMPARISON_OPERATORS}.items():
+    OPERATORS[op] = operation
+
+_EXHAUSTED = object()
+
+class Frame:
+    __slots__ = ('code', 'pc', 'stack', 'scope_base', 'handlers')
+
+    def __init__(self, code, scope_base):
+        self.code = code
+        self.pc = 0
+        self.stack = []
+        # Length of the scope stack when the frame was entered; returning or
+        # unwinding truncates back to it
+        self.scope_base = scope_base
+        # (handler offset, value stack depth, scope stack depth) per open Twink
+        self.handlers = []
+
+class VirtualMachine(Interpreter):
+    # Executes the bytecode produced by bytecode.compile_ast with a flat
+    # dispatch loop. Femcode calls push a Frame instead of recursing in Python,
+    # so recursion depth is limited by memory rather than by Python's
+    # recursion limit, and tail calls (TAIL_CALL) reuse the caller's Frame.
+    # Scopes, functions and built-ins are shared with the tree-walking
+    # Interpreter.
+
+    SUPPORTS_HOOKS = False
+
+    def __init__(self, ast, stdout=None, stdin=None, buffer_size=OUTPUT_BUFFER_SIZE):
+        super().__init__(ast, stdout, stdin, buffer_size)
+        # Frames of finished calls, reset and reused by the next call
+        self.frame_pool = []
+
+    def interpret(self):
+        return self.run(compile_ast(self.ast))
+
+    def run(self, code):
+        try:
+            return self._run([Frame(code, len(self.scope_stack))])
+        finally:
+            self.output.flush()
+
+    def call_function(self, function, arguments):
+        # A call from Python (invoke) runs on its own frame list; the
+        # function's RETURN_VALUE empties it and hands back the value
+        frame = Frame(function.code, len(self.scope_stack))
+        self.scope_stack.append(dict(zip(function.parameters, arguments)))
+        return self._run([frame])
+
+    def _run(self, frames):
+        while True:
+            try:
+                return self._execute(frames)
+            except (BreakLoop, ContinueLoop) as signal:
+                # A Break/Continue outside every loop of its function: the
+                # call fails, skipping the function's own Twink blocks
+                frame = frames.pop()
+                del self.scope_stack[frame.scope_base:]
+                self._release_frame(frame)
+                if not frames or not self._unwind(frames):
+                    raise outside_loop_error(signal.statement) from None
+            except CONTROL_FLOW_SIGNALS:
+                raise
+            except Exception:
+                if not self._unwind(frames):
+                    raise
+
+    def _unwind(self, frames):
+        # Finds the innermost open Twink block, discarding frames on the way
+        scope_stack = self.scope_stack
+        while frames:
+            frame = frames[-1]
+            if frame.handlers:
+                target, stack_depth, scope_depth = frame.handlers.pop()
+                del frame.stack[stack_depth:]
+                del scope_stack[scope_depth:]
+                frame.pc = target
+                return True
+            del scope_stack[frame.scope_base:]
+            self._release_frame(frames.pop())
+        return False
+
+    def _release_frame(self, frame):
+        del frame.stack[:]
+        del frame.handlers[:]
+        self.frame_pool.append(frame)
+
+    def _bind_call_site(self, site):
+        # The new CallSite entry: the function the name refers to now, with
+        # a user function's arity checked once for the site
+        function = self.functions.get(site.name)
+        if function is None:
+            raise NameError(f"Function '{site.name}' is not defined")
+        is_builtin = callable(function)
+        if not is_builtin:
+            check_arity(site.name, function.parameters, site.argc)
+        return self.functions_version, function, is_builtin
+
+    def _lookup(self, var_name):
+        for scope in reversed(self.scope_stack):
+            if var_name in scope:
+                value = scope[var_name]
+                return value.getvalue() if value.__class__ is StringBuilder else value
+        raise NameError(f"name '{var_name}' is not defined")
+
+    def _execute(self, frames):
+        scope_stack = self.scope_stack
+        operators = OPERATORS
+        frame_pool = self.frame_pool
+        write_line = self.output.write_line
+
+        frame = frames[-1]
+        code = frame.code
+        instructions = code.instructions
+        constants = code.constants
+        names = code.names
+        stack = frame.stack
+        push = stack.append
+        pop = stack.pop
+        pc = frame.pc
+
+        while True:
+            opcode = instructions[pc]
+            arg = instructions[pc + 1]
+            pc += 2
+
+            # The opcodes of loops and calls come first; every test on the way
+            # to an opcode costs each time it runs
+            if opcode == LOAD_NAME:
+                var_name = names[arg]
+                scope = scope_stack[-1]
+                if var_name in scope:
+                    push(scope[var_name])
+                else:
+                    for scope in reversed(scope_stack):
+                        if var_name in scope:
+                            push(scope[var_name])
+                            break
+                    else:
+                        raise NameError(f"name '{var_name}' is not defined")
+            elif opcode == LOAD_CONST:
+                push(constants[arg])
+            elif opcode == BINARY_OP or opcode == COMPARE_OP:
+                right = pop()
+                stack[-1] = operators[arg](stack[-1], right)
+            elif opcode == STORE_NAME:
+                scope_stack[-1][names[arg]] = pop()
+            elif opcode == POP_JUMP_IF_FALSE:
+                if not pop():
+                    pc = arg
+            elif opcode == JUMP:
+                pc = arg
+            elif opcode == FOR_ITER:
+                item = next(stack[-1], _EXHAUSTED)
+                if item is _EXHAUSTED:
+                    pop()
+                    pc = arg
+                else:
+                    # Always followed by STORE_LOOP_NAME, done here without
+                    # another trip through the dispatch chain
+                    scope = scope_stack[-1]
+                    if len(scope) > 1:
+                        scope.clear()
+                    scope[names[instructions[pc + 1]]] = item
+                    pc += 2
+            elif opcode == INCREMENT:
+                var_name = names[arg]
+                scope = scope_stack[-1]
+                value = scope.get(var_name)
+                if value.__class__ is int:
+                    scope[var_name] = value + 1
+                else:
+                    scope[var_name] = check_numeric(self._lookup(var_name), 'increment') + 1
+            elif opcode == LOAD_FUNCTION:
+                site = constants[arg]
+                entry = site.entry
+                if entry[0] != self.functions_version:
+                    entry = site.entry = self._bind_call_site(site)
+                push(entry)
+            elif opcode == CALL_FUNCTION:
+                argc = constants[arg].argc
+                if argc:
+                    arguments = stack[-argc:]
+                    del stack[-argc:]
+                else:
+                    arguments = []
+                # The call site entry LOAD_FUNCTION pushed before the arguments
+                version, func_info, is_builtin = pop()
+                if is_builtin:
+                    push(func_info(*arguments))
+                    continue
+
+                frame.pc = pc
+                if frame_pool:
+                    frame = frame_pool.pop()
+                    frame.code = func_info.code
+                    frame.pc = 0
+                    frame.scope_base = len(scope_stack)
+                else:
+                    frame = Frame(func_info.code, len(scope_stack))
+                frames.append(frame)
+                scope_stack.append(dict(zip(func_info.parameters, arguments)))
+                code = frame.code
+                instructions = code.instructions
+                constants = code.constants
+                names = code.names
+                stack = frame.stack
+                push = stack.append
+                pop = stack.pop
+                pc = 0
+            elif opcode == RETURN_VALUE:
+                value = pop()
+                del scope_stack[frame.scope_base:]
+                frames.pop()
+                if not frames:
+                    return value
+                # A Femme inside a loop or Twink leaves iterators and handlers behind
+                del frame.stack[:]
+                del frame.handlers[:]
+                frame_pool.append(frame)
+                frame = frames[-1]
+                code = frame.code
+                instructions = code.instructions
+                constants = code.constants
+                names = code.names
+                stack = frame.stack
+                push = stack.append
+                pop = stack.pop
+                pc = frame.pc
+                push(value)
+            elif opcode == TAIL_CALL:
+                argc = constants[arg].argc
+                if argc:
+                    arguments = stack[-argc:]
+                    del stack[-argc:]
+                else:
+                    arguments = []
+                version, func_info, is_builtin = pop()
+                if is_builtin:
+                    # Built-ins return normally; the next instruction is RETURN_VALUE
+                    push(func_info(*arguments))
+                    continue
+
+                # Scoping is dynamic, so the callee must still see the caller's
+                # variables. Folding the caller's scopes into the callee's one
+                # gives the same lookups while memory stays constant.
+                scope_base = frame.scope_base
+                if len(scope_stack) - scope_base == 1:
+                    scope_stack[-1].update(zip(func_info.parameters, arguments))
+                else:
+                    merged_scope = {}
+                    for scope in scope_stack[scope_base:]:
+                        merged_scope.update(scope)
+                    merged_scope.update(zip(func_info.parameters, arguments))
+                    del scope_stack[scope_base:]
+                    scope_stack.append(merged_scope)
+                # Iterators of loops the Femme leaves
+                del stack[:]
+                frame.code = code = func_info.code
+                instructions = code.instructions
+                constants = code.constants
+                names = code.names
+                pc = 0
+            elif opcode == LOAD_APPENDED_NAME:
+                push(self._lookup(names[arg]))
+            elif opcode == POP_TOP:
+                pop()
+            elif opcode == JUMP_IF_FALSE_OR_POP:
+                if not stack[-1]:
+                    pc = arg
+                else:
+                    pop()
+            elif opcode == JUMP_IF_TRUE_OR_POP:
+                if stack[-1]:
+                    pc = arg
+                else:
+                    pop()
+            elif opcode == INDEX:
+                index = pop()
+                stack[-1] = index_access(stack[-1], index)
+            elif opcode == CACHED_PROPERTY:
+                cache = constants[arg]
+                target = stack[-1]
+                record_class, index = cache.entry
+                stack[-1] = target[index] if target.__class__ is record_class else cache.miss(target)
+            elif opcode == PRINT:
+                write_line(pop())
+            elif opcode == LOAD_APPEND_TARGET:
+                var_name = names[arg]
+                for scope in reversed(scope_stack):
+                    if var_name in scope:
+                        push(scope[var_name])
+                        break
+                else:
+                    raise NameError(f"name '{var_name}' is not defined")
+            elif opcode == APPEND_NAME:
+                value = pop()
+                current = pop()
+                scope = scope_stack[-1]
+                var_name = names[arg]
+                if isinstance(current, (str, StringBuilder)):
+                    scope[var_name] = append_value(current, value, scope.get(var_name))
+                else:
+                    scope[var_name] = current + value
+            elif opcode == UNARY_NOT:
+                stack[-1] = not stack[-1]
+            elif opcode == PROPERTY:
+                stack[-1] = property_access(stack[-1], names[arg])
+            elif opcode == BUILD_LIST:
+                if arg:
+                    elements = stack[-arg:]
+                    del stack[-arg:]
+                else:
+                    elements = []
+                push(elements)
+            elif opcode == BUILD_RECORD:
+                record_class = constants[arg]
+                count = len(record_class.shape_keys)
+                if count:
+                    values = stack[-count:]
+                    del stack[-count:]
+                else:
+                    values = ()
+                push(record_class(values))
+            elif opcode == BUILD_DICT:
+                dictionary = {}
+                if arg:
+                    items = stack[-2 * arg:]
+                    del stack[-2 * arg:]
+                    for i in range(0, len(items), 2):
+                        dictionary[items[i]] = items[i + 1]
+                push(dictionary)
+            elif opcode == GET_ITER:
+                stack[-1] = iter(check_iterable(stack[-1]))
+            elif opcode == PUSH_SCOPE:
+                scope_stack.append({})
+            elif opcode == POP_SCOPE:
+                scope_stack.pop()
+            elif opcode == DECREMENT:
+                var_name = names[arg]
+                scope_stack[-1][var_name] = check_numeric(self._lookup(var_name), 'decrement') - 1
+            elif opcode == STORE_LOOP_NAME:
+                scope = scope_stack[-1]
+                if len(scope) > 1:
+                    scope.clear()
+                scope[names[arg]] = pop()
+            elif opcode == SETUP_TRY:
+                frame.handlers.append((arg, len(stack), len(scope_stack)))
+            elif opcode == POP_TRY:
+                frame.handlers.pop()
+            elif opcode == DEFINE_FUNCTION:
+                function = constants[arg]
+                self.define_function(function.name, function)
+            elif opcode == RAISE:
+                signal = constants[arg]
+                raise signal(pop()) if signal is ReturnValue else signal()
+            else:
+                raise Exception(f"Unknown opcode {OPCODE_NAMES.get(opcode, opcode)}")
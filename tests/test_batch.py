@@ -0,0 +1,87 @@
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from batch import collect_scripts, run_script
+from output import OUTPUT_BUFFER_SIZE
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'main.py')
+
+OPTIONS = {
+    'engine': 'tree',
+    'resolve': False,
+    'optimize': False,
+    'shapes': False,
+    'use_cache': False,
+    'timeout': None,
+    'buffer_size': OUTPUT_BUFFER_SIZE,
+}
+
+# A Twink around the loop must not swallow the timeout
+ENDLESS = '''
+Twink Femboycore
+    Otokonoko Kawaii Femboycore
+        x is 1
+    Periodt
+Periodt
+Bimboy Femboycore
+    UwU Boy "caught"
+Periodt
+'''
+
+def write(directory, name, text):
+    path = directory / name
+    path.write_text(text)
+    return str(path)
+
+def test_ok_script(tmp_path):
+    path = write(tmp_path, 'ok.fem', 'UwU Boy 1 + 1\n')
+    result_path, status, seconds, stdout, stderr = run_script(path, OPTIONS)
+    assert (result_path, status, stdout, stderr) == (path, 'ok', '2\n', '')
+    assert seconds >= 0
+
+def test_error_is_reported_and_captured(tmp_path):
+    path = write(tmp_path, 'broken.fem', 'UwU Boy "before"\nUwU Boy 1 / 0\n')
+    _, status, _, stdout, stderr = run_script(path, OPTIONS)
+    assert status == 'error'
+    assert stdout == '"before"\n'
+    assert 'ZeroDivisionError' in stderr
+    _, status, _, stdout, _ = run_script(str(tmp_path / 'missing.fem'), OPTIONS)
+    assert status == 'error'
+    assert stdout.startswith('Error: File not found')
+
+def test_timeout(tmp_path):
+    path = write(tmp_path, 'endless.fem', ENDLESS)
+    _, status, seconds, stdout, stderr = run_script(path, dict(OPTIONS, timeout=0.2))
+    assert status == 'timeout'
+    assert seconds < 5
+    assert stdout == ''
+    assert stderr == 'Error: timed out after 0.2 s\n'
+    # The alarm is cancelled, so it cannot go off in the next script
+    ok = write(tmp_path, 'ok.fem', 'i is 0\nOtokonoko i < 100000 Femboycore\n    i++\nPeriodt\nUwU Boy i\n')
+    _, status, _, stdout, _ = run_script(ok, dict(OPTIONS, timeout=30))
+    assert (status, stdout) == ('ok', '100000\n')
+
+def test_collect_scripts(tmp_path):
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / '__femcache__').mkdir()
+    for name in ('b.fem', 'a.fem', 'notes.txt', 'sub/c.fem', '__femcache__/d.fem'):
+        (tmp_path / name).write_text('')
+    assert collect_scripts([str(tmp_path)]) == [str(tmp_path / name) for name in ('a.fem', 'b.fem', 'sub/c.fem')]
+
+def test_batch_summary_and_exit_status(tmp_path):
+    write(tmp_path, 'a_ok.fem', 'UwU Boy "a"\n')
+    write(tmp_path, 'b_broken.fem', 'UwU Boy 1 / 0\n')
+    write(tmp_path, 'c_endless.fem', ENDLESS)
+    result = subprocess.run([sys.executable, MAIN, '-j', '2', '--timeout', '0.5', '--no-cache', str(tmp_path)], capture_output=True, text=True)
+    assert result.returncode == 1
+    lines = result.stdout.splitlines()
+    # Output blocks come in the order the scripts were given
+    headers = [line for line in lines if line.startswith('==> ')]
+    assert [header.split()[1] for header in headers] == [str(tmp_path / name) for name in ('a_ok.fem', 'b_broken.fem', 'c_endless.fem')]
+    assert [header.split()[2] for header in headers] == ['(ok,', '(error,', '(timeout,']
+    assert lines[lines.index(headers[0]) + 1] == '"a"'
+    assert 'ZeroDivisionError' in result.stdout
+    assert '3 scripts: 1 ok, 1 failed, 1 timed out' in lines[-1]
@@ -0,0 +1,76 @@
+import contextlib
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import cache
+import main
+from cache import cache_key, cache_path, load_cached_program
+from interpreter import Interpreter
+
+def run(program):
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout):
+        Interpreter(program).interpret()
+    return stdout.getvalue()
+
+def write_script(tmp_path, text):
+    path = tmp_path / 'script.fem'
+    path.write_text(text)
+    return str(path)
+
+def test_cached_program_is_reused(tmp_path, monkeypatch):
+    path = write_script(tmp_path, 'UwU Boy 1 + 2\n')
+    assert run(main.parse_source(path)) == '3\n'
+    assert os.path.exists(cache_path(path))
+
+    # A second run must not lex or parse at all
+    def fail(*args):
+        raise AssertionError("parsed again")
+    monkeypatch.setattr(main, 'Lexer', fail)
+    assert run(main.parse_source(path)) == '3\n'
+
+def test_edited_file_is_parsed_again(tmp_path):
+    path = write_script(tmp_path, 'UwU Boy 1 + 2\n')
+    main.parse_source(path)
+    with open(path, 'w') as f:
+        f.write('UwU Boy 1 + 3\n')
+    assert run(main.parse_source(path)) == '4\n'
+    # The entry now holds the new program
+    assert run(load_cached_program(path, cache_key('UwU Boy 1 + 3\n'))) == '4\n'
+
+def test_interpreter_change_invalidates_entries(tmp_path, monkeypatch):
+    text = 'UwU Boy 1 + 2\n'
+    path = write_script(tmp_path, text)
+    main.parse_source(path)
+    assert load_cached_program(path, cache_key(text)) is not None
+
+    # What a changed lexer or parser source (or CACHE_FORMAT) amounts to
+    monkeypatch.setattr(cache, 'CACHE_FORMAT', cache.CACHE_FORMAT + 1)
+    fingerprint = cache._interpreter_fingerprint()
+    assert fingerprint != cache.INTERPRETER_FINGERPRINT
+    monkeypatch.setattr(cache, 'INTERPRETER_FINGERPRINT', fingerprint)
+    assert load_cached_program(path, cache_key(text)) is None
+    assert run(main.parse_source(path)) == '3\n'
+    assert load_cached_program(path, cache_key(text)) is not None
+
+@pytest.mark.parametrize('damage', [lambda data: data[:len(data) // 2], lambda data: b'junk'], ids=['truncated', 'garbage'])
+def test_damaged_entry_is_a_miss(tmp_path, damage):
+    text = 'UwU Boy 1 + 2\n'
+    path = write_script(tmp_path, text)
+    main.parse_source(path)
+    with open(cache_path(path), 'rb') as f:
+        data = f.read()
+    with open(cache_path(path), 'wb') as f:
+        f.write(damage(data))
+    assert load_cached_program(path, cache_key(text)) is None
+    assert run(main.parse_source(path)) == '3\n'
+
+def test_no_cache(tmp_path):
+    path = write_script(tmp_path, 'UwU Boy 1\n')
+    main.parse_source(path, use_cache=False)
+    assert not os.path.exists(cache_path(path))
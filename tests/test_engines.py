@@ -0,0 +1,509 @@
+import contextlib
+import io
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import femcode
+import main
+from resolver import ResolvedInterpreter
+from lexer import Lexer
+from parser import Parser
+from parser import Dictionary
+from shapes import CachedPropertyAccess, RecordLiteral, assign_shapes, shape_for
+
+# (engine, --resolve)
+ENGINES = [('tree', False), ('tree', True), ('closure', False), ('vm', False), ('python', False)]
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'main.py')
+
+def run(source, engine='tree', resolve=False, shapes=False):
+    stdout = io.StringIO()
+    ast = Parser(Lexer(source).tokenize()).parse()
+    if shapes:
+        ast = assign_shapes(ast)
+    interpreter = ResolvedInterpreter(ast) if resolve else main.ENGINES[engine](ast)
+    with contextlib.redirect_stdout(stdout):
+        interpreter.interpret()
+    return stdout.getvalue()
+
+# stop() ends with a Break that is not inside any of its own loops
+BREAK_IN_FUNCTION = '''
+Femboy stop Femboycore
+    Break
+Periodt
+i is 0
+Otokonoko i < 3 Femboycore
+    i++
+    UwU Boy i
+    stop()
+Periodt
+UwU Boy "done"
+'''
+
+CAUGHT_BREAK_IN_FUNCTION = '''
+Femboy stop Femboycore
+    Break
+Periodt
+i is 0
+Otokonoko i < 3 Femboycore
+    i++
+    Twink Femboycore
+        stop()
+    Periodt
+    Bimboy Femboycore
+        UwU Boy i
+    Periodt
+Periodt
+UwU Boy "done"
+'''
+
+# The Break reaches stop()'s own Twink first, which must not catch it
+BREAK_IN_TWINK_IN_FUNCTION = '''
+Femboy stop Femboycore
+    Twink Femboycore
+        Break
+    Periodt
+    Bimboy Femboycore
+        UwU Boy "swallowed"
+    Periodt
+Periodt
+Otokonoko Kawaii Femboycore
+    stop()
+Periodt
+'''
+
+@pytest.mark.parametrize('engine, resolve', ENGINES)
+def test_break_in_called_function(engine, resolve):
+    with pytest.raises(SyntaxError, match="'Break' outside loop"):
+        run(BREAK_IN_FUNCTION, engine, resolve)
+    with pytest.raises(SyntaxError, match="'Break' outside loop"):
+        run(BREAK_IN_TWINK_IN_FUNCTION, engine, resolve)
+    assert run(CAUGHT_BREAK_IN_FUNCTION, engine, resolve) == '1\n2\n3\n"done"\n'
+
+@pytest.mark.parametrize('engine, resolve', ENGINES)
+def test_continue_outside_loop(engine, resolve):
+    with pytest.raises(SyntaxError, match="'Continue' outside loop"):
+        run('Femboy skip Femboycore\n    Continue\nPeriodt\nskip()\n', engine, resolve)
+    with pytest.raises(SyntaxError, match="'Continue' outside loop"):
+        run('Continue\n', engine, resolve)
+
+@pytest.mark.parametrize('engine, resolve', ENGINES)
+def test_loop_variables_start_fresh_each_iteration(engine, resolve):
+    source = '''
+Tomgirl x is [1, 2, 3] Femboycore
+    Femboy Feminine x == 2 Femboycore
+        Continue
+    Periodt
+    Femboy Feminine x == 1 Femboycore
+        y is "set"
+    Periodt
+    Twink Femboycore
+        UwU Boy y
+    Periodt
+    Bimboy Femboycore
+        UwU Boy x
+    Periodt
+Periodt
+'''
+    assert run(source, engine, resolve) == '"set"\n3\n'
+
+# h() redefines g while g's argument is evaluated; the g looked up before
+# the arguments is the one called
+REDEFINED_WHILE_ARGUMENTS_RUN = '''
+Femboy g(x) Femboycore
+    Femme "old"
+Periodt
+Femboy h Femboycore
+    Femboy g(x) Femboycore
+        Femme "new"
+    Periodt
+    Femme 1
+Periodt
+UwU Boy g(h())
+UwU Boy g(1)
+'''
+
+@pytest.mark.parametrize('engine, resolve', ENGINES)
+def test_function_is_looked_up_before_its_arguments(engine, resolve):
+    assert run(REDEFINED_WHILE_ARGUMENTS_RUN, engine, resolve) == '"old"\n"new"\n'
+
+@pytest.mark.parametrize('engine, resolve', ENGINES)
+def test_undefined_function_fails_before_its_arguments_run(engine, resolve):
+    stdout = io.StringIO()
+    ast = Parser(Lexer('Femboy f Femboycore\n    UwU Boy "ran"\n    Femme 1\nPeriodt\nUwU Boy nope(f())\n').tokenize()).parse()
+    interpreter = ResolvedInterpreter(ast) if resolve else main.ENGINES[engine](ast)
+    with contextlib.redirect_stdout(stdout), pytest.raises(NameError, match="Function 'nope' is not defined"):
+        interpreter.interpret()
+    # f() never ran
+    assert stdout.getvalue() == ''
+
+@pytest.mark.parametrize('engine, resolve', ENGINES)
+def test_redefined_function_is_called(engine, resolve):
+    source = """
+Femboy f(x) Femboycore
+    Femme x + 1
+Periodt
+i is 0
+Otokonoko i < 2 Femboycore
+    UwU Boy f(i)
+    Femboy f(x) Femboycore
+        Femme x * 10
+    Periodt
+    i++
+Periodt
+"""
+    assert run(source, engine, resolve) == '1\n10\n'
+
+# The Femme calls are tail calls, made from inside loops: the VM folds the
+# caller's function and loop scopes into the callee's scope, which must see
+# the same variables as a new scope on top of them would
+TAIL_CALLS_IN_LOOPS = '''
+Femboy show(depth) Femboycore
+    UwU Boy item
+    Femboy Feminine depth == 0 Femboycore
+        Femme label
+    Periodt
+    Tomgirl item is [depth * 10] Femboycore
+        label is depth
+        Femme show(depth - 1)
+    Periodt
+Periodt
+item is "global"
+label is "none"
+UwU Boy show(2)
+UwU Boy item
+UwU Boy label
+Femboy walk(n, acc) Femboycore
+    Femboy Feminine n == 0 Femboycore
+        Femme acc + [n, seen]
+    Periodt
+    i is 0
+    Otokonoko i < 2 Femboycore
+        i++
+        seen is i
+        Femboy Feminine i == 2 Femboycore
+            Femme walk(n - 1, acc + [n])
+        Periodt
+    Periodt
+Periodt
+seen is 0
+UwU Boy walk(3, [])
+UwU Boy seen
+'''
+
+# --resolve scopes lexically, so a callee does not see its caller's variables
+@pytest.mark.parametrize('engine', ['tree', 'closure', 'vm', 'python'])
+def test_tail_calls_from_loops(engine):
+    assert run(TAIL_CALLS_IN_LOOPS, engine) == '"global"\n20\n10\n1\n"global"\n"none"\n[3, 2, 1, 0, 2]\n0\n'
+
+@pytest.mark.parametrize('engine', ['tree', 'closure', 'python'])
+def test_deep_recursion_points_to_the_vm(engine, tmp_path):
+    path = tmp_path / 'deep.fem'
+    path.write_text('Femboy f(n) Femboycore\n    Femme f(n + 1)\nPeriodt\nf(0)\n')
+    result = subprocess.run([sys.executable, MAIN, str(path), '--engine', engine, '--no-cache'], capture_output=True, text=True)
+    assert result.returncode == 1
+    assert result.stderr.strip() == main.RECURSION_HINT
+
+@pytest.mark.parametrize('engine, resolve', ENGINES)
+def test_tail_call_looks_up_the_function_before_its_arguments(engine, resolve):
+    source = REDEFINED_WHILE_ARGUMENTS_RUN.replace('UwU Boy g(h())', 'Femboy k Femboycore\n    Femme g(h())\nPeriodt\nUwU Boy k()')
+    assert run(source, engine, resolve) == '"old"\n"new"\n'
+
+# Which f is defined depends on a global set by each run
+CONDITIONAL_DEFINITION = """
+Femboy Feminine big Femboycore
+    Femboy f(x) Femboycore
+        Femme x * 100
+    Periodt
+Periodt
+Androgyny Femboycore
+    Femboy f(x) Femboycore
+        Femme x
+    Periodt
+Periodt
+result is f(2)
+"""
+
+def test_compiled_program_shared_between_runs():
+    # The VM's call-site caches live in the compiled code, which every run
+    # of the program shares
+    program = femcode.compile(CONDITIONAL_DEFINITION, engine='vm')
+    assert program.run(globals={'big': True})['result'] == 200
+    assert program.run(globals={'big': False})['result'] == 2
+
+# Which scale is defined depends on the globals each run is given
+THREADED_RUN = """
+Femboy Feminine negate Femboycore
+    Femboy scale(x) Femboycore
+        Femme 0 - x * factor
+    Periodt
+Periodt
+Androgyny Femboycore
+    Femboy scale(x) Femboycore
+        Femme x * factor
+    Periodt
+Periodt
+total is 0
+i is 0
+Otokonoko i < len(items) Femboycore
+    total is total + scale(items[i])
+    UwU Boy total
+    i++
+Periodt
+"""
+
+@pytest.mark.parametrize('engine', sorted(femcode.ENGINES))
+def test_program_run_from_several_threads(engine):
+    program = femcode.compile(THREADED_RUN, engine=engine)
+
+    def run_with(factor):
+        stdout = io.StringIO()
+        result = program.run(globals={'factor': factor, 'negate': factor % 2 == 0, 'items': list(range(1000))}, stdout=stdout)
+        return stdout.getvalue(), result
+
+    factors = range(1, 25)
+    # Switch threads often, so the runs interleave in the middle of the program
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(run_with, factors))
+    finally:
+        sys.setswitchinterval(interval)
+    for factor, (output, result) in zip(factors, results):
+        sign = -1 if factor % 2 == 0 else 1
+        totals = [sign * factor * n * (n + 1) // 2 for n in range(1000)]
+        assert output == ''.join(f'{total}\n' for total in totals)
+        assert (result['factor'], result['total']) == (factor, totals[-1])
+
+@pytest.mark.parametrize('engine, resolve', ENGINES)
+def test_single_quoted_builtin_arguments(engine, resolve, tmp_path):
+    path = tmp_path / 'numbers.txt'
+    path.write_text('1\n2\n3\n')
+    source = f'''
+Femboy dbl(x) Femboycore
+    Femme x * 2
+Periodt
+Femboy big(x) Femboycore
+    Femme x > 1
+Periodt
+UwU Boy list(map('dbl', [1, 2]))
+UwU Boy list(filter('big', [1, 2, 3]))
+UwU Boy len(list(lines('{path}')))
+'''
+    assert run(source, engine, resolve) == '[2, 4]\n[2, 3]\n3\n'
+
+@pytest.mark.parametrize('shapes', [False, True])
+@pytest.mark.parametrize('engine, resolve', ENGINES)
+def test_property_of_single_quoted_key(engine, resolve, shapes):
+    source = '''
+d is {'name': "sq", "age": 3}
+UwU Boy d.name
+UwU Boy d.age
+UwU Boy d.missing
+'''
+    assert run(source, engine, resolve, shapes) == '"sq"\n3\nNone\n'
+
+@pytest.mark.parametrize('engine, resolve', ENGINES)
+def test_property_of_string_key(engine, resolve):
+    source = '''
+d is {"name": "Ada", 'age': 36, "both": 1, 'both': 2}
+key is "name"
+UwU Boy d.name
+UwU Boy d.age
+UwU Boy d.both
+UwU Boy d.nope
+e is {key: 1}
+UwU Boy e.name
+Femboy name_of(x) Femboycore
+    Femme x.name
+Periodt
+UwU Boy name_of({"name": "Grace"})
+'''
+    # The double-quoted key wins; a key computed from a string variable
+    # keeps its quotes too
+    assert run(source, engine, resolve) == '"Ada"\n36\n1\nNone\n1\n"Grace"\n'
+
+def test_dictionaries_example():
+    example = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'examples', 'dictionaries.fem')
+    result = subprocess.run([sys.executable, MAIN, example, '--no-cache'], capture_output=True, text=True)
+    assert result.returncode == 0
+    assert result.stdout == '"Femboy"\n1\n'
+
+@pytest.mark.parametrize('engine, resolve', ENGINES)
+def test_break_in_function_called_by_map(engine, resolve):
+    # The Break must not end the loop around the map() call
+    source = '''
+Femboy f(x) Femboycore
+    Break
+Periodt
+Tomgirl i is [1, 2] Femboycore
+    UwU Boy list(map('f', [1, 2]))
+Periodt
+'''
+    with pytest.raises(SyntaxError, match="'Break' outside loop"):
+        run(source, engine, resolve)
+
+@pytest.mark.parametrize('engine, resolve', ENGINES)
+def test_quoted_strings_from_files_are_used_as_they_are(engine, resolve, tmp_path, monkeypatch):
+    # A file whose name starts and ends with a quote, named by a line read
+    # from another file: only literals lose their quotes
+    (tmp_path / '"data.txt"').write_text('first\nsecond\n')
+    (tmp_path / 'names.txt').write_text('"data.txt"\n')
+    monkeypatch.chdir(tmp_path)
+    source = '''
+names is list(lines("names.txt"))
+name is names[0]
+UwU Boy name
+UwU Boy list(lines(name))
+Femboy dbl(x) Femboycore
+    Femme x * 2
+Periodt
+f is 'dbl'
+UwU Boy list(map(f, [1, 2]))
+'''
+    assert run(source, engine, resolve) == '"data.txt"\n[\'first\', \'second\']\n[2, 4]\n'
+
+
+@pytest.mark.parametrize('engine, resolve', ENGINES)
+def test_quoted_data_through_string_builtins(engine, resolve, tmp_path):
+    path = tmp_path / 'd.txt'
+    path.write_text('"quoted"\nplain\n"a b"\n')
+    source = f'''
+x is list(lines("{path}"))
+UwU Boy x
+UwU Boy join("|", x)
+UwU Boy split(x[2])
+UwU Boy split(x[0], 'o')
+UwU Boy format("<{{}}>", x[0])
+'''
+    assert run(source, engine, resolve) == (
+        '[\'"quoted"\', \'plain\', \'"a b"\']\n'
+        '"quoted"|plain|"a b"\n'
+        '[\'"a\', \'b"\']\n'
+        '[\'"qu\', \'ted"\']\n'
+        '<"quoted">\n'
+    )
+
+# One o.x site sees records of two shapes (x at different positions), a
+# record without x and a plain dict, and then the first shape again
+SHAPES_AT_ONE_SITE = '''
+Femboy get_x(o) Femboycore
+    Femme o.x
+Periodt
+k is "x"
+Tomgirl o is [{"x": 1, "y": 2}, {"y": 3, "x": 4}, {"z": 5}, {k: 6}, {"x": 7, "y": 8}, {"w": 0, "y": 9, "x": 10}] Femboycore
+    UwU Boy get_x(o)
+Periodt
+'''
+
+@pytest.mark.parametrize('shapes', [False, True])
+@pytest.mark.parametrize('engine, resolve', ENGINES)
+def test_property_site_sees_several_shapes(engine, resolve, shapes):
+    assert run(SHAPES_AT_ONE_SITE, engine, resolve, shapes) == '1\n4\nNone\n6\n7\n10\n'
+
+# Computed keys, and keys that are the same dict key, build plain dicts
+PLAIN_DICTIONARIES = '''
+k is "a"
+d is {k: 1, "b": 2}
+UwU Boy d
+UwU Boy d.a
+e is {"a": 1, "a": 2}
+UwU Boy e
+UwU Boy e.a
+f is {1: "one", 1.0: "float", Kawaii: "true"}
+UwU Boy f
+UwU Boy len(f)
+'''
+
+@pytest.mark.parametrize('shapes', [False, True])
+@pytest.mark.parametrize('engine, resolve', ENGINES)
+def test_dictionaries_that_stay_plain(engine, resolve, shapes):
+    assert run(PLAIN_DICTIONARIES, engine, resolve, shapes) == (
+        "{'\"a\"': 1, '\"b\"': 2}\n1\n{'\"a\"': 2}\n2\n{1: '\"true\"'}\n1\n"
+    )
+
+def test_only_constant_distinct_keys_make_records():
+    program = assign_shapes(Parser(Lexer(PLAIN_DICTIONARIES + 'g is {"a": 1, 2: Ghosted}\nUwU Boy g.a\n').tokenize()).parse())
+    assert [type(program[i].right) for i in (1, 4, 7, 10)] == [Dictionary, Dictionary, Dictionary, RecordLiteral]
+    assert program[10].right.record_class.shape_keys == ('"a"', 2)
+    assert isinstance(program[11].value, CachedPropertyAccess)
+
+RECORDS_AND_DICTS = '''
+k is "x"
+a is {"x": 1, "y": [2, 3]}
+b is {k: 1, "y": [2, 3]}
+c is {"y": [2, 3], "x": 1}
+UwU Boy a
+UwU Boy b
+UwU Boy a == b
+UwU Boy b == a
+UwU Boy a == c
+UwU Boy a != {"x": 1, "y": [2]}
+UwU Boy a == [1, [2, 3]]
+UwU Boy type(a)
+UwU Boy len(a)
+UwU Boy a.missing
+'''
+
+@pytest.mark.parametrize('shapes', [False, True])
+@pytest.mark.parametrize('engine, resolve', ENGINES)
+def test_records_behave_like_dicts(engine, resolve, shapes):
+    assert run(RECORDS_AND_DICTS, engine, resolve, shapes) == (
+        "{'\"x\"': 1, '\"y\"': [2, 3]}\n" * 2
+        + 'True\nTrue\nTrue\nTrue\nFalse\ndict\n2\nNone\n'
+    )
+
+def test_record_emulates_a_dict():
+    record = shape_for(('"x"', 'y', 2))((1, [2], None))
+    plain = {'"x"': 1, 'y': [2], 2: None}
+    assert list(record) == list(plain)
+    assert list(record.items()) == list(plain.items())
+    assert '"x"' in record and 2 in record and 1 not in record
+    assert record == plain and plain == record
+    assert not record != plain
+    assert record != {'"x"': 1}
+    assert record != (1, [2], None)
+    assert repr(record) == repr(plain)
+    assert type(record).__name__ == 'dict'
+    with pytest.raises(TypeError):
+        hash(record)
+    with pytest.raises(TypeError):
+        record + record
+    with pytest.raises(TypeError):
+        record < record
+
+# 1, 1.0 and Kawaii are the same dict key, so each literal's record must keep
+# the key it was written with
+EQUAL_KEYS_ACROSS_LITERALS = '''
+a is {1: 5}
+b is {1.0: 6}
+c is {Kawaii: 7}
+d is {1: "x", "n": 2}
+e is {1.0: "y", "n": 3}
+f is {Kawaii: "z", "n": 4}
+UwU Boy a
+UwU Boy b
+UwU Boy c
+UwU Boy d
+UwU Boy e
+UwU Boy f
+UwU Boy b == a
+UwU Boy e.n
+'''
+
+@pytest.mark.parametrize('engine, resolve', ENGINES)
+def test_records_keep_keys_that_equal_other_shapes_keys(engine, resolve):
+    expected = run(EQUAL_KEYS_ACROSS_LITERALS, engine, resolve)
+    assert expected == (
+        "{1: 5}\n{1.0: 6}\n{True: 7}\n"
+        "{1: '\"x\"', '\"n\"': 2}\n{1.0: '\"y\"', '\"n\"': 3}\n{True: '\"z\"', '\"n\"': 4}\n"
+        "False\n3\n"
+    )
+    assert run(EQUAL_KEYS_ACROSS_LITERALS, engine, resolve, shapes=True) == expected
@@ -0,0 +1,114 @@
+import contextlib
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import main
+from interpreter import DispatchTable, HookedDispatchTable, Interpreter
+from lexer import Lexer
+from parser import BinOp, ForStatement, Parser, Print, TryExceptStatement, WhileStatement
+from resolver import ResolvedInterpreter
+
+PROGRAM = '''
+Femboy double(x) Femboycore
+    Femme x * 2
+Periodt
+Tomgirl item is [1, 2] Femboycore
+    UwU Boy double(item)
+Periodt
+i is 0
+Otokonoko i < 3 Femboycore
+    i++
+Periodt
+Twink Femboycore
+    UwU Boy 1 / 0
+Periodt
+Bimboy Femboycore
+    UwU Boy "caught"
+Periodt
+'''
+
+def make_interpreter(source=PROGRAM, interpreter_class=Interpreter):
+    return interpreter_class(Parser(Lexer(source).tokenize()).parse())
+
+def interpret(interpreter):
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout):
+        interpreter.interpret()
+    return stdout.getvalue()
+
+def record(interpreter, *events):
+    # event -> list of the arguments of every call
+    calls = {event: [] for event in events}
+    for event in events:
+        interpreter.add_hook(event, lambda *arguments, event=event: calls[event].append(arguments))
+    return calls
+
+def test_enter_and_exit():
+    interpreter = make_interpreter('UwU Boy 1 + 2\n')
+    calls = record(interpreter, 'enter', 'exit')
+    assert interpret(interpreter) == '3\n'
+    statement = interpreter.ast[0]
+    assert [type(node) for (node,) in calls['enter']] == [Print, BinOp, type(statement.value.left), type(statement.value.right)]
+    assert calls['enter'][0][0] is statement
+    # Children exit before their parents, each with its value
+    exits = [(type(node), result) for node, result in calls['exit']]
+    assert exits[:3] == [(type(statement.value.left), 1), (type(statement.value.right), 2), (BinOp, 3)]
+    assert exits[3][0] is Print
+
+def test_call_and_return():
+    interpreter = make_interpreter()
+    calls = record(interpreter, 'call', 'return')
+    assert interpret(interpreter) == '2\n4\n"caught"\n'
+    assert [(function.name, arguments) for function, arguments in calls['call']] == [('double', [1]), ('double', [2])]
+    assert [(function.name, value) for function, value in calls['return']] == [('double', 2), ('double', 4)]
+    assert calls['call'][0][0] is interpreter.functions['double']
+
+def test_loop_iteration():
+    interpreter = make_interpreter()
+    calls = record(interpreter, 'loop_iteration')
+    interpret(interpreter)
+    loops = [loop for (loop,) in calls['loop_iteration']]
+    for_loop, while_loop = interpreter.ast[1], interpreter.ast[3]
+    assert isinstance(for_loop, ForStatement) and isinstance(while_loop, WhileStatement)
+    assert loops == [for_loop] * 2 + [while_loop] * 3
+
+def test_exception_caught():
+    interpreter = make_interpreter()
+    calls = record(interpreter, 'exception_caught')
+    interpret(interpreter)
+    [(try_node, exception)] = calls['exception_caught']
+    assert isinstance(try_node, TryExceptStatement) and try_node is interpreter.ast[4]
+    assert isinstance(exception, ZeroDivisionError)
+
+def test_removing_the_last_hook_restores_the_plain_interpreter():
+    interpreter = make_interpreter()
+    enter = lambda node: None
+    call = lambda function, arguments: None
+    interpreter.add_hook('enter', enter)
+    interpreter.add_hook('call', call)
+    assert isinstance(interpreter.dispatch, HookedDispatchTable)
+    assert interpreter.call_function == interpreter._hooked_call_function
+    interpreter.remove_hook('enter', enter)
+    assert interpreter.dispatch.__class__ is DispatchTable
+    # Still hooked for calls
+    assert 'call_function' in vars(interpreter)
+    interpreter.remove_hook('call', call)
+    assert 'call_function' not in vars(interpreter)
+    assert interpreter.call_function.__func__ is Interpreter.call_function
+    assert interpret(interpreter) == '2\n4\n"caught"\n'
+
+def test_unknown_event():
+    with pytest.raises(ValueError, match="Unknown hook event 'visit'"):
+        make_interpreter().add_hook('visit', print)
+
+@pytest.mark.parametrize('interpreter_class', [main.ENGINES['closure'], main.ENGINES['vm'], main.ENGINES['python'], ResolvedInterpreter])
+def test_engines_without_hooks_reject_them(interpreter_class):
+    interpreter = make_interpreter(interpreter_class=interpreter_class)
+    with pytest.raises(NotImplementedError, match='does not support hooks'):
+        interpreter.add_hook('enter', print)
+    assert interpreter.hooks['enter'] == []
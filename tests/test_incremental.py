@@ -0,0 +1,90 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from incremental import IncrementalParser
+from lexer import Lexer
+from parser import AST, Parser
+
+PROGRAM = '''total is 0
+Femboy add(a, b) Femboycore
+    Femme a + b
+Periodt
+Tomgirl item is [1, 2, 3] Femboycore
+    total is add(total, item)
+Periodt
+Femboy Feminine total > 5 Femboycore
+    UwU Boy "big"
+Periodt
+Androgyny Femboycore
+    UwU Boy "small"
+Periodt
+UwU Boy total
+'''
+
+# Each edit is applied to the text left by the ones before it
+EDITS = [
+    ('change a number', '[1, 2, 3]', '[1, 2, 30]'),
+    ('change a function body', 'Femme a + b', 'Femme a * b + 1'),
+    ('insert a statement', 'UwU Boy total\n', 'count is 1\nUwU Boy total\n'),
+    ('delete a statement', 'count is 1\n', ''),
+    ('insert at the start', 'total is 0\n', 'UwU Boy "start"\ntotal is 0\n'),
+    ('append at the end', 'UwU Boy total\n', 'UwU Boy total\nUwU Boy "end"\n'),
+    ('turn an else block into a statement', 'Androgyny Femboycore\n    UwU Boy "small"\nPeriodt\n', 'UwU Boy "small"\n'),
+    ('and back', 'UwU Boy "small"\n', 'Androgyny Femboycore\n    UwU Boy "small"\nPeriodt\n'),
+    ('edit inside a token', 'item is', 'items is'),
+]
+
+def dump(node):
+    # Every field and source position, so two trees compare equal only if
+    # they are the same down to the offsets
+    if isinstance(node, AST):
+        fields = tuple((field, dump(getattr(node, field))) for field in type(node).__slots__)
+        return (type(node).__name__, getattr(node, 'position', None), fields)
+    if isinstance(node, (list, tuple)):
+        return [dump(item) for item in node]
+    return node
+
+def full_parse(text):
+    return Parser(Lexer(text).tokenize()).parse()
+
+def test_edits_match_a_full_parse():
+    parser = IncrementalParser()
+    text = PROGRAM
+    assert dump(parser.parse(text)) == dump(full_parse(text))
+    for description, old, new in EDITS:
+        assert old in text, description
+        text = text.replace(old, new, 1)
+        assert dump(parser.parse(text)) == dump(full_parse(text)), description
+
+def test_one_line_edit_reparses_one_statement():
+    parser = IncrementalParser()
+    parser.parse(PROGRAM)
+    parser.parse(PROGRAM.replace('"big"', '"huge"'))
+    assert parser.reparsed_statements == 1
+    assert parser.relexed_tokens < 10
+    assert parser.summary().startswith('re-lexed ')
+
+def test_edit_by_range():
+    parser = IncrementalParser()
+    parser.parse(PROGRAM)
+    start = PROGRAM.index('total > 5')
+    statements = parser.edit(start, start + len('total > 5'), 'total >= 6')
+    text = PROGRAM.replace('total > 5', 'total >= 6')
+    assert parser.text == text
+    assert dump(statements) == dump(full_parse(text))
+    with pytest.raises(ValueError):
+        parser.edit(0, len(text) + 1, '')
+
+def test_syntax_error_keeps_the_last_good_version():
+    parser = IncrementalParser()
+    parser.parse(PROGRAM)
+    broken = PROGRAM.replace('Femme a + b', 'Femme a +')
+    with pytest.raises(Exception):
+        parser.parse(broken)
+    assert parser.text == PROGRAM
+    fixed = PROGRAM.replace('Femme a + b', 'Femme a - b')
+    assert dump(parser.parse(fixed)) == dump(full_parse(fixed))
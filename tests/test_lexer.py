@@ -0,0 +1,85 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from lexer import LineIndex, Lexer, Token, TokenArray, mapped_source
+
+def lex(source):
+    return [(token.type, token.value) for token in Lexer(source).tokenize()]
+
+def test_multi_word_keywords_take_the_longest_match():
+    assert lex('Femboy Feminine x') == [('FEMBOY_FEMININE', 'Femboy Feminine'), ('ID', 'x'), ('EOF', None)]
+    assert lex('UwU Boy Femboycore') == [('PRINT', 'UwU Boy'), ('FEMBOYCORE', 'Femboycore'), ('EOF', None)]
+    # A keyword followed by more identifier characters is an identifier
+    assert lex('Femboya Femboy Femininely UwU Boys') == [
+        ('ID', 'Femboya'), ('FUNCTION_DEF', 'Femboy'), ('ID', 'Femininely'), ('ID', 'UwU'), ('ID', 'Boys'), ('EOF', None),
+    ]
+    # The words of a phrase are separated by exactly one space
+    assert lex('UwU  Boy') == [('ID', 'UwU'), ('ID', 'Boy'), ('EOF', None)]
+    assert lex('Femboy\nFeminine') == [('FUNCTION_DEF', 'Femboy'), ('ID', 'Feminine'), ('EOF', None)]
+
+def test_keywords_and_operators():
+    assert lex('x is not Kawaii and y != Ghosted or z++') == [
+        ('ID', 'x'), ('ASSIGN', 'is'), ('NOT', 'not'), ('KAWAII', True), ('AND', 'and'), ('ID', 'y'),
+        ('NEQ', '!='), ('NULL', None), ('OR', 'or'), ('ID', 'z'), ('INCREMENT', '++'), ('EOF', None),
+    ]
+    assert lex('!x # comment\n1.5 2') == [('NOT', '!'), ('ID', 'x'), ('FLOAT', 1.5), ('INTEGER', 2), ('EOF', None)]
+
+def test_token_array_keeps_offsets():
+    tokens = Lexer('x is 10\nUwU Boy x').tokenize()
+    assert len(tokens) == 6
+    token = tokens[2]
+    assert (token.type, token.value, token.start, token.end) == ('INTEGER', 10, 5, 7)
+    assert (tokens[-1].type, tokens[-1].start, tokens[-1].end) == ('EOF', 17, 17)
+    sliced = tokens[1:4]
+    assert [(token.type, token.start, token.end) for token in sliced] == [('ASSIGN', 2, 4), ('INTEGER', 5, 7), ('PRINT', 8, 15)]
+    assert [(token.start, token.end) for token in tokens[::-2]] == [(17, 17), (8, 15), (2, 4)]
+    assert [token.start for token in tokens] == [0, 2, 5, 8, 16, 17]
+
+def test_token_array_synthesized_tokens_have_no_offsets():
+    tokens = TokenArray()
+    tokens.append(Token('ID', 'x'))
+    tokens.append(Token('INTEGER', 0, 0, 1))
+    assert (tokens[0].start, tokens[0].end) == (None, None)
+    assert (tokens[1].start, tokens[1].end) == (0, 1)
+    assert [(token.start, token.end) for token in tokens[:1]] == [(None, None)]
+
+def test_line_index():
+    source = 'ab\ncd\n'
+    index = LineIndex(source)
+    assert index.line_col(0) == (1, 1)
+    assert index.line_col(1) == (1, 2)
+    # The newline itself ends its line
+    assert index.line_col(2) == (1, 3)
+    assert index.line_col(3) == (2, 1)
+    assert index.line_col(len(source)) == (3, 1)
+    assert LineIndex('ab').line_col(2) == (1, 3)
+    assert LineIndex(b'a\nb').describe(2) == 'line 2, column 1'
+    assert LineIndex('').line_col(0) == (1, 1)
+
+def lex_mapped(tmp_path, source):
+    path = tmp_path / 'source.fem'
+    path.write_bytes(source.encode('utf-8'))
+    with mapped_source(str(path)) as mapped:
+        return [(token.type, token.value) for token in Lexer(mapped).iter_tokens()]
+
+def test_str_and_mapped_sources_give_the_same_tokens(tmp_path):
+    source = (
+        'x\u00a0is\u3000"h\u00e9 \u00a0"\t# caf\u00e9\n'
+        'Femboy\u2009f(a)\x1cFemboycore\n'
+        '    UwU Boy\u00a0a + 1.5\u2028\n'
+        'Periodt\n'
+    )
+    tokens = lex(source)
+    assert tokens[:3] == [('ID', 'x'), ('ASSIGN', 'is'), ('STRING', '"h\u00e9 \u00a0"')]
+    assert lex_mapped(tmp_path, source) == tokens
+
+@pytest.mark.parametrize('source', ['caf\u00e9 is 1', 'x is \u0663', 'UwU Boy\u00e9', '\u00e9'])
+def test_non_ascii_outside_strings_is_rejected_in_both_modes(tmp_path, source):
+    with pytest.raises(Exception, match='Invalid character'):
+        lex(source)
+    with pytest.raises(Exception, match='Invalid character'):
+        lex_mapped(tmp_path, source)
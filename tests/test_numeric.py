@@ -0,0 +1,135 @@
+import math
+import operator
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import numeric
+from numeric import NumericArray, equal, make_array, not_equal
+
+def test_equality_compares_whole_arrays():
+    a = make_array([1, 2, 3])
+    assert (a == make_array([1, 5, 3])) is False
+    assert (a != make_array([1, 5, 3])) is True
+    assert (a == make_array([1.0, 2.0, 3.0])) is True
+    assert (a == make_array([1, 2])) is False
+    assert (a == 1) is False
+
+def test_elementwise_equality():
+    a = make_array([1, 2, 3])
+    assert equal(a, make_array([1, 5, 3])) == [True, False, True]
+    assert not_equal(a, 2) == [True, False, True]
+    assert equal(2.0, make_array([1.5, 2.0])) == [False, True]
+    with pytest.raises(ValueError):
+        equal(a, make_array([1, 2]))
+    with pytest.raises(TypeError):
+        equal(1, 2)
+
+def test_ordering_stays_elementwise():
+    assert (make_array([1, 2, 3]) > 1) == [False, True, True]
+
+@pytest.fixture(params=['python', 'numpy'])
+def backend(request, monkeypatch):
+    # Every result must be the same with NumPy as without it
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(numeric, 'numpy', None)
+    return request.param
+
+def test_shape_mismatch(backend):
+    a = make_array([1, 2, 3])
+    b = make_array([1.0, 2.0])
+    for operation in (operator.add, operator.sub, operator.mul, operator.truediv, operator.lt, operator.ge):
+        with pytest.raises(ValueError, match=r'different lengths \(3 and 2\)'):
+            operation(a, b)
+        with pytest.raises(ValueError, match=r'different lengths \(2 and 3\)'):
+            operation(b, a)
+    with pytest.raises(ValueError):
+        not_equal(b, a)
+
+def test_integer_overflow_raises(backend):
+    big = make_array([2 ** 62, 1])
+    with pytest.raises(OverflowError):
+        big * 2
+    with pytest.raises(OverflowError):
+        big + make_array([2 ** 62, 0])
+    with pytest.raises(OverflowError):
+        make_array([2 ** 63])
+    # Floats overflow to inf, as Python floats do
+    assert list(make_array([1e308]) * 10.0) == [math.inf]
+
+def test_division_by_zero_raises(backend):
+    with pytest.raises(ZeroDivisionError):
+        make_array([1, 2]) / 0
+    with pytest.raises(ZeroDivisionError):
+        make_array([1.0, 2.0]) / make_array([1.0, 0.0])
+    with pytest.raises(ZeroDivisionError):
+        1 / make_array([1, 0])
+    with pytest.raises(ZeroDivisionError):
+        make_array([1.5]) / 0.0
+
+def test_plain_lists_do_not_mix(backend):
+    a = make_array([1, 2])
+    for operation in (operator.add, operator.sub, operator.mul, operator.truediv, operator.lt, operator.gt):
+        with pytest.raises(TypeError):
+            operation(a, [1, 2])
+        with pytest.raises(TypeError):
+            operation([1, 2], a)
+    # A list is never equal to an array, even with the same elements
+    assert (a == [1, 2]) is False
+    assert ([1, 2] != a) is True
+    with pytest.raises(TypeError):
+        equal(a, [1, 2])
+    # array() turns a list into one
+    assert (a + make_array([1, 2])) == make_array([2, 4])
+
+INT = make_array([4, 6])
+FLOAT = make_array([0.5, 1.5])
+
+@pytest.mark.parametrize('left, right, typecode', [
+    (INT, INT, 'q'),
+    (INT, 2, 'q'),
+    (2, INT, 'q'),
+    (INT, True, 'q'),
+    (INT, 2.0, 'd'),
+    (INT, FLOAT, 'd'),
+    (FLOAT, INT, 'd'),
+    (FLOAT, 2, 'd'),
+    (3, FLOAT, 'd'),
+])
+def test_arithmetic_result_types(backend, left, right, typecode):
+    for operation in (operator.add, operator.sub, operator.mul):
+        result = operation(left, right)
+        assert isinstance(result, NumericArray)
+        assert result.data.typecode == typecode
+        assert all(type(value) is (int if typecode == 'q' else float) for value in result)
+    # Division always gives floats, like / on two ints
+    assert operator.truediv(left, right).data.typecode == 'd'
+
+def test_arithmetic_values(backend):
+    assert list(INT + FLOAT) == [4.5, 7.5]
+    assert list(10 - INT) == [6, 4]
+    assert list(INT / 4) == [1.0, 1.5]
+    assert list(3 / FLOAT) == [6.0, 2.0]
+
+@pytest.mark.parametrize('left, right', [(INT, INT), (INT, 5), (5.0, FLOAT), (FLOAT, INT), (FLOAT, 1.5)])
+def test_comparison_result_types(backend, left, right):
+    for operation in (operator.lt, operator.le, operator.gt, operator.ge):
+        result = operation(left, right)
+        assert type(result) is list
+        assert all(type(value) is bool for value in result)
+    for function in (equal, not_equal):
+        result = function(left, right)
+        assert type(result) is list and all(type(value) is bool for value in result)
+    # Whole-array equality gives a single bool
+    assert type(left == right) is bool
+    assert type(left != right) is bool
+
+def test_comparisons_are_exact_for_mixed_ints_and_floats(backend):
+    a = make_array([2 ** 53 + 1])
+    assert equal(a, make_array([float(2 ** 53)])) == [False]
+    assert (a > float(2 ** 53)) == [True]
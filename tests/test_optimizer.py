@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from interpreter import Interpreter
+from lexer import Lexer
+from optimizer import Optimizer
+from parser import Increment, Parser, iter_child_nodes
+
+def optimize(source):
+    optimizer = Optimizer()
+    return optimizer, optimizer.optimize_program(Parser(Lexer(source).tokenize()).parse())
+
+def test_counter_becomes_increment():
+    optimizer, program = optimize('i is 0\nOtokonoko i < 3 Femboycore\n    i is i + 1\nPeriodt\n')
+    assert optimizer.steps == 1
+    assert isinstance(list(iter_child_nodes(program[1].body))[0], Increment)
+
+@pytest.mark.parametrize('source', [
+    # Not a number
+    's is "a"\ns is s + 1\n',
+    # A number here, but also assigned something else
+    'x is 0\nx is x + 1\nx is "a"\n',
+    # Not set by the program before the step: could be predefined by the host
+    'x is x + 1\nx is 0\n',
+    # A parameter
+    'x is 0\nFemboy f(x) Femboycore\n    x is x + 1\nPeriodt\n',
+])
+def test_step_not_rewritten_unless_known_numeric(source):
+    optimizer, _ = optimize(source)
+    assert optimizer.steps == 0
+
+def test_error_for_non_numeric_is_kept():
+    _, program = optimize('s is "a"\ns is s + 1\n')
+    with pytest.raises(TypeError, match='can only concatenate str'):
+        Interpreter(program).interpret()
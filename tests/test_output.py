@@ -0,0 +1,129 @@
+import io
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import main
+from lexer import Lexer
+from output import OutputBuffer
+from parser import Parser
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'main.py')
+
+ENGINES = sorted(main.ENGINES)
+
+class RecordingSink:
+    # Keeps every write separately, to see when the buffer was flushed
+    def __init__(self):
+        self.writes = []
+        self.flushes = 0
+
+    def write(self, text):
+        self.writes.append(text)
+
+    def flush(self):
+        self.flushes += 1
+
+    def getvalue(self):
+        return ''.join(self.writes)
+
+def parse(source):
+    return Parser(Lexer(source).tokenize()).parse()
+
+COUNT_TO_FIVE = 'i is 0\nOtokonoko i < 5 Femboycore\n    i++\n    UwU Boy i\nPeriodt\n'
+
+def test_flush_at_the_size_threshold():
+    sink = RecordingSink()
+    output = OutputBuffer(sink, 10)
+    output.write_line('abc')
+    output.write('de')
+    assert sink.writes == []
+    output.write_line('fghi')
+    # 'abc\n' + 'de' + 'fghi\n' reaches 10 characters
+    assert sink.writes == ['abc\ndefghi\n']
+    output.write_line('j')
+    assert sink.writes == ['abc\ndefghi\n']
+    output.flush()
+    assert sink.writes == ['abc\ndefghi\n', 'j\n']
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_programs_flush_in_chunks(engine):
+    sink = RecordingSink()
+    # Each line is two characters
+    main.run_program(parse(COUNT_TO_FIVE), engine, stdout=sink, buffer_size=4)
+    assert sink.writes == ['1\n2\n', '3\n4\n', '5\n']
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_size_zero_writes_every_line(engine):
+    sink = RecordingSink()
+    main.run_program(parse(COUNT_TO_FIVE), engine, stdout=sink, buffer_size=0)
+    assert sink.writes == ['1\n', '2\n', '3\n', '4\n', '5\n']
+
+class PromptedInput(io.StringIO):
+    # Records what the sink had received when the program read a line
+    def __init__(self, text, sink):
+        super().__init__(text)
+        self.sink = sink
+        self.seen = []
+
+    def readline(self):
+        self.seen.append(self.sink.getvalue())
+        return super().readline()
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_flush_before_a_prompt(engine):
+    sink = RecordingSink()
+    stdin = PromptedInput('Ada\n', sink)
+    interpreter = main.ENGINES[engine](parse('UwU Boy "hello"\nname is ask("Name? ")\nUwU Boy name\n'), sink, stdin)
+    interpreter.interpret()
+    assert stdin.seen == ['"hello"\n"Name? "']
+    assert sink.getvalue() == '"hello"\n"Name? "Ada\n'
+
+def test_flush_before_a_terminal_prompt(monkeypatch, capsys):
+    # Without a sink or stdin, ask() uses input(), which writes the prompt itself
+    seen = []
+    def fake_input(prompt):
+        seen.append(capsys.readouterr().out)
+        return 'Ada'
+    monkeypatch.setattr('builtins.input', fake_input)
+    main.run_program(parse('UwU Boy "hello"\nname is ask("Name? ")\nUwU Boy name\n'))
+    assert seen == ['"hello"\n']
+    assert capsys.readouterr().out == 'Ada\n'
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_flush_when_the_program_raises(engine):
+    sink = RecordingSink()
+    with pytest.raises(ZeroDivisionError):
+        main.run_program(parse('UwU Boy "before"\nUwU Boy 1 / 0\nUwU Boy "after"\n'), engine, stdout=sink)
+    assert sink.getvalue() == '"before"\n'
+
+def test_output_before_an_error_reaches_the_terminal(tmp_path):
+    path = tmp_path / 'broken.fem'
+    path.write_text('UwU Boy "before"\nUwU Boy 1 / 0\n')
+    result = subprocess.run([sys.executable, MAIN, str(path), '--no-cache'], capture_output=True, text=True)
+    assert result.returncode == 1
+    assert result.stdout == '"before"\n'
+    assert 'ZeroDivisionError' in result.stderr
+
+@pytest.mark.parametrize('buffer_size', ['0', '7', '65536'])
+def test_output_file_gets_every_line_in_order(tmp_path, buffer_size):
+    path = tmp_path / 'count.fem'
+    path.write_text('i is 0\nOtokonoko i < 1000 Femboycore\n    i++\n    UwU Boy i\nPeriodt\n')
+    output_path = tmp_path / 'out.txt'
+    result = subprocess.run(
+        [sys.executable, MAIN, str(path), '--no-cache', '--output', str(output_path), '--output-buffer', buffer_size],
+        capture_output=True, text=True,
+    )
+    assert result.returncode == 0
+    assert result.stdout == ''
+    assert output_path.read_text() == ''.join(f'{i}\n' for i in range(1, 1001))
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_in_memory_sink_gets_every_line_in_order(engine):
+    sink = io.StringIO()
+    main.run_program(parse('i is 0\nOtokonoko i < 1000 Femboycore\n    i++\n    UwU Boy i\nPeriodt\n'), engine, stdout=sink, buffer_size=100)
+    assert sink.getvalue() == ''.join(f'{i}\n' for i in range(1, 1001))
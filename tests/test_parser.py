@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from lexer import Lexer
+from main import RECURSION_HINT
+from parser import BinOp, Comparison, LogicalOp, Number, Op, Parser, UnaryOp
+from test_engines import run
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'main.py')
+
+# Far deeper than Python's default recursion limit of 1000
+DEPTH = 5000
+
+def parse_expression(source):
+    return Parser(Lexer(f'UwU Boy {source}\n').tokenize()).parse()[0].value
+
+def test_precedence_and_associativity():
+    node = parse_expression('not 1 + 2 * 3 < 4 and 5 - 6 - 7 == 8')
+    assert isinstance(node, LogicalOp) and node.op is Op.AND
+    comparison = node.left
+    assert isinstance(comparison, Comparison) and comparison.op is Op.LT
+    assert comparison.left.op is Op.PLUS and comparison.left.right.op is Op.MUL
+    # not applies to the operand right after it
+    assert isinstance(comparison.left.left, UnaryOp)
+    # 5 - 6 - 7 is (5 - 6) - 7
+    subtraction = node.right.left
+    assert subtraction.op is Op.MINUS and isinstance(subtraction.left, BinOp) and subtraction.right.value == 7
+
+def test_deeply_nested_parentheses():
+    node = parse_expression('(' * DEPTH + '1' + ')' * DEPTH)
+    assert isinstance(node, Number) and node.value == 1
+
+def test_deeply_nested_expressions_run_on_vm():
+    assert run('UwU Boy ' + '(1 + ' * DEPTH + '1' + ')' * DEPTH, 'vm') == f'{DEPTH + 1}\n'
+    source = 'Femboy f(a) Femboycore\n    Femme a\nPeriodt\nx is ' + 'f([' * DEPTH + '2' + '])' * DEPTH + '\n'
+    source += f'i is 0\nOtokonoko i < {DEPTH} Femboycore\n    x is x[0]\n    i++\nPeriodt\nUwU Boy x\n'
+    assert run(source, 'vm') == '2\n'
+
+def test_recursion_limit_is_reported_without_a_traceback(tmp_path):
+    path = tmp_path / 'deep.fem'
+    path.write_text('UwU Boy ' + '(1 + ' * DEPTH + '1' + ')' * DEPTH + '\n')
+    result = subprocess.run([sys.executable, MAIN, str(path), '--engine', 'tree', '--no-cache'], capture_output=True, text=True)
+    assert result.returncode == 1
+    assert result.stderr.strip() == RECURSION_HINT
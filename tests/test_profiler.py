@@ -0,0 +1,122 @@
+import contextlib
+import io
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from lexer import Lexer, mapped_source
+from parser import Parser
+from profiler import MODULE_NAME, ProfilingInterpreter
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'main.py')
+
+PROGRAM = '''Femboy fact(n) Femboycore
+    Femboy Feminine n <= 1 Femboycore
+        Femme 1
+    Periodt
+    Femme n * fact(n - 1)
+Periodt
+Femboy twice(x) Femboycore
+    Femme fact(x) + fact(x)
+Periodt
+i is 0
+Otokonoko i < 3 Femboycore
+    UwU Boy twice(20)
+    i++
+Periodt
+'''
+
+def profile(source, stream=False, tmp_path=None):
+    if stream:
+        path = tmp_path / 'program.fem'
+        path.write_text(source)
+        with mapped_source(str(path)) as mapped:
+            lexer = Lexer(mapped)
+            ast = Parser(lexer.iter_tokens(), lexer.line_index).parse()
+        source = path.read_bytes()
+    else:
+        ast = Parser(Lexer(source).tokenize()).parse()
+    profiler = ProfilingInterpreter(ast, source)
+    with contextlib.redirect_stdout(io.StringIO()):
+        profiler.interpret()
+    return profiler
+
+def hits_by_line(profiler):
+    hits = {}
+    for position, count in profiler.statement_hits.items():
+        line, _ = profiler.line_index.line_col(position)
+        hits[line] = hits.get(line, 0) + count
+    return hits
+
+def test_call_counts():
+    stats = profile(PROGRAM).function_stats
+    assert {name: calls for name, (calls, _, _) in stats.items()} == {'twice': 3, 'fact': 120}
+
+def test_recursive_time_is_not_counted_twice():
+    profiler = profile(PROGRAM)
+    for name, (_, inclusive, exclusive) in profiler.function_stats.items():
+        assert exclusive <= inclusive + 1e-9, name
+        # Inclusive time of a recursive function counts only the outermost
+        # call of each recursion, so it never exceeds the whole run
+        assert inclusive <= profiler.total_time
+    _, fact_inclusive, _ = profiler.function_stats['fact']
+    _, twice_inclusive, twice_exclusive = profiler.function_stats['twice']
+    assert fact_inclusive <= twice_inclusive
+    assert twice_exclusive <= twice_inclusive - fact_inclusive + 1e-9
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_statement_hits_by_line(stream, tmp_path):
+    # --stream positions are byte offsets; the non-ASCII comment shifts them
+    source = '# café\n' + PROGRAM
+    hits = hits_by_line(profile(source, stream, tmp_path))
+    assert hits[11] == 1 # i is 0
+    assert hits[12] == 1 # Otokonoko
+    assert hits[13] == 3 # UwU Boy twice(20)
+    assert hits[9] == 3 # Femme fact(x) + fact(x)
+    assert hits[3] == 120 # Femboy Feminine n <= 1
+    assert hits[4] == 6 # Femme 1
+    assert hits[6] == 114 # Femme n * fact(n - 1)
+
+def test_report_lists_functions_and_statements():
+    report = profile(PROGRAM).report(limit=2)
+    assert report.startswith('Profile: ')
+    assert re.search(r'^fact +120 ', report, re.MULTILINE)
+    assert re.search(r'^ +120  2:5 +Femboy Feminine n <= 1 Femboycore$', report, re.MULTILINE)
+    assert report.endswith('more statements)')
+
+def test_collapsed_stacks(tmp_path):
+    profiler = profile(PROGRAM)
+    path = tmp_path / 'program.folded'
+    profiler.write_collapsed_stacks(str(path))
+    lines = path.read_text().splitlines()
+    assert lines
+    stacks = {}
+    for line in lines:
+        assert re.fullmatch(r'[^; ]+(;[^; ]+)* [1-9][0-9]*', line), line
+        stack, count = line.rsplit(' ', 1)
+        stacks[stack] = int(count)
+    assert all(stack.split(';')[0] == MODULE_NAME for stack in stacks)
+    assert f'{MODULE_NAME};twice;fact' in stacks
+    # Recursive calls nest in the stack
+    assert f'{MODULE_NAME};twice;fact;fact;fact' in stacks
+    assert sorted(stacks) == [line.rsplit(' ', 1)[0] for line in lines]
+
+def test_report_is_written_when_the_program_fails(tmp_path):
+    path = tmp_path / 'broken.fem'
+    path.write_text('Femboy f(x) Femboycore\n    Femme x / 0\nPeriodt\nUwU Boy "before"\nUwU Boy f(1)\n')
+    stacks_path = tmp_path / 'broken.folded'
+    result = subprocess.run(
+        [sys.executable, MAIN, str(path), '--profile', '--profile-stacks', str(stacks_path), '--no-cache'],
+        capture_output=True, text=True,
+    )
+    assert result.returncode == 1
+    assert result.stdout == '"before"\n'
+    assert 'ZeroDivisionError' in result.stderr
+    assert re.search(r'^f +1 ', result.stderr, re.MULTILINE)
+    assert f'Collapsed stacks written to {stacks_path}' in result.stderr
+    assert stacks_path.exists()
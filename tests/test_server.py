@@ -0,0 +1,131 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from client import send_request
+from server import FemcodeServer, make_private_directory
+
+CLIENT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'client.py')
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'server.py')
+FEMTERPRETER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'femterpreter')
+
+@pytest.fixture
+def server(tmp_path):
+    server = FemcodeServer(str(tmp_path / 'femcode.sock'))
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    thread.join()
+    server.server_close()
+
+def request(server, path, **options):
+    return send_request(server.socket_path, {'path': str(path), 'cwd': str(path.parent), **options})
+
+def test_round_trip(server, tmp_path):
+    script = tmp_path / 'hello.fem'
+    script.write_text('name is ask("Name? ")\nUwU Boy name\n')
+    response = request(server, script, engine='vm', stdin='femboy\n')
+    assert response == {'stdout': '"Name? "femboy\n', 'stderr': '', 'exit_code': 0}
+    # Served from the program cache the second time
+    assert request(server, script, stdin='you\n')['stdout'] == '"Name? "you\n'
+    assert server.programs.hits == 1
+
+def test_errors_set_the_exit_status(server, tmp_path):
+    script = tmp_path / 'broken.fem'
+    script.write_text('UwU Boy 1 / 0\n')
+    response = request(server, script)
+    assert response['exit_code'] == 1
+    assert 'ZeroDivisionError' in response['stderr']
+    response = request(server, tmp_path / 'missing.fem')
+    assert response['exit_code'] == 1
+    assert response['stdout'].startswith('Error: File not found')
+
+def test_client_exits_with_the_script_status(server, tmp_path):
+    script = tmp_path / 'broken.fem'
+    script.write_text('UwU Boy 1\nUwU Boy 1 / 0\n')
+    environment = dict(os.environ, FEMCODE_SOCKET=server.socket_path)
+    result = subprocess.run([sys.executable, CLIENT, str(script)], capture_output=True, text=True, env=environment)
+    assert result.returncode == 1
+    assert result.stdout == '1\n'
+    assert 'ZeroDivisionError' in result.stderr
+    assert server.programs.misses == 1
+
+def test_femterpreter_runs_on_the_server(server, tmp_path):
+    script = tmp_path / 'hello.fem'
+    script.write_text('UwU Boy "warm"\n')
+    environment = dict(os.environ, FEMCODE_SOCKET=server.socket_path)
+    result = subprocess.run([FEMTERPRETER, str(script)], capture_output=True, text=True, env=environment)
+    assert result.returncode == 0
+    assert result.stdout == '"warm"\n'
+    assert server.programs.misses == 1
+
+@pytest.fixture
+def server_process(tmp_path):
+    # Timeouts use SIGALRM, which needs the server in its own main thread
+    socket_path = tmp_path / 'femcode.sock'
+    process = subprocess.Popen([sys.executable, SERVER, '--socket', str(socket_path), '--timeout', '0.5'], stderr=subprocess.PIPE)
+    deadline = time.monotonic() + 10
+    while not socket_path.exists():
+        assert process.poll() is None and time.monotonic() < deadline, 'server did not start'
+        time.sleep(0.01)
+    yield str(socket_path)
+    process.terminate()
+    process.wait()
+    assert not socket_path.exists()
+
+@pytest.mark.parametrize('engine', ['tree', 'vm', 'python'])
+def test_runs_that_take_too_long_are_stopped(server_process, tmp_path, engine):
+    script = tmp_path / 'forever.fem'
+    # The Bimboy must not catch the timeout
+    script.write_text(
+        'UwU Boy "started"\n'
+        'Otokonoko Kawaii Femboycore\n'
+        '    Twink Femboycore\n        Slay\n    Periodt\n'
+        '    Bimboy Femboycore\n        UwU Boy "caught"\n    Periodt\n'
+        'Periodt\n'
+    )
+    response = send_request(server_process, {'path': str(script), 'cwd': str(tmp_path), 'engine': engine})
+    assert response == {'stdout': '"started"\n', 'stderr': 'Error: timed out after 0.5 s\n', 'exit_code': 1}
+    # The next client is served normally
+    script = tmp_path / 'hello.fem'
+    script.write_text('UwU Boy 1\n')
+    response = send_request(server_process, {'path': str(script), 'cwd': str(tmp_path), 'engine': 'vm'})
+    assert response == {'stdout': '1\n', 'stderr': '', 'exit_code': 0}
+
+def test_timeout_needs_the_main_thread(tmp_path):
+    server = FemcodeServer(str(tmp_path / 'femcode.sock'), timeout=1)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        script = tmp_path / 'hello.fem'
+        script.write_text('UwU Boy 1\n')
+        response = request(server, script)
+    finally:
+        server.shutdown()
+        thread.join()
+        server.server_close()
+    assert response['exit_code'] == 2
+    assert 'must serve from the main thread' in response['stderr']
+
+@pytest.mark.skipif(os.getuid() != 0, reason="needs root to give the socket to another user")
+def test_socket_of_another_user_is_refused(server, tmp_path):
+    script = tmp_path / 'hello.fem'
+    script.write_text('UwU Boy 1\n')
+    os.chown(server.socket_path, 12345, -1)
+    with pytest.raises(PermissionError):
+        request(server, script)
+
+def test_socket_directory_must_be_private(tmp_path):
+    directory = tmp_path / 'sockets'
+    make_private_directory(str(directory))
+    assert directory.stat().st_mode & 0o777 == 0o700
+    directory.chmod(0o755)
+    with pytest.raises(PermissionError):
+        make_private_directory(str(directory))
@@ -0,0 +1,28 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from lexer import StringLiteral
+from strings import format_text, join, split
+
+# String values keep the quotes of their literal at runtime. Only a literal
+# separator or template loses them.
+
+def test_join():
+    assert join(StringLiteral('", "'), ['a', 'b', 1]) == 'a, b, 1'
+    assert join(StringLiteral("'|'"), ['a', 'b']) == 'a|b'
+    assert join(StringLiteral('"|"'), [StringLiteral('"a"'), '"b"']) == '"a"|"b"'
+
+def test_split():
+    assert split('a b') == ['a', 'b']
+    assert split('a,b', StringLiteral("','")) == ['a', 'b']
+    assert split('"a","b"', StringLiteral('","')) == ['"a"', '"b"']
+
+def test_format():
+    assert format_text(StringLiteral('"{} and {}"'), 'x', 2) == 'x and 2'
+    assert format_text(StringLiteral("'{:>3}'"), 2) == '  2'
+    assert format_text(StringLiteral('"<{}>"'), '"x"') == '<"x">'
+
+def test_computed_separator_is_used_as_it_is():
+    assert join('"|"', ['a', 'b']) == 'a"|"b'
@@ -0,0 +1,45 @@
+import contextlib
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from lexer import Lexer
+from parser import Parser
+from vm import VirtualMachine
+
+def run_vm(source):
+    stdout = io.StringIO()
+    vm = VirtualMachine(Parser(Lexer(source).tokenize()).parse())
+    with contextlib.redirect_stdout(stdout):
+        vm.interpret()
+    return stdout.getvalue(), vm
+
+def test_tail_recursion_runs_in_one_frame():
+    output, vm = run_vm('''
+Femboy down(n) Femboycore
+    Femboy Feminine n == 0 Femboycore
+        Femme "bottom"
+    Periodt
+    Femme down(n - 1)
+Periodt
+UwU Boy down(1000000)
+''')
+    assert output == '"bottom"\n'
+    # Every call reused the frame of the first one, which went back to the pool
+    assert len(vm.frame_pool) == 1
+    assert len(vm.scope_stack) == 1
+
+def test_deep_recursion_does_not_use_the_python_stack():
+    output, vm = run_vm('''
+Femboy total(n) Femboycore
+    Femboy Feminine n == 0 Femboycore
+        Femme 0
+    Periodt
+    Femme n + total(n - 1)
+Periodt
+UwU Boy total(100000)
+''')
+    assert output == '5000050000\n'
+    assert len(vm.frame_pool) == 100001